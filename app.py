@@ -1,18 +1,53 @@
-from flask import Flask, request, jsonify, g, abort
+from flask import Flask, request, jsonify, g, abort, Response, stream_with_context, has_request_context, url_for
+from flask.cli import AppGroup
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.exceptions import HTTPException
-from random import choice
+from werkzeug.http import http_date
+from random import sample
 from typing import Any
 from http import HTTPStatus
 from pathlib import Path
-# import sqlite3
+import os
+import sys
+import io
+import csv
+import shutil
+import sqlite3
 import datetime
+import math
+import calendar
+import string
+import base64
+import binascii
+import json
+import re
+import operator
+from contextlib import contextmanager
+import threading
+import time
+import atexit
+import functools
+import heapq
+import contextvars
+from collections import OrderedDict, namedtuple
+from array import array
+from bisect import bisect_left, bisect_right, insort
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase, relationship
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy.orm import DeclarativeBase, Session, relationship, joinedload, contains_eager
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, UniqueConstraint, func, ForeignKey, DateTime
+from sqlalchemy import String, UniqueConstraint, Index, func, ForeignKey, DateTime, tuple_, event, case, bindparam, inspect
+from sqlalchemy import text as sql_text, table, column, literal_column, JSON, or_, and_, type_coerce
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects import sqlite, postgresql
 
 from flask_migrate import Migrate
+import click
 
 
 class Base(DeclarativeBase):
@@ -22,21 +57,215 @@ class Base(DeclarativeBase):
 QUOTES_KEYS = set(('author_id', 'text', 'rating'))
 TABLE_FIELDS = ('id', 'author', 'text', 'rating')
 RATE_RANGE = range(1,6)
+PAGE_LIMIT_MAX = 1000
+STREAM_CHUNK_SIZE = 1000
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+PAGING_ARGS = ('limit', 'after', 'stream')
+SEARCH_LIMIT_DEFAULT = 20
+TOP_SIZE_DEFAULT = 10
+QUOTE_POOL_RELOAD_CHANGES = 10000
+BULK_MAX_ITEMS = 10000
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_FIELDS = ('type', 'id', 'name', 'surname', 'author_id', 'text', 'rating', 'deleted', 'created_datetime')
+IMPORT_BATCH_SIZE = 5000
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = 'queued', 'running', 'done', 'failed'
+CHANGE_QUOTE, CHANGE_AUTHOR = 'quote', 'author'
+CHANGES_LIMIT_DEFAULT = 100
+READER_BIND = 'reader'
+READ_METHODS = ('GET', 'HEAD')
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+# Профили настройки SQLite: PRAGMA для каждого соединения и параметры пула
+SQLITE_PROFILES = {
+    # настройки SQLite и SQLAlchemy по умолчанию
+    'default': {
+        'pragmas': {},
+        'engine_options': {},
+        'optimize_on_exit': False,
+    },
+    # WAL: читатели не блокируются писателем, "database is locked" только после busy_timeout
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,  # 64 МБ
+            'mmap_size': 268435456,  # 256 МБ
+            'busy_timeout': 5000,
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30},
+        'optimize_on_exit': True,
+    },
+}
+
+COMPACT_SEPARATORS = (',', ':')
+FLOAT_EXPONENT_RE = re.compile(r'\de-?\d')
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON-провайдер на orjson, побайтно совпадающий с DefaultJSONProvider для компактного вывода
+
+    orjson используется, когда нужен компактный JSON (ответы jsonify, строки
+    потоков) без ensure_ascii; даты и прочие типы, которые orjson выводит иначе,
+    передаются в default DefaultJSONProvider. Отступы и ensure_ascii - через json
+    из stdlib. Числа в экспоненциальной записи orjson выводит иначе (1e-6, у json
+    1e-06), поэтому такой результат тоже пересчитывается через json; NaN и
+    Infinity orjson выводит как null.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.keys() - {'separators'} or kwargs.get('separators') != COMPACT_SEPARATORS or self.ensure_ascii:
+            return super().dumps(obj, **kwargs)
+        options = self._options | (self._orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        try:
+            result = self._orjson.dumps(obj, default=self.default, option=options).decode()
+        except self._orjson.JSONEncodeError:
+            # например, целые больше 64 бит
+            return super().dumps(obj, **kwargs)
+        if FLOAT_EXPONENT_RE.search(result):
+            return super().dumps(obj, **kwargs)
+        return result
+
+
+JSON_PROVIDERS = {'default': DefaultJSONProvider, 'orjson': ORJSONProvider}
 
 BASE_DIR = Path(__file__).parent
 # path_to_db = BASE_DIR / "store.db"
 
 app = Flask(__name__)
 # app.config['JSON_AS_ASCII'] = False
+# JSON-провайдер: 'orjson' (быстрый, тот же вывод) или 'default' (json из stdlib)
+app.config['JSON_PROVIDER'] = os.environ.get('QUOTES_JSON_PROVIDER', 'orjson')
+app.json = JSON_PROVIDERS[app.config['JSON_PROVIDER']](app)
 app.json.ensure_ascii = False
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{BASE_DIR / 'quotes.db'}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('QUOTES_DATABASE_URI', f"sqlite:///{BASE_DIR / 'quotes.db'}")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(model_class=Base)
+# Профиль SQLite (SQLITE_PROFILES): по умолчанию прежние настройки без WAL,
+# WAL и остальное - по QUOTES_SQLITE_PROFILE=production
+app.config['SQLITE_PROFILE'] = os.environ.get('QUOTES_SQLITE_PROFILE', 'default')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = SQLITE_PROFILES[app.config['SQLITE_PROFILE']]['engine_options']
+# Реплика для чтения: GET-запросы читают из нее, запись идет в основную БД
+if os.environ.get('QUOTES_READER_DATABASE_URI'):
+    app.config['SQLALCHEMY_BINDS'] = {READER_BIND: os.environ['QUOTES_READER_DATABASE_URI']}
+# /quotes/count и /quotes/count/authors по счетчикам authors.quotes_count (их ведут триггеры
+# на quotes при записи из любого процесса) вместо COUNT по таблице цитат
+app.config['QUOTES_COUNT_CACHE'] = False
+# Буфер голосов: голоса копятся в памяти и пишутся в БД пачками
+app.config['VOTE_BUFFER'] = False
+app.config['VOTE_BUFFER_FLUSH_INTERVAL'] = 1.0
+app.config['VOTE_BUFFER_MAX_PENDING'] = 1000
+# Кэш ответов GET: 'lru' - в памяти процесса, 'redis' - общий (RESPONSE_CACHE_URL)
+app.config['RESPONSE_CACHE'] = False
+app.config['RESPONSE_CACHE_BACKEND'] = 'lru'
+app.config['RESPONSE_CACHE_URL'] = 'redis://localhost:6379/0'
+app.config['RESPONSE_CACHE_MAX_SIZE'] = 10000
+app.config['RESPONSE_CACHE_TTL'] = 60
+# Одинаковые одновременные GET цитаты/автора выполняются один раз (single-flight);
+# выключено по умолчанию: ответ может не увидеть запись, закоммиченную во время запроса-лидера
+app.config['SINGLE_FLIGHT'] = False
+# Ограничение частоты запросов: корзина токенов на (клиент, обработчик); 'memory' - в
+# процессе, 'sqlite' - файл RATE_LIMIT_SQLITE_PATH, общий для процессов на одной машине
+app.config['RATE_LIMIT'] = False
+app.config['RATE_LIMIT_BACKEND'] = 'memory'
+app.config['RATE_LIMIT_SQLITE_PATH'] = os.path.join(app.instance_path, 'rate_limits.db')
+app.config['RATE_LIMIT_MAX_CLIENTS'] = 100000
+# обработчик -> (токенов в секунду, емкость корзины); RATE_LIMIT_DEFAULT - для остальных (None - без ограничения)
+app.config['RATE_LIMITS'] = {'up_quote': (1, 10), 'down_quote': (1, 10), 'random_quote': (10, 50)}
+app.config['RATE_LIMIT_DEFAULT'] = None
+# Метрики по обработчикам (/metrics) и журнал SQL-запросов дольше SLOW_QUERY_THRESHOLD секунд
+# (None - выключен; в QUOTES_SLOW_QUERY_THRESHOLD - пустое значение или off)
+app.config['METRICS'] = True
+slow_query_threshold = os.environ.get('QUOTES_SLOW_QUERY_THRESHOLD', '0.5').strip()
+app.config['SLOW_QUERY_THRESHOLD'] = None if slow_query_threshold.lower() in ('', 'off') else float(slow_query_threshold)
+# ASGI (asgi.py): потоки для маршрутов, которые по-прежнему обслуживает Flask
+app.config['ASGI_WSGI_THREADS'] = 10
+# Фоновые задачи (таблица jobs): потоки-исполнители в процессе, число попыток, пауза
+# перед повтором (удваивается с каждой попыткой) и аренда задачи исполнителем, секунды.
+# Исполнители запускаются при первой постановке задачи в процессе; задачи, оставшиеся
+# с прошлого запуска, выполняет и команда flask jobs work
+app.config['JOB_WORKERS'] = 2
+app.config['JOB_MAX_ATTEMPTS'] = 3
+app.config['JOB_RETRY_DELAY'] = 5.0
+app.config['JOB_LEASE'] = 300
+app.config['JOB_POLL_INTERVAL'] = 1.0
+# Журнал изменений (/changes/stream): как часто поток проверяет записи других процессов
+# и через сколько секунд без событий шлет комментарий, чтобы прокси не закрыл соединение
+app.config['CHANGES_POLL_INTERVAL'] = 1.0
+app.config['CHANGES_KEEPALIVE'] = 15.0
+# Read model: цитаты и авторы в памяти процесса (ReadModel), из них GET /quotes, /quotes/<id>,
+# /quotes/filter, /quotes/random и /authors/<id>/quotes; изменения берутся из журнала changes,
+# а если записей больше READ_MODEL_RELOAD_CHANGES - каталог загружается заново
+app.config['READ_MODEL'] = False
+app.config['READ_MODEL_RELOAD_CHANGES'] = 10000
+# Кэш JSON-фрагментов строк (FragmentCache): списки цитат и авторов и цитаты автора
+# склеиваются из готовых байтов строк вместо сериализации каждой строки
+app.config['FRAGMENT_CACHE'] = False
+app.config['FRAGMENT_CACHE_MAX_SIZE'] = 200000
+
+class RoutingSession(FlaskSession):
+    """Сессия, направляющая чтение в GET-запросах на реплику (bind READER_BIND)
+
+    Запись, а также все запросы после первой записи в том же HTTP-запросе идут
+    в основную БД, поэтому внутри запроса видны собственные изменения.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.reads_from_replica(clause):
+            return self._db.engines[READER_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def reads_from_replica(self, clause) -> bool:
+        if READER_BIND not in self._db.engines or not has_request_context() or request.method not in READ_METHODS:
+            return False
+        if self._flushing or (clause is not None and clause.is_dml):
+            self.info['wrote'] = True
+        return not self.info.get('wrote')
+
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 db.init_app(app)
 migrate = Migrate(app, db)
 
 
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Выполняет PRAGMA профиля SQLITE_PROFILE на каждом новом соединении"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PROFILES[app.config['SQLITE_PROFILE']]['pragmas'].items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+@atexit.register
+def optimize_sqlite_at_exit():
+    """PRAGMA optimize при остановке процесса обновляет статистику планировщика"""
+    if not SQLITE_PROFILES[app.config['SQLITE_PROFILE']]['optimize_on_exit']:
+        return
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # optimize - только подсказка планировщику: если БД занята процессом,
+            # который как раз пишет или тоже останавливается, статистику обновит следующий
+            try:
+                with db.engine.connect() as connection:
+                    connection.exec_driver_sql("PRAGMA optimize")
+            except OperationalError as e:
+                app.logger.warning("PRAGMA optimize skipped: %s", e.orig)
+
+
+with app.app_context():
+    for engine in db.engines.values():
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', apply_sqlite_pragmas)
+
+
 class AuthorModel(Base): # db.Model):
     __tablename__ = 'authors'
 
@@ -45,8 +274,22 @@ class AuthorModel(Base): # db.Model):
     surname: Mapped[str] = mapped_column(String(32), server_default='')
     quotes: Mapped[list['QuoteModel']] = relationship(back_populates='author', lazy='dynamic', cascade="all,delete-orphan")
     deleted: Mapped[bool] = mapped_column(default=False, server_default='false')
+    version: Mapped[int] = mapped_column(default=1, server_default='1', onupdate=literal_column('version') + 1)
+    updated_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(), default=func.now(), onupdate=func.now())
+    # Число неудаленных цитат автора; ведется триггерами на quotes (миграция 0009)
+    quotes_count: Mapped[int] = mapped_column(default=0, server_default='0')
+    # Счетчик и время изменений цитат автора (в том числе переносов и удалений);
+    # ведутся триггерами на quotes (миграция 0013)
+    quotes_version: Mapped[int] = mapped_column(default=0, server_default='0')
+    quotes_updated_at: Mapped[datetime.datetime | None] = mapped_column(DateTime())
     
-    __table_args__ = (UniqueConstraint('name', 'surname', name='AuthorFullNameConstrant'), )
+    __table_args__ = (
+        UniqueConstraint('name', 'surname', name='AuthorFullNameConstrant'),
+        Index('ix_authors_deleted_name', 'deleted', 'name'),
+        Index('ix_authors_deleted_surname', 'deleted', 'surname'),
+        Index('ix_authors_deleted_quotes_count', 'deleted', 'quotes_count', 'id'),
+        Index('ix_authors_deleted_id', 'deleted', 'id'),
+    )
     
     def __init__(self, name, surname):
         self.name = name
@@ -70,6 +313,20 @@ class QuoteModel(db.Model):
     rating: Mapped[int] = mapped_column(nullable=False, default=1, server_default='1')
     deleted: Mapped[bool] = mapped_column(default=False, server_default='false')
     created_datetime: Mapped[datetime.datetime] = mapped_column(DateTime(), server_default=func.now())
+    version: Mapped[int] = mapped_column(default=1, server_default='1', onupdate=literal_column('version') + 1)
+    updated_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(), default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('ix_quotes_author_id_deleted', 'author_id', 'deleted'),
+        Index('ix_quotes_live_id', 'id',
+              sqlite_where=sql_text('deleted = 0'), postgresql_where=sql_text('deleted = false')),
+        Index('ix_quotes_live_author_id', 'author_id',
+              sqlite_where=sql_text('deleted = 0'), postgresql_where=sql_text('deleted = false')),
+        Index('ix_quotes_live_rating', 'rating', 'id',
+              sqlite_where=sql_text('deleted = 0'), postgresql_where=sql_text('deleted = false')),
+        # id удаленных цитат не переиспользуются: иначе новая цитата получила бы ETag удаленной
+        {'sqlite_autoincrement': True},
+    )
 
     def __init__(self, author, text, rating=1):
         self.author = author
@@ -97,12 +354,2456 @@ class QuoteModel(db.Model):
             "rating": self.rating
         }
 
+
+class JobModel(Base):
+    """Фоновая задача: kind и payload - что выполнить, result/error - итог последней попытки"""
+    __tablename__ = 'jobs'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    payload: Mapped[dict] = mapped_column(JSON)
+    status: Mapped[str] = mapped_column(String(16), default=JOB_QUEUED, server_default=JOB_QUEUED)
+    attempts: Mapped[int] = mapped_column(default=0, server_default='0')
+    max_attempts: Mapped[int] = mapped_column(default=1, server_default='1')
+    run_after: Mapped[datetime.datetime] = mapped_column(DateTime())
+    locked_until: Mapped[datetime.datetime | None] = mapped_column(DateTime())
+    idempotency_key: Mapped[str | None] = mapped_column(String(255), unique=True)
+    result: Mapped[dict | None] = mapped_column(JSON)
+    error: Mapped[str | None] = mapped_column(String(1024))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime())
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime())
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+
+class CollectionVersionModel(Base):
+    """Версия коллекции (quotes, authors), растет при каждом изменении ее строк"""
+    __tablename__ = 'collection_versions'
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(default=1, server_default='1', onupdate=literal_column('version') + 1)
+    updated_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(), default=func.now(), onupdate=func.now())
+
+
+class ChangeModel(Base):
+    """Запись журнала изменений: строка entity с id entity_id менялась
+
+    Журнал только дополняется, seq растет с каждой записью. Записи добавляются в
+    транзакции изменения, поэтому в SQLite (один пишущий) порядок seq совпадает с
+    порядком коммитов и клиент /changes?since= не пропустит изменений.
+    """
+    __tablename__ = 'changes'
+
+    seq: Mapped[int] = mapped_column(primary_key=True)
+    entity: Mapped[str] = mapped_column(String(16))
+    entity_id: Mapped[int]
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(), server_default=func.now())
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class SecondsDateTime(TypeDecorator):
+    """Дата с точностью до секунды; в SQLite - строка как у datetime(): 'YYYY-MM-DD HH:MM:SS'"""
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and dialect.name == 'sqlite':
+            return value.isoformat(' ', 'seconds')
+        return value
+
+
+class whole_seconds(FunctionElement):
+    """Дата колонки без долей секунды.
+
+    В SQLite даты хранятся строками с микросекундами (значения из Python) и
+    без них (CURRENT_TIMESTAMP); datetime() приводит обе формы к одной.
+    """
+    type = SecondsDateTime()
+    inherit_cache = True
+
+
+@compiles(whole_seconds)
+def compile_whole_seconds(element, compiler, **kw):
+    return f"date_trunc('second', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(whole_seconds, 'sqlite')
+def compile_whole_seconds_sqlite(element, compiler, **kw):
+    return f"datetime({compiler.process(element.clauses, **kw)})"
+
+
+def filter_datetime(value: str) -> datetime.datetime:
+    """Дата из фильтра: без пояса в UTC (как CURRENT_TIMESTAMP) и с точностью до секунды"""
+    value = datetime.datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+QUOTE_FILTER_FIELDS = {
+    'id': (QuoteModel.id, int),
+    'author_id': (QuoteModel.author_id, int),
+    'text': (QuoteModel.text, str),
+    'rating': (QuoteModel.rating, int),
+    'created_datetime': (whole_seconds(QuoteModel.created_datetime), filter_datetime),
+    'author.name': (AuthorModel.name, str),
+    'author.surname': (AuthorModel.surname, str),
+}
+FILTER_OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'contains': lambda column, value: column.contains(value, autoescape=True),
+    'startswith': lambda column, value: column.startswith(value, autoescape=True),
+    'in': lambda column, values: column.in_(values),
+}
+# операторы только для текстовых полей
+TEXT_FILTER_OPERATORS = {'contains', 'startswith'}
+
+
+def parse_quote_filters(args) -> list[tuple[str, str, Any]]:
+    """Разбирает параметры вида поле[__оператор]=значение в тройки (поле, оператор, значение)
+
+    Поля и операторы берутся только из QUOTE_FILTER_FIELDS и FILTER_OPERATORS,
+    например rating__gte=3, author.name=Rick, text__contains=код,
+    created_datetime__lt=2025-04-01T00:00:00. Для оператора in значения
+    перечисляются через запятую. Даты сравниваются с точностью до секунды
+    в UTC (см. filter_datetime), contains и startswith - только для текста.
+    """
+    filters = []
+    for key, value in args:
+        field, _, op = key.partition('__')
+        op = op or 'eq'
+        if field not in QUOTE_FILTER_FIELDS or op not in FILTER_OPERATORS:
+            abort(HTTPStatus.BAD_REQUEST, f"Wrong filter {key}")
+        _, convert = QUOTE_FILTER_FIELDS[field]
+        if op in TEXT_FILTER_OPERATORS and convert is not str:
+            abort(HTTPStatus.BAD_REQUEST, f"Wrong filter {key}")
+        try:
+            if op == 'in':
+                value = [convert(item) for item in value.split(',')]
+            else:
+                value = convert(value)
+        except ValueError:
+            abort(HTTPStatus.BAD_REQUEST, f"Wrong value {key}={value}")
+        filters.append((field, op, value))
+    return filters
+
+
+def compile_quote_filters(args) -> list:
+    """Переводит параметры фильтра (см. parse_quote_filters) в условия WHERE"""
+    return [FILTER_OPERATORS[op](QUOTE_FILTER_FIELDS[field][0], value) for field, op, value in parse_quote_filters(args)]
+
+
+# Полнотекстовый индекс FTS5 по quotes.text (миграция 0007), rowid = quotes.id
+quotes_fts = table('quotes_fts', column('rowid'))
+
+
+def fts_match_query(q: str) -> str:
+    """Превращает строку поиска в запрос FTS5: все слова должны встретиться в тексте"""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+def select_quotes():
+    """Запрос цитат, загружающий авторов тем же SELECT (JOIN), без N+1"""
+    return db.select(QuoteModel).options(joinedload(QuoteModel.author))
+
+
+class RowJSON:
+    """Сериализует строки Row запроса по колонкам сразу в JSON, без ORM-объектов и словарей
+
+    shape - словарь ключ -> колонка или вложенный shape, как результат to_dict().
+    Ключи выводятся отсортированными, значения кодируются app.json, поэтому JSON
+    совпадает побайтно с jsonify(to_dict()) (компактный вид) и с app.json.dumps(to_dict())
+    (вид с пробелами, строки потоков stream).
+    """
+
+    def __init__(self, shape: dict):
+        self.shape = shape
+        self.columns = []
+        self._collect_columns(shape, '')
+        self.template = self._compile(shape, COMPACT_SEPARATORS)
+        self.spaced_template = self._compile(shape, (', ', ': '))
+
+    def _collect_columns(self, shape: dict, prefix: str):
+        for key in sorted(shape):
+            if isinstance(shape[key], dict):
+                self._collect_columns(shape[key], f"{prefix}{key}.")
+            else:
+                self.columns.append(shape[key].label(prefix + key))
+
+    def _compile(self, shape: dict, separators: tuple[str, str]) -> str:
+        item_separator, key_separator = separators
+        parts = []
+        for key in sorted(shape):
+            value = self._compile(shape[key], separators) if isinstance(shape[key], dict) else '{}'
+            parts.append(f'{json.dumps(key)}{key_separator}{value}')
+        return '{{' + item_separator.join(parts) + '}}'
+
+    @staticmethod
+    def encode(value) -> str:
+        if value is None:
+            return 'null'
+        if value is True or value is False:
+            return 'true' if value else 'false'
+        if type(value) is int:
+            return str(value)
+        return app.json.dumps(value, separators=COMPACT_SEPARATORS)
+
+    def select(self):
+        return db.select(*self.columns)
+
+    def dumps(self, row) -> str:
+        return self.template.format(*map(self.encode, row))
+
+    def dumps_spaced(self, row) -> str:
+        return self.spaced_template.format(*map(self.encode, row))
+
+    def dumps_list(self, rows) -> str:
+        return '[' + ','.join(map(self.dumps, rows)) + ']'
+
+    def to_dict(self, row) -> dict:
+        """Словарь той же формы (для вывода с отступами в режиме отладки)"""
+        return self._build(self.shape, iter(row))
+
+    def _build(self, shape: dict, values) -> dict:
+        return {key: self._build(shape[key], values) if isinstance(shape[key], dict) else next(values)
+                for key in sorted(shape)}
+
+
+AUTHOR_JSON = RowJSON({'id': AuthorModel.id, 'name': AuthorModel.name, 'surname': AuthorModel.surname})
+QUOTE_JSON = RowJSON({
+    'id': QuoteModel.id,
+    'author_id': QuoteModel.author_id,
+    'author': {'id': AuthorModel.id, 'name': AuthorModel.name, 'surname': AuthorModel.surname},
+    'text': QuoteModel.text,
+    'rating': QuoteModel.rating,
+    'created_datetime': QuoteModel.created_datetime,
+})
+QUOTE_SHORT_JSON = RowJSON({
+    'id': QuoteModel.id, 'author_id': QuoteModel.author_id, 'text': QuoteModel.text, 'rating': QuoteModel.rating})
+AUTHOR_TOP_JSON = RowJSON({
+    'id': AuthorModel.id, 'name': AuthorModel.name, 'surname': AuthorModel.surname,
+    'quotes_count': AuthorModel.quotes_count})
+# Топы: обратный проход по индексам ix_quotes_live_rating и
+# ix_authors_deleted_quotes_count; при равенстве первыми идут более новые
+TOP_QUOTES_ORDER = (QuoteModel.rating.desc(), QuoteModel.id.desc())
+TOP_AUTHORS_ORDER = (AuthorModel.quotes_count.desc(), AuthorModel.id.desc())
+
+
+def select_quote_rows():
+    """Колонки цитат с авторами для QUOTE_JSON"""
+    return QUOTE_JSON.select().join_from(QuoteModel, AuthorModel, QuoteModel.author)
+
+
+def json_is_compact() -> bool:
+    """Выводит ли jsonify компактный JSON (не режим отладки с отступами)"""
+    return not ((app.json.compact is None and app.debug) or app.json.compact is False)
+
+
+ExecutedQuery = namedtuple('ExecutedQuery', ['statement', 'parameters', 'engine'])
+
+
+@contextmanager
+def count_queries():
+    """Собирает SQL-запросы (ExecutedQuery), выполненные внутри блока with.
+
+    Слушает все движки db.engines - основной и реплику для чтения (READER_BIND).
+    Нужен приложению контекст (app.app_context()).
+    """
+    queries = []
+    engines = {id(engine): engine for engine in db.engines.values()}.values()
+
+    def listener(engine):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            queries.append(ExecutedQuery(statement, parameters, engine))
+        return before_cursor_execute
+
+    listeners = [(engine, listener(engine)) for engine in engines]
+    for engine, before_cursor_execute in listeners:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        for engine, before_cursor_execute in listeners:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def assert_num_queries(expected: int):
+    """Проверяет в тестах, что внутри блока with выполнено ровно expected SQL-запросов"""
+    with count_queries() as queries:
+        yield queries
+    if len(queries) != expected:
+        raise AssertionError(f"Expected {expected} queries, got {len(queries)}:\n"
+                             + "\n".join(query.statement for query in queries))
+
+
+class QuoteIdPool:
+    """Массив id неудаленных цитат для выбора случайной цитаты за O(1).
+
+    Массив загружается из БД при первом обращении и дальше поддерживается
+    обработчиками создания, удаления и восстановления цитат. seq - последняя
+    учтенная запись журнала изменений: по ней live_quote_ids() добирает
+    изменения, сделанные другими процессами.
+    """
+
+    def __init__(self):
+        self._ids: list[int] = []
+        self._positions: dict[int, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.seq = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, ids, seq: int | None = None):
+        with self._lock:
+            self._ids = list(ids)
+            self._positions = {quote_id: pos for pos, quote_id in enumerate(self._ids)}
+            self._loaded = True
+            self.seq = seq
+
+    def reset(self):
+        with self._lock:
+            self._ids = []
+            self._positions = {}
+            self._loaded = False
+            self.seq = None
+
+    def add_many(self, ids):
+        with self._lock:
+            if self._loaded:
+                self._add(ids)
+
+    def discard_many(self, ids):
+        with self._lock:
+            self._discard(ids)
+
+    def apply_changes(self, since: int, seq: int, changed_ids: set[int], live_ids: set[int]):
+        """Применяет записи журнала после since до seq: из цитат changed_ids неудаленные - live_ids"""
+        with self._lock:
+            # пул перезагружен или эти записи уже применил другой поток
+            if not self._loaded or self.seq != since:
+                return
+            self._discard(changed_ids - live_ids)
+            self._add(live_ids)
+            self.seq = seq
+
+    def _add(self, ids):
+        for quote_id in ids:
+            if quote_id not in self._positions:
+                self._positions[quote_id] = len(self._ids)
+                self._ids.append(quote_id)
+
+    def _discard(self, ids):
+        for quote_id in ids:
+            pos = self._positions.pop(quote_id, None)
+            if pos is None:
+                continue
+            last_id = self._ids.pop()
+            if last_id != quote_id:
+                self._ids[pos] = last_id
+                self._positions[last_id] = pos
+
+    def discard(self, quote_id: int):
+        self.discard_many((quote_id,))
+
+    def sample(self, n: int = 1) -> list[int]:
+        with self._lock:
+            return sample(self._ids, min(n, len(self._ids)))
+
+    def __contains__(self, quote_id: int) -> bool:
+        return quote_id in self._positions
+
+    def __len__(self):
+        return len(self._ids)
+
+
+quote_ids = QuoteIdPool()
+
+
+class VoteBuffer:
+    """Копит голоса за цитаты в памяти, суммируя их по id цитаты
+
+    Буфер пишется в БД, когда голосов набралось VOTE_BUFFER_MAX_PENDING или
+    очередной голос пришел позже VOTE_BUFFER_FLUSH_INTERVAL после записи. Первый
+    голос после записи заводит таймер (поток-демон), который запишет буфер через
+    VOTE_BUFFER_FLUSH_INTERVAL, даже если новых голосов не будет.
+    """
+
+    def __init__(self):
+        self._deltas: dict[int, int] = {}
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def add(self, quote_id: int, delta: int) -> bool:
+        """Добавляет голос; возвращает True, если буфер пора записать в БД"""
+        with self._lock:
+            first = not self._pending
+            self._deltas[quote_id] = self._deltas.get(quote_id, 0) + delta
+            self._pending += 1
+            due = (self._pending >= app.config['VOTE_BUFFER_MAX_PENDING']
+                   or time.monotonic() - self._flushed_at >= app.config['VOTE_BUFFER_FLUSH_INTERVAL'])
+        if first and not due:
+            timer = threading.Timer(app.config['VOTE_BUFFER_FLUSH_INTERVAL'], self._flush_on_timer)
+            timer.daemon = True
+            timer.start()
+        return due
+
+    def _flush_on_timer(self):
+        if not self._pending:
+            return
+        try:
+            with app.app_context():
+                flush_votes()
+        except Exception:
+            app.logger.exception("Vote buffer flush error")
+
+    def drain(self) -> dict[int, int]:
+        with self._lock:
+            deltas = {quote_id: delta for quote_id, delta in self._deltas.items() if delta}
+            self._deltas = {}
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+            return deltas
+
+
+vote_buffer = VoteBuffer()
+
+
+def utcnow() -> datetime.datetime:
+    """Текущее время UTC без часового пояса, как CURRENT_TIMESTAMP в SQLite"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class JobQueue:
+    """Очередь фоновых задач в таблице jobs, выполняемых потоками процесса
+
+    Исполнитель забирает задачу условным UPDATE (аренда на JOB_LEASE секунд),
+    поэтому несколько процессов не выполнят ее дважды, а задача процесса,
+    упавшего посреди работы, снова станет доступна по истечении аренды.
+    Обработчики задач должны быть идемпотентными. ValueError из обработчика -
+    ошибка данных, задача сразу завершается со статусом failed; остальные
+    исключения повторяются до max_attempts раз.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._threads: list[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def handler(self, kind: str):
+        """Регистрирует функцию handler(**payload) -> dict для задач вида kind"""
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(app.config['JOB_WORKERS']):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, kind: str, payload: dict, idempotency_key: str | None = None) -> JobModel:
+        """Сохраняет задачу и будит исполнителей; с тем же idempotency_key возвращает уже созданную"""
+        if idempotency_key:
+            job = db.session.execute(db.select(JobModel).filter_by(idempotency_key=idempotency_key)).scalar_one_or_none()
+            if job is not None:
+                return job
+        now = utcnow()
+        job = JobModel(kind=kind, payload=payload, idempotency_key=idempotency_key, run_after=now,
+                       max_attempts=app.config['JOB_MAX_ATTEMPTS'], created_at=now, updated_at=now)
+        db.session.add(job)
+        db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def _work(self):
+        while True:
+            try:
+                with app.app_context():
+                    job = self.claim()
+                    if job is not None:
+                        self.run(job)
+                        continue
+            except Exception:
+                app.logger.exception("Job worker error")
+            self._wakeup.wait(app.config['JOB_POLL_INTERVAL'])
+            self._wakeup.clear()
+
+    def claim(self):
+        """Забирает первую готовую задачу (или задачу с истекшей арендой); None, если таких нет
+
+        Сначала кандидат выбирается SELECT: исполнитель без задач не берет
+        блокировку записи SQLite. UPDATE с тем же условием забирает кандидата,
+        только если его не забрал другой исполнитель; иначе ищется следующий.
+        """
+        now = utcnow()
+        claimable = or_(and_(JobModel.status == JOB_QUEUED, JobModel.run_after <= now),
+                        and_(JobModel.status == JOB_RUNNING, JobModel.locked_until < now))
+        while True:
+            job_id = db.session.execute(
+                db.select(JobModel.id).where(claimable).order_by(JobModel.id).limit(1)).scalar_one_or_none()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            job = db.session.execute(
+                db.update(JobModel)
+                .where(JobModel.id == job_id, claimable)
+                .values(status=JOB_RUNNING, attempts=JobModel.attempts + 1, updated_at=now,
+                        locked_until=now + datetime.timedelta(seconds=app.config['JOB_LEASE']))
+                .returning(JobModel.id, JobModel.kind, JobModel.payload, JobModel.attempts, JobModel.max_attempts)
+            ).one_or_none()
+            db.session.commit()
+            if job is not None:
+                return job
+
+    def run(self, job):
+        values = {'locked_until': None}
+        try:
+            values.update(status=JOB_DONE, result=self._handlers[job.kind](**job.payload), error=None)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception("Job %s (%s) failed, attempt %s of %s", job.id, job.kind, job.attempts, job.max_attempts)
+            values['error'] = f"{type(e).__name__}: {e}"[:1024]
+            if isinstance(e, (ValueError, KeyError)) or job.attempts >= job.max_attempts:
+                values['status'] = JOB_FAILED
+            else:
+                delay = app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+                values.update(status=JOB_QUEUED, run_after=utcnow() + datetime.timedelta(seconds=delay))
+        values['updated_at'] = utcnow()
+        db.session.execute(db.update(JobModel).where(JobModel.id == job.id).values(**values))
+        db.session.commit()
+
+
+job_queue = JobQueue()
+
+
+def prometheus_labels(names: tuple, values: tuple) -> str:
+    """Метки Prometheus {name="value",...} с экранированием значений"""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Счетчик Prometheus с метками"""
+
+    def __init__(self, name: str, description: str, label_names: tuple):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{prometheus_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками: накопленные счетчики по границам buckets, сумма и количество"""
+
+    def __init__(self, name: str, description: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            counts = self._values.setdefault(labels, [0] * len(self.buckets) + [0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, counts in sorted(self._values.items()):
+                bucket_names = self.label_names + ('le',)
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{prometheus_labels(bucket_names, labels + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{prometheus_labels(bucket_names, labels + ('+Inf',))} {counts[-1]}")
+                lines.append(f"{self.name}_sum{prometheus_labels(self.label_names, labels)} {counts[-2]}")
+                lines.append(f"{self.name}_count{prometheus_labels(self.label_names, labels)} {counts[-1]}")
+        return lines
+
+
+class Metrics:
+    """Метрики процесса по обработчикам для /metrics (у каждого процесса сервера свои)"""
+
+    def __init__(self):
+        self.requests = Counter('quotes_http_requests_total', 'HTTP requests by endpoint, method and status',
+                                ('endpoint', 'method', 'status'))
+        self.request_duration = Histogram('quotes_http_request_duration_seconds', 'Request latency',
+                                          ('endpoint',), LATENCY_BUCKETS)
+        self.response_size = Histogram('quotes_http_response_size_bytes', 'Response body size',
+                                       ('endpoint',), SIZE_BUCKETS)
+        self.sql_statements = Histogram('quotes_sql_statements_per_request', 'SQL statements executed per request',
+                                        ('endpoint',), STATEMENT_BUCKETS)
+        self.sql_duration = Histogram('quotes_sql_duration_seconds_per_request', 'Time spent in SQL per request',
+                                      ('endpoint',), LATENCY_BUCKETS)
+        self.slow_queries = Counter('quotes_sql_slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD',
+                                    ('endpoint',))
+        self.cache_requests = Counter('quotes_response_cache_requests_total', 'Response cache lookups by result',
+                                      ('namespace', 'result'))
+        self.coalesced_requests = Counter('quotes_coalesced_requests_total',
+                                          'GET requests answered with a concurrent identical request\'s response',
+                                          ('endpoint',))
+
+    def observe_request(self, stats: dict, method: str, status: int, duration: float, size: int | None):
+        endpoint = stats['endpoint']
+        self.requests.inc((endpoint, method, status))
+        self.request_duration.observe((endpoint,), duration)
+        if size is not None:
+            self.response_size.observe((endpoint,), size)
+        self.sql_statements.observe((endpoint,), stats['statements'])
+        self.sql_duration.observe((endpoint,), stats['sql_time'])
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.requests, self.request_duration, self.response_size, self.sql_statements,
+                       self.sql_duration, self.slow_queries, self.cache_requests, self.coalesced_requests):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+# SQL-статистика текущего запроса: endpoint, statements, sql_time (None вне запроса)
+request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def new_request_stats(endpoint: str | None) -> dict:
+    return {'endpoint': endpoint or UNMATCHED_ENDPOINT, 'statements': 0, 'sql_time': 0.0}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    """Учитывает запрос в статистике HTTP-запроса и пишет в лог медленные запросы"""
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats['statements'] += 1
+        stats['sql_time'] += elapsed
+    threshold = app.config['SLOW_QUERY_THRESHOLD']
+    if threshold is not None and elapsed >= threshold:
+        endpoint = stats['endpoint'] if stats is not None else UNMATCHED_ENDPOINT
+        metrics.slow_queries.inc((endpoint,))
+        app.logger.warning("Slow query (%.3f s) in %s: %s", elapsed, endpoint, statement)
+
+
+@event.listens_for(Engine, 'handle_error')
+def discard_query_timer(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get('query_started'):
+        exception_context.connection.info['query_started'].pop()
+
+
+class LRUCache:
+    """Кэш в памяти процесса с вытеснением давно не используемых записей и TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._entries.get(key, (None, 0))[1] + 1
+            # счетчики поколений не вытесняются и не устаревают
+            self._entries[key] = (float('inf'), value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Кэш в Redis (или совместимом сервере), общий для всех процессов приложения"""
+
+    def __init__(self, url: str, ttl: float):
+        import redis  # необязательная зависимость, нужна только для этого бэкенда
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        if value is None:
+            return None
+        header, _, body = value.partition(b'\n')
+        if header.isdigit():
+            return int(header)
+        status, mimetype = header.decode().split(' ', 1)
+        return body, int(status), mimetype
+
+    def set(self, key: str, value):
+        body, status, mimetype = value
+        self._redis.set(key, f"{status} {mimetype}\n".encode() + body, px=int(self.ttl * 1000))
+
+    def delete(self, *keys: str):
+        if keys:
+            self._redis.delete(*keys)
+
+    def incr(self, key: str) -> int:
+        return self._redis.incr(key)
+
+    def clear(self):
+        self._redis.flushdb()
+
+
+class ResponseCache:
+    """Кэш ответов GET по ресурсам (quote, author, author_quotes) и спискам (quotes, authors)
+
+    Ключ записи включает ETag ответа (версию строки или коллекции из
+    conditional), поэтому запись другого процесса, импорта или SQL в обход
+    приложения дает новый ключ, а не старое тело под новым ETag. Номер
+    поколения пространства имен в ключе сбрасывает целое пространство
+    (например, все списки цитат) одним incr; старые записи вытесняются по
+    размеру и TTL.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._epoch = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if app.config['RESPONSE_CACHE_BACKEND'] == 'redis':
+                self._backend = RedisCache(app.config['RESPONSE_CACHE_URL'], app.config['RESPONSE_CACHE_TTL'])
+            else:
+                self._backend = LRUCache(app.config['RESPONSE_CACHE_MAX_SIZE'], app.config['RESPONSE_CACHE_TTL'])
+        return self._backend
+
+    @property
+    def epoch(self) -> int:
+        """Растет при каждой инвалидации; по нему видно, что ответ мог устареть, пока строился"""
+        return self._epoch
+
+    def key(self, namespace: str, name, etag: str) -> str:
+        generation = self.backend.get(f"generation:{namespace}") or 0
+        return f"{namespace}:{generation}:{name}:{etag}"
+
+    def get(self, key: str):
+        entry = self.backend.get(key)
+        metrics.cache_requests.inc((key.split(':', 1)[0], 'miss' if entry is None else 'hit'))
+        return entry
+
+    def set(self, key: str, entry, epoch: int):
+        if epoch == self._epoch:
+            self.backend.set(key, entry)
+
+    def invalidate(self, quotes=(), authors=()):
+        """Сбрасывает записи по изменившимся цитатам (пары id цитаты, id автора) и авторам
+
+        Записи отдельных ресурсов сбрасывать не нужно: у измененной строки
+        новый ETag, а значит, и новый ключ.
+        """
+        self._epoch += 1
+        if quotes or authors:
+            self.backend.incr("generation:quotes")
+        if authors:
+            # автор входит в ответы по отдельным цитатам
+            self.backend.incr("generation:quote")
+            self.backend.incr("generation:authors")
+
+
+response_cache = ResponseCache()
+
+
+def cached(namespace: str, key_arg: str | None = None):
+    """Кэширует ответы 200 обработчика GET
+
+    key_arg - имя аргумента обработчика с id ресурса; без него ключом служит URL
+    с параметрами запроса. К ключу добавляется ETag из conditional (снаружи
+    этого декоратора); ответы без версии и потоковые (stream) не кэшируются.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            etag = g.pop('response_etag', None)
+            if not app.config['RESPONSE_CACHE'] or etag is None or request.args.get('stream'):
+                return view(**kwargs)
+            key = response_cache.key(namespace, kwargs[key_arg] if key_arg else request.full_path, etag)
+            entry = response_cache.get(key)
+            if entry is not None:
+                body, status, mimetype = entry
+                return Response(body, status=status, mimetype=mimetype)
+            epoch = response_cache.epoch
+            response = app.make_response(view(**kwargs))
+            if response.status_code == HTTPStatus.OK and not response.is_streamed:
+                response_cache.set(key, (response.get_data(), response.status_code, response.mimetype), epoch)
+            return response
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    """Выполняет функцию один раз на ключ: одновременные вызовы с тем же ключом ждут ее результат"""
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Результат func() и признак того, что он получен от чужого вызова"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+        if not leader:
+            call['done'].wait()
+            if 'result' in call:
+                return call['result'], True
+            # у ведущего вызова исключение - выполняем сами
+            return func(), False
+        try:
+            call['result'] = func()
+            return call['result'], False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(view):
+    """Объединяет одинаковые одновременные GET (URL и заголовки условного запроса)
+
+    Обработчик выполняется один раз, остальные запросы получают копию его
+    ответа (тело, статус, заголовки). Включается SINGLE_FLIGHT.
+    """
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        if not app.config['SINGLE_FLIGHT']:
+            return view(**kwargs)
+        key = (request.full_path, request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'))
+
+        def respond():
+            response = app.make_response(view(**kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        (body, status, headers), shared = single_flight.do(key, respond)
+        if shared:
+            metrics.coalesced_requests.inc((request.endpoint,))
+        return Response(body, status=status, headers=headers)
+    return wrapper
+
+
+def refill_bucket(tokens: float, elapsed: float, rate: float, capacity: float) -> tuple[float, float]:
+    """Корзина токенов: пополняет на elapsed * rate и берет токен
+
+    Возвращает (оставшиеся токены, через сколько секунд появится токен; 0 - запрос разрешен).
+    """
+    tokens = min(capacity, tokens + elapsed * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class TokenBuckets:
+    """Корзины токенов в памяти процесса, не больше max_size (давно не использованные вытесняются)"""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, retry_after = refill_bucket(tokens, now - updated, rate, capacity)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_size:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class SQLiteTokenBuckets:
+    """Корзины токенов в отдельном файле SQLite, общие для процессов на одной машине"""
+
+    PRUNE_EVERY = 1000
+    PRUNE_IDLE = 3600
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets "
+                               "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID")
+            self._local.connection = connection
+            self._local.calls = 0
+        return connection
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        connection = self.connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row or (capacity, now)
+            tokens, retry_after = refill_bucket(tokens, max(0.0, now - updated), rate, capacity)
+            connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+            self._local.calls += 1
+            if self._local.calls % self.PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - self.PRUNE_IDLE,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+class RateLimiter:
+    """Ограничение частоты запросов клиента к обработчику по RATE_LIMITS"""
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+                self._backend = SQLiteTokenBuckets(app.config['RATE_LIMIT_SQLITE_PATH'])
+            else:
+                self._backend = TokenBuckets(app.config['RATE_LIMIT_MAX_CLIENTS'])
+        return self._backend
+
+    def retry_after(self, client: str, endpoint: str) -> float:
+        """0, если запрос разрешен, иначе через сколько секунд повторить"""
+        limit = app.config['RATE_LIMITS'].get(endpoint, app.config['RATE_LIMIT_DEFAULT'])
+        if limit is None:
+            return 0.0
+        rate, capacity = limit
+        return self.backend.take(f"{client}:{endpoint}", rate, capacity)
+
+
+rate_limiter = RateLimiter()
+
+
+def too_many_requests(retry_after: float) -> tuple[str, dict]:
+    """Сообщение и заголовок Retry-After (целые секунды, с округлением вверх) для ответа 429"""
+    seconds = math.ceil(retry_after)
+    return f"Too many requests, retry in {seconds} s", {'Retry-After': str(seconds)}
+
+
+def changed_collections(quotes, authors) -> set[str]:
+    """Коллекции, версии которых меняются вместе с цитатами/авторами (автор входит в ответы по цитатам)"""
+    names = set()
+    if quotes or authors:
+        names.add('quotes')
+    if authors:
+        names.add('authors')
+    return names
+
+
+def bump_collection_versions(connection, names):
+    if names:
+        connection.execute(db.update(CollectionVersionModel)
+                           .where(CollectionVersionModel.name.in_(sorted(names)))
+                           .values(version=CollectionVersionModel.version + 1))
+
+
+def log_changes(session, quotes, authors):
+    """Добавляет в журнал изменений записи о цитатах (пары id, id автора) и авторах"""
+    rows = [{'entity': CHANGE_QUOTE, 'entity_id': quote_id} for quote_id in sorted({quote_id for quote_id, _ in quotes})]
+    rows += [{'entity': CHANGE_AUTHOR, 'entity_id': author_id} for author_id in sorted(authors)]
+    if rows:
+        session.connection().execute(db.insert(ChangeModel), rows)
+        session.info['changes_logged'] = True
+
+
+def record_changes(quotes=(), authors=(), session=None):
+    """Учитывает изменения, сделанные в обход ORM (UPDATE/INSERT/DELETE)
+
+    Повышает версии коллекций и пишет журнал изменений в текущей транзакции,
+    запоминает строки для сброса кэша после коммита. quotes - пары (id цитаты, id автора).
+    session - сессия вне контекста Flask (по умолчанию db.session).
+    """
+    session = session or db.session
+    quotes, authors = set(quotes), set(authors)
+    pending = session.info.setdefault('cache_invalidation', {'quotes': set(), 'authors': set()})
+    pending['quotes'].update(quotes)
+    pending['authors'].update(authors)
+    bump_collection_versions(session.connection(), changed_collections(quotes, authors))
+    log_changes(session, quotes, authors)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session, flush_context):
+    """Собирает измененные ORM-объекты цитат и авторов"""
+    pending = session.info.setdefault('cache_invalidation', {'quotes': set(), 'authors': set()})
+    quotes, authors, changed_authors = set(), set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, QuoteModel):
+            quotes.add((obj.id, obj.author_id))
+            for old_author_id in inspect(obj).attrs.author_id.history.deleted:
+                quotes.add((obj.id, old_author_id))
+        elif isinstance(obj, AuthorModel):
+            authors.add(obj.id)
+            # автор попадает в dirty и при добавлении цитаты в author.quotes - такое не пишем в журнал
+            if obj not in session.dirty or session.is_modified(obj, include_collections=False):
+                changed_authors.add(obj.id)
+    pending['quotes'].update(quotes)
+    pending['authors'].update(authors)
+    bump_collection_versions(session.connection(), changed_collections(quotes, authors))
+    log_changes(session, quotes, changed_authors)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_cache_invalidation(session):
+    pending = session.info.pop('cache_invalidation', None)
+    if pending and app.config['RESPONSE_CACHE']:
+        response_cache.invalidate(pending['quotes'], pending['authors'])
+    if pending and app.config['FRAGMENT_CACHE']:
+        fragment_cache.discard({quote_id for quote_id, _ in pending['quotes']}, pending['authors'])
+    if session.info.pop('changes_logged', False):
+        change_notifier.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_cache_invalidation(session):
+    session.info.pop('cache_invalidation', None)
+    session.info.pop('changes_logged', None)
+
+
+class ChangeNotifier:
+    """Будит потоки /changes/stream, когда закоммичены новые записи журнала изменений
+
+    Потоки Flask ждут wait(), асинхронные обработчики asgi.py подписываются через
+    subscribe(). Коммиты других процессов сюда не приходят: их потоки замечают
+    опросом раз в CHANGES_POLL_INTERVAL.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._listeners = set()
+        self.generation = 0
+
+    def notify(self):
+        with self._condition:
+            self.generation += 1
+            self._condition.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def wait(self, generation: int, timeout: float):
+        """Ждет, пока generation не устареет, но не дольше timeout секунд"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.generation != generation, timeout)
+
+    def subscribe(self, listener):
+        with self._condition:
+            self._listeners.add(listener)
+
+    def unsubscribe(self, listener):
+        with self._condition:
+            self._listeners.discard(listener)
+
+
+change_notifier = ChangeNotifier()
+
+
+def changes_args(args, last_event_id: str | None) -> tuple[int, int]:
+    """Проверяет since (по умолчанию - заголовок Last-Event-ID) и limit запроса журнала"""
+    since = args.get('since', last_event_id or '0')
+    limit = args.get('limit', str(CHANGES_LIMIT_DEFAULT))
+    if not since.isdigit():
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value since={since}")
+    if not limit.isdigit() or int(limit) not in range(1, PAGE_LIMIT_MAX + 1):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value limit={limit}, expected 1..{PAGE_LIMIT_MAX}")
+    return int(since), int(limit)
+
+
+def change_items(since: int, limit: int, session=None) -> list[dict]:
+    """Записи журнала после since с текущим состоянием строк
+
+    Строка читается на момент запроса: у нескольких записей об одной строке data
+    одинаковая, а удаленная строка дает op 'delete' и data null.
+    """
+    session = session or db.session
+    changes = session.execute(
+        db.select(ChangeModel.seq, ChangeModel.entity, ChangeModel.entity_id)
+        .where(ChangeModel.seq > since).order_by(ChangeModel.seq).limit(limit)
+    ).all()
+    ids = {CHANGE_QUOTE: set(), CHANGE_AUTHOR: set()}
+    for _, entity, entity_id in changes:
+        ids[entity].add(entity_id)
+    queries = {
+        CHANGE_QUOTE: (QUOTE_JSON, select_quote_rows().where(QuoteModel.id.in_(ids[CHANGE_QUOTE]), QuoteModel.deleted == False)),
+        CHANGE_AUTHOR: (AUTHOR_JSON, AUTHOR_JSON.select().where(AuthorModel.id.in_(ids[CHANGE_AUTHOR]), AuthorModel.deleted == False)),
+    }
+    data = {}
+    for entity, (row_json, query) in queries.items():
+        if ids[entity]:
+            data[entity] = {item['id']: item for item in map(row_json.to_dict, session.execute(query))}
+    items = []
+    for seq, entity, entity_id in changes:
+        item = data.get(entity, {}).get(entity_id)
+        items.append({'seq': seq, 'type': entity, 'id': entity_id, 'op': 'upsert' if item else 'delete', 'data': item})
+    return items
+
+
+def change_event(item: dict) -> str:
+    """Событие SSE: id - seq (его браузер пришлет в Last-Event-ID при переподключении)"""
+    return f"id: {item['seq']}\nevent: {item['type']}\ndata: {app.json.dumps(item, separators=COMPACT_SEPARATORS)}\n\n"
+
+
+SSE_KEEPALIVE = ': keep-alive\n\n'
+
+
+def change_events(since: int):
+    """Генератор событий SSE: записи журнала после since, затем новые по мере коммитов"""
+    yield SSE_KEEPALIVE
+    last_sent = time.monotonic()
+    while True:
+        generation = change_notifier.generation
+        items = change_items(since, PAGE_LIMIT_MAX)
+        # конец транзакции: следующее чтение увидит новые коммиты (снимок WAL)
+        db.session.rollback()
+        for item in items:
+            yield change_event(item)
+            since = item['seq']
+        if len(items) == PAGE_LIMIT_MAX:
+            continue
+        if items:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= app.config['CHANGES_KEEPALIVE']:
+            yield SSE_KEEPALIVE
+            last_sent = time.monotonic()
+        change_notifier.wait(generation, app.config['CHANGES_POLL_INTERVAL'])
+
+
+def make_etag(*parts) -> str:
+    return '-'.join(str(part) for part in parts)
+
+
+def collection_version(name: str, session=None):
+    """ETag и Last-Modified коллекции по ее версии"""
+    row = (session or db.session).execute(
+        db.select(CollectionVersionModel.version, CollectionVersionModel.updated_at).filter_by(name=name)).one_or_none()
+    if row is None:
+        return None
+    return make_etag(name, row.version), row.updated_at
+
+
+def quote_version(quote_id: int, session=None):
+    """ETag и Last-Modified цитаты: версии цитаты и ее автора, без загрузки текста"""
+    row = (session or db.session).execute(
+        db.select(QuoteModel.version, QuoteModel.updated_at, QuoteModel.created_datetime,
+                  AuthorModel.version.label('author_version'), AuthorModel.updated_at.label('author_updated_at'))
+        .join(QuoteModel.author)
+        .where(QuoteModel.id == quote_id, QuoteModel.deleted == False)).one_or_none()
+    if row is None:
+        return None
+    updated = [value for value in (row.updated_at or row.created_datetime, row.author_updated_at) if value]
+    return make_etag('quote', quote_id, row.version, row.author_version), max(updated, default=None)
+
+
+def author_version(author_id: int, session=None):
+    """ETag и Last-Modified автора"""
+    row = (session or db.session).execute(
+        db.select(AuthorModel.version, AuthorModel.updated_at)
+        .where(AuthorModel.id == author_id, AuthorModel.deleted == False)).one_or_none()
+    if row is None:
+        return None
+    return make_etag('author', author_id, row.version), row.updated_at
+
+
+def author_quotes_version(author_id: int, session=None):
+    """ETag и Last-Modified цитат автора: версия автора и счетчик изменений его цитат"""
+    row = (session or db.session).execute(
+        db.select(AuthorModel.version, AuthorModel.updated_at, AuthorModel.quotes_version, AuthorModel.quotes_updated_at)
+        .where(AuthorModel.id == author_id, AuthorModel.deleted == False)).one_or_none()
+    if row is None:
+        return None
+    updated = [value for value in (row.updated_at, row.quotes_updated_at) if value]
+    return make_etag('author', author_id, row.version, 'quotes', row.quotes_version), max(updated, default=None)
+
+
+def http_validators(version) -> tuple[str, datetime.datetime | None]:
+    """ETag и Last-Modified (с точностью до секунды, в UTC) из результата функции версии"""
+    etag, last_modified = version
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=datetime.timezone.utc)
+    return etag, last_modified
+
+
+def is_not_modified(etag: str, last_modified, if_none_match, if_modified_since) -> bool:
+    """Выполнено ли условие запроса (If-None-Match важнее If-Modified-Since), т.е. ответ 304"""
+    if if_none_match:
+        return if_none_match.contains(etag)
+    return last_modified is not None and if_modified_since is not None and last_modified <= if_modified_since
+
+
+def conditional(version_func):
+    """Добавляет к ответам GET ETag/Last-Modified и отвечает 304 на If-None-Match/If-Modified-Since
+
+    version_func(**kwargs) возвращает (etag, last_modified) или None, если
+    ресурса нет; тогда обработчик вызывается как обычно.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            version = version_func(**kwargs)
+            if version is None:
+                g.response_etag = None
+                return view(**kwargs)
+            etag, last_modified = http_validators(version)
+            # ключ записи в кэше ответов (cached): тело соответствует этой версии
+            g.response_etag = etag
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                response = Response(status=HTTPStatus.NOT_MODIFIED)
+            else:
+                response = app.make_response(view(**kwargs))
+                if response.status_code != HTTPStatus.OK:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def live_quote_ids(session=None) -> QuoteIdPool:
+    """Возвращает пул id цитат: загружает его из БД или применяет новые записи журнала изменений
+
+    Так в пул попадают цитаты, созданные, удаленные и восстановленные другими
+    процессами; если записей больше QUOTE_POOL_RELOAD_CHANGES, пул загружается заново.
+    """
+    session = session or db.session
+    since = quote_ids.seq
+    if since is not None:
+        changes = session.execute(
+            db.select(ChangeModel.seq, ChangeModel.entity, ChangeModel.entity_id)
+            .where(ChangeModel.seq > since).order_by(ChangeModel.seq).limit(QUOTE_POOL_RELOAD_CHANGES + 1)
+        ).all()
+        if len(changes) <= QUOTE_POOL_RELOAD_CHANGES:
+            changed = {entity_id for _, entity, entity_id in changes if entity == CHANGE_QUOTE}
+            live = set(session.execute(
+                db.select(QuoteModel.id).where(QuoteModel.id.in_(changed), QuoteModel.deleted == False)).scalars()
+            ) if changed else set()
+            if changes:
+                quote_ids.apply_changes(since, changes[-1].seq, changed, live)
+            return quote_ids
+    # seq журнала читается до id, поэтому изменения между запросами не теряются
+    seq = session.execute(db.select(func.max(ChangeModel.seq))).scalar() or 0
+    quote_ids.load(session.execute(db.select(QuoteModel.id).filter_by(deleted=False)).scalars(), seq)
+    return quote_ids
+
+
+# Строки read model в порядке колонок QUOTE_JSON и QUOTE_SHORT_JSON: их можно выводить
+# теми же RowJSON, что и строки запросов (author.id -> author__id)
+QuoteRow = namedtuple('QuoteRow', [column.key.replace('.', '__') for column in QUOTE_JSON.columns])
+QuoteShortRow = namedtuple('QuoteShortRow', [column.key for column in QUOTE_SHORT_JSON.columns])
+
+
+class AuthorRow(namedtuple('AuthorRow', ['id', 'name', 'surname'])):
+
+    def to_dict(self):
+        return self._asdict()
+
+
+@functools.lru_cache(maxsize=4096)
+def http_date_cached(timestamp: int) -> str:
+    """Дата как в jsonify; у цитат из одной пачки она одна и та же"""
+    return http_date(timestamp)
+
+
+def epoch_seconds(value: datetime.datetime) -> int:
+    """Секунды эпохи; дата без пояса - UTC, как CURRENT_TIMESTAMP в SQLite"""
+    return calendar.timegm(value.utctimetuple())
+
+
+class ReadModel:
+    """Копия каталога цитат и авторов в памяти для чтения без ORM (READ_MODEL)
+
+    Цитаты, в том числе удаленные (их выводит /authors/<id>/quotes), хранятся
+    по колонкам в порядке id: id, author_id и created_datetime (секунды) - в
+    array('q'), рейтинг и признак удаления - в array('b'), тексты - списком.
+    Имена авторов интернированы. Перед каждым чтением sync() применяет новые
+    записи журнала изменений, поэтому видны коммиты любого процесса.
+
+    Запросы к БД выполняются без блокировки, в памяти состояние меняется и
+    читается под ней; так sync() работает и в потоках Flask, и в run_sync
+    асинхронных обработчиков asgi.py.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seq = None
+        self._set_state(*self._empty_state())
+
+    @staticmethod
+    def _empty_state() -> tuple:
+        return (array('q'), array('q'), array('q'), array('b'), array('b'), [], {}, {})
+
+    def _set_state(self, ids, author_ids, created, ratings, deleted, texts, authors, author_quotes):
+        self.ids = ids
+        self.author_ids = author_ids
+        self.created = created
+        self.ratings = ratings
+        self.deleted = deleted
+        self.texts = texts
+        # id автора -> (имя, фамилия, удален)
+        self.authors: dict[int, tuple[str, str, bool]] = authors
+        # id автора -> id его цитат по возрастанию
+        self.author_quotes: dict[int, array] = author_quotes
+        self.live = QuoteIdPool()
+        self.live.load(quote_id for quote_id, quote_deleted in zip(ids, deleted) if not quote_deleted)
+
+    @property
+    def loaded(self) -> bool:
+        return self.seq is not None
+
+    def reset(self):
+        with self._lock:
+            self.seq = None
+            self._set_state(*self._empty_state())
+
+    def sync(self, session=None):
+        """Загружает каталог или применяет записи журнала изменений после seq"""
+        session = session or db.session
+        seq = self.seq
+        if seq is None:
+            self.load(session)
+            return
+        changes = session.execute(
+            db.select(ChangeModel.seq, ChangeModel.entity, ChangeModel.entity_id)
+            .where(ChangeModel.seq > seq).order_by(ChangeModel.seq).limit(app.config['READ_MODEL_RELOAD_CHANGES'] + 1)
+        ).all()
+        if not changes:
+            return
+        if len(changes) > app.config['READ_MODEL_RELOAD_CHANGES']:
+            self.load(session)
+            return
+        ids = {CHANGE_QUOTE: set(), CHANGE_AUTHOR: set()}
+        for _, entity, entity_id in changes:
+            ids[entity].add(entity_id)
+        authors, quotes = [], []
+        if ids[CHANGE_AUTHOR]:
+            authors = session.execute(self.select_authors().where(AuthorModel.id.in_(ids[CHANGE_AUTHOR]))).all()
+        if ids[CHANGE_QUOTE]:
+            quotes = session.execute(self.select_quotes().where(QuoteModel.id.in_(ids[CHANGE_QUOTE]))).all()
+        with self._lock:
+            # другой поток уже применил эти записи по более свежим строкам
+            if self.seq != seq:
+                return
+            for author_id, name, surname, author_deleted in authors:
+                self.authors[author_id] = (sys.intern(name), sys.intern(surname), author_deleted)
+            for author_id in ids[CHANGE_AUTHOR] - {row.id for row in authors}:
+                self.authors.pop(author_id, None)
+            for row in quotes:
+                self._upsert_quote(*row)
+            for quote_id in ids[CHANGE_QUOTE] - {row.id for row in quotes}:
+                self._remove_quote(quote_id)
+            self.seq = changes[-1].seq
+
+    def load(self, session):
+        """Загружает каталог целиком; seq журнала читается до строк, поэтому изменения не теряются"""
+        seq = session.execute(db.select(func.max(ChangeModel.seq))).scalar() or 0
+        ids, author_ids, created, ratings, deleted, texts, authors, author_quotes = state = self._empty_state()
+        for author_id, name, surname, author_deleted in session.execute(self.select_authors()):
+            authors[author_id] = (sys.intern(name), sys.intern(surname), author_deleted)
+        rows = session.execute(self.select_quotes().order_by(QuoteModel.id).execution_options(yield_per=STREAM_CHUNK_SIZE))
+        for quote_id, author_id, text, rating, quote_deleted, created_datetime in rows:
+            ids.append(quote_id)
+            author_ids.append(author_id)
+            created.append(epoch_seconds(created_datetime))
+            ratings.append(rating)
+            deleted.append(quote_deleted)
+            texts.append(text)
+            author_quotes.setdefault(author_id, array('q')).append(quote_id)
+        with self._lock:
+            if self.seq is None or self.seq < seq:
+                self._set_state(*state)
+                self.seq = seq
+
+    @staticmethod
+    def select_authors():
+        return db.select(AuthorModel.id, AuthorModel.name, AuthorModel.surname, AuthorModel.deleted)
+
+    @staticmethod
+    def select_quotes():
+        return db.select(QuoteModel.id, QuoteModel.author_id, QuoteModel.text, QuoteModel.rating,
+                         QuoteModel.deleted, QuoteModel.created_datetime)
+
+    def _position(self, quote_id: int) -> int | None:
+        pos = bisect_left(self.ids, quote_id)
+        return pos if pos < len(self.ids) and self.ids[pos] == quote_id else None
+
+    def _upsert_quote(self, quote_id, author_id, text, rating, quote_deleted, created_datetime):
+        pos = self._position(quote_id)
+        if pos is None:
+            pos = bisect_left(self.ids, quote_id)
+            for values, value in ((self.ids, quote_id), (self.author_ids, author_id),
+                                  (self.created, epoch_seconds(created_datetime)), (self.ratings, rating),
+                                  (self.deleted, quote_deleted), (self.texts, text)):
+                values.insert(pos, value)
+            insort(self.author_quotes.setdefault(author_id, array('q')), quote_id)
+        else:
+            if self.author_ids[pos] != author_id:
+                self.author_quotes[self.author_ids[pos]].remove(quote_id)
+                insort(self.author_quotes.setdefault(author_id, array('q')), quote_id)
+                self.author_ids[pos] = author_id
+            self.texts[pos] = text
+            self.ratings[pos] = rating
+            self.deleted[pos] = quote_deleted
+        if quote_deleted:
+            self.live.discard(quote_id)
+        else:
+            self.live.add_many((quote_id,))
+
+    def _remove_quote(self, quote_id: int):
+        pos = self._position(quote_id)
+        if pos is None:
+            return
+        self.author_quotes[self.author_ids[pos]].remove(quote_id)
+        for values in (self.ids, self.author_ids, self.created, self.ratings, self.deleted, self.texts):
+            del values[pos]
+        self.live.discard(quote_id)
+
+    def _quote_row(self, pos: int) -> QuoteRow:
+        author_id = self.author_ids[pos]
+        name, surname, _ = self.authors[author_id]
+        return QuoteRow(author_id, name, surname, author_id, http_date_cached(self.created[pos]),
+                        self.ids[pos], self.ratings[pos], self.texts[pos])
+
+    def quote(self, quote_id: int) -> QuoteRow | None:
+        """Неудаленная цитата по id"""
+        with self._lock:
+            pos = self._position(quote_id)
+            if pos is None or self.deleted[pos]:
+                return None
+            return self._quote_row(pos)
+
+    def quotes(self, after_id: int | None = None, limit: int | None = None, predicates=(),
+               author_predicates=()) -> list[QuoteRow]:
+        """Неудаленные цитаты по возрастанию id, начиная после after_id
+
+        predicates - функции (модель, позиция цитаты), author_predicates - функции
+        (id, имя, фамилия) автора; при author_predicates перебираются только цитаты
+        подошедших авторов, как при поиске по индексу.
+        """
+        rows = []
+        with self._lock:
+            if author_predicates:
+                authors = [(author_id, name, surname) for author_id, (name, surname, _) in self.authors.items()]
+                for predicate in author_predicates:
+                    authors = list(filter(predicate, authors))
+                quote_ids = heapq.merge(*(self.author_quotes.get(author_id, ()) for author_id, _, _ in authors))
+                positions = (self._position(quote_id) for quote_id in quote_ids
+                             if after_id is None or quote_id > after_id)
+            else:
+                positions = range(bisect_right(self.ids, after_id) if after_id is not None else 0, len(self.ids))
+            for pos in positions:
+                if self.deleted[pos] or not all(predicate(self, pos) for predicate in predicates):
+                    continue
+                rows.append(self._quote_row(pos))
+                if len(rows) == limit:
+                    break
+        return rows
+
+    def author(self, author_id: int) -> AuthorRow | None:
+        """Неудаленный автор по id"""
+        with self._lock:
+            author = self.authors.get(author_id)
+            if author is None or author[2]:
+                return None
+            return AuthorRow(author_id, author[0], author[1])
+
+    def author_quotes_rows(self, author_id: int) -> list[QuoteShortRow]:
+        """Цитаты автора, включая удаленные, в порядке индекса ix_quotes_author_id_deleted"""
+        with self._lock:
+            positions = [self._position(quote_id) for quote_id in self.author_quotes.get(author_id, ())]
+            positions.sort(key=lambda pos: self.deleted[pos])
+            return [QuoteShortRow(author_id, self.ids[pos], self.ratings[pos], self.texts[pos]) for pos in positions]
+
+    def sample(self, n: int) -> list[QuoteRow]:
+        """n различных случайных неудаленных цитат"""
+        with self._lock:
+            return [self._quote_row(self._position(quote_id)) for quote_id in self.live.sample(n)]
+
+
+read_model = ReadModel()
+
+
+def ascii_lower(value) -> str:
+    """Строка в нижнем регистре только для ASCII, как сравнивает LIKE в SQLite"""
+    return str(value).translate(ASCII_LOWER)
+
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+# поле фильтра -> значение в read model по позиции цитаты (created_datetime - секунды эпохи)
+READ_MODEL_FILTER_FIELDS = {
+    'id': lambda model, pos: model.ids[pos],
+    'text': lambda model, pos: model.texts[pos],
+    'rating': lambda model, pos: model.ratings[pos],
+    'created_datetime': lambda model, pos: model.created[pos],
+}
+# поля автора фильтруются по авторам: номер в кортеже (id, имя, фамилия)
+READ_MODEL_AUTHOR_FIELDS = {'author_id': 0, 'author.name': 1, 'author.surname': 2}
+READ_MODEL_FILTER_OPERATORS = {
+    **{name: FILTER_OPERATORS[name] for name in ('eq', 'ne', 'lt', 'lte', 'gt', 'gte')},
+    'contains': lambda field, value: ascii_lower(value) in ascii_lower(field),
+    'startswith': lambda field, value: ascii_lower(field).startswith(ascii_lower(value)),
+    'in': lambda field, values: field in values,
+}
+
+
+def compile_quote_predicates(args) -> tuple[list, list]:
+    """Те же фильтры, что compile_quote_filters, функциями для ReadModel.quotes: по цитатам и по авторам"""
+    predicates, author_predicates = [], []
+    for field, op, value in parse_quote_filters(args):
+        compare = READ_MODEL_FILTER_OPERATORS[op]
+        if field in READ_MODEL_AUTHOR_FIELDS:
+            author_predicates.append(author_predicate(operator.itemgetter(READ_MODEL_AUTHOR_FIELDS[field]), compare, value))
+            continue
+        if field == 'created_datetime':
+            value = [epoch_seconds(item) for item in value] if op == 'in' else epoch_seconds(value)
+        predicates.append(quote_predicate(READ_MODEL_FILTER_FIELDS[field], compare, value))
+    return predicates, author_predicates
+
+
+def quote_predicate(get, compare, value):
+    return lambda model, pos: compare(get(model, pos), value)
+
+
+def author_predicate(get, compare, value):
+    return lambda author: compare(get(author), value)
+
+
+def synced_read_model() -> ReadModel:
+    """read model с примененными записями журнала изменений"""
+    read_model.sync()
+    return read_model
+
+
+def encode_cursor(values: list) -> str:
+    """Кодирует ключ сортировки последней строки страницы в непрозрачный курсор"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Декодирует курсор, полученный от encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    # значения колонок - только скаляры JSON: список или объект не сравнить в tuple_(...) > tuple_(...)
+    if not isinstance(values, list) or len(values) != size or \
+            any(value is not None and type(value) not in (str, int, float) for value in values):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong cursor after={cursor}")
+    return values
+
+
+def list_response(query, order_columns: tuple, serialize):
+    """Выводит результат запроса списком, страницей (limit, after) или потоком (stream)
+
+    Страницы выбираются по ключу (keyset): курсор after хранит значения
+    order_columns последней строки, поэтому следующая страница не требует OFFSET.
+    serialize - функция ORM-объект -> dict или RowJSON для запроса по колонкам.
+    """
+    limit, stream = paging_args(request.args)
+    query = page_query(query, order_columns, request.args.get('after'))
+
+    if stream:
+        if limit:
+            query = query.limit(limit)
+        return Response(stream_with_context(stream_rows(query, serialize, stream)), mimetype=STREAM_FORMATS[stream])
+
+    if isinstance(serialize, RowJSON) and uses_fragments(serialize, order_columns):
+        keys, fragments = row_fragments(db.session, query.limit(limit + 1) if limit else query, serialize)
+        return Response(fragments_body(keys, fragments, limit, order_columns), mimetype=app.json.mimetype), HTTPStatus.OK
+    result = db.session.execute(query.limit(limit + 1) if limit else query)
+    if isinstance(serialize, RowJSON):
+        return rows_list_response(result.all(), limit, order_columns, serialize)
+    rows = result.scalars().all()
+    if limit:
+        return jsonify(page_items(rows, limit, order_columns, serialize)), HTTPStatus.OK
+    return jsonify([serialize(row) for row in rows]), HTTPStatus.OK
+
+
+def rows_list_response(rows: list, limit: int | None, order_columns: tuple, row_json: RowJSON):
+    """Выводит выбранные строки (limit + 1 для страницы) списком или страницей"""
+    if json_is_compact():
+        return Response(rows_body(rows, limit, order_columns, row_json), mimetype=app.json.mimetype), HTTPStatus.OK
+    if limit:
+        return jsonify(page_items(rows, limit, order_columns, row_json.to_dict)), HTTPStatus.OK
+    return jsonify([row_json.to_dict(row) for row in rows]), HTTPStatus.OK
+
+
+def read_model_page(args, model: ReadModel, predicates=(), author_predicates=()) -> tuple[list, int | None]:
+    """Строки QUOTE_JSON из read model для списка цитат по id, как в list_response, и limit"""
+    limit, _ = paging_args(args)
+    after = args.get('after')
+    after_id = decode_cursor(after, 1)[0] if after else None
+    if after_id is not None and type(after_id) not in (int, float):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong cursor after={after}")
+    return model.quotes(after_id, limit + 1 if limit else None, predicates, author_predicates), limit
+
+
+def read_model_list_response(predicates=(), author_predicates=()):
+    """list_response по read model"""
+    rows, limit = read_model_page(request.args, synced_read_model(), predicates, author_predicates)
+    return rows_list_response(rows, limit, (QuoteModel.id,), QUOTE_JSON)
+
+
+def paging_args(args) -> tuple[int | None, str | None]:
+    """Проверяет параметры limit и stream запроса списка"""
+    limit = args.get('limit')
+    stream = args.get('stream')
+    if limit is not None and (not limit.isdigit() or int(limit) not in range(1, PAGE_LIMIT_MAX + 1)):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value limit={limit}, expected 1..{PAGE_LIMIT_MAX}")
+    if stream is not None and stream not in STREAM_FORMATS:
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value stream={stream}, expected one of {list(STREAM_FORMATS)}")
+    return int(limit) if limit is not None else None, stream
+
+
+def page_query(query, order_columns: tuple, after: str | None):
+    """Сортирует запрос по order_columns и начинает его после курсора after"""
+    query = query.order_by(*order_columns)
+    if after:
+        query = query.where(tuple_(*order_columns) > tuple_(*decode_cursor(after, len(order_columns))))
+    return query
+
+
+def next_page_cursor(rows: list, limit: int, order_columns: tuple) -> str | None:
+    """Курсор следующей страницы по limit + 1 выбранным строкам или None для последней"""
+    if len(rows) > limit:
+        return encode_cursor([getattr(rows[limit - 1], column.key) for column in order_columns])
+    return None
+
+
+def page_items(rows: list, limit: int, order_columns: tuple, serialize) -> dict:
+    """Страница из limit + 1 выбранных строк: элементы и курсор следующей страницы"""
+    return {"items": [serialize(row) for row in rows[:limit]], "next": next_page_cursor(rows, limit, order_columns)}
+
+
+def rows_body(rows: list, limit: int | None, order_columns: tuple, row_json: RowJSON) -> str:
+    """Тело ответа jsonify (список или страница при limit), собранное из JSON строк Row"""
+    if not limit:
+        return row_json.dumps_list(rows) + '\n'
+    next_cursor = app.json.dumps(next_page_cursor(rows, limit, order_columns), separators=COMPACT_SEPARATORS)
+    return f'{{"items":{row_json.dumps_list(rows[:limit])},"next":{next_cursor}}}\n'
+
+
+def author_quotes_body(author: AuthorModel | AuthorRow, rows: list) -> str:
+    """Тело ответа jsonify(author=..., quotes=...) со строками QUOTE_SHORT_JSON"""
+    author_json = app.json.dumps(author.to_dict(), separators=COMPACT_SEPARATORS)
+    return f'{{"author":{author_json},"quotes":{QUOTE_SHORT_JSON.dumps_list(rows)}}}\n'
+
+
+class FragmentCache:
+    """Закодированный JSON строк (цитат, авторов) по id и версии строки (FRAGMENT_CACHE)
+
+    Версия - колонки version и updated_at: version растет при каждом UPDATE, а
+    updated_at отличает новую строку, получившую id удаленной. Фрагмент цитаты
+    QUOTE_JSON включает автора, поэтому его ключ - версии цитаты и автора. После
+    коммита фрагменты измененных строк удаляются (apply_cache_invalidation),
+    изменения других процессов отсекаются сравнением версий. Записи вытесняются
+    в порядке добавления, чтения не перестраивают порядок.
+    """
+
+    def __init__(self):
+        self._fragments: dict[tuple[str, int], tuple[tuple, bytes]] = {}
+
+    def lookup(self, kind: str, keys: list) -> tuple[list, dict[int, int]]:
+        """Фрагменты строк keys - (id, версия...) - и позиции промахов по id (на их месте None)"""
+        entries = self._fragments
+        fragments, misses = [], {}
+        for position, key in enumerate(keys):
+            entry = entries.get((kind, key[0]))
+            if entry is not None and entry[0] == key[1:]:
+                fragments.append(entry[1])
+            else:
+                fragments.append(None)
+                misses[key[0]] = position
+        return fragments, misses
+
+    def set(self, kind: str, row_id: int, version: tuple, fragment: bytes):
+        self._fragments[(kind, row_id)] = (version, fragment)
+        while len(self._fragments) > app.config['FRAGMENT_CACHE_MAX_SIZE']:
+            try:
+                del self._fragments[next(iter(self._fragments))]
+            except (StopIteration, KeyError, RuntimeError):
+                # словарь одновременно меняет другой поток
+                break
+
+    def discard(self, quote_ids=(), author_ids=()):
+        for quote_id in quote_ids:
+            self._fragments.pop(('quote', quote_id), None)
+            self._fragments.pop(('quote_short', quote_id), None)
+        for author_id in author_ids:
+            self._fragments.pop(('author', author_id), None)
+
+    def clear(self):
+        self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+fragment_cache = FragmentCache()
+
+
+def row_version(model) -> tuple:
+    # updated_at без разбора в datetime: строки только сравниваются
+    return (model.version, type_coerce(model.updated_at, String))
+
+
+# RowJSON -> (вид фрагмента, колонка id, колонки версии, запрос строк для RowJSON)
+FRAGMENT_KINDS = {
+    QUOTE_JSON: ('quote', QuoteModel.id, (*row_version(QuoteModel), *row_version(AuthorModel)), select_quote_rows),
+    QUOTE_SHORT_JSON: ('quote_short', QuoteModel.id, row_version(QuoteModel), QUOTE_SHORT_JSON.select),
+    AUTHOR_JSON: ('author', AuthorModel.id, row_version(AuthorModel), AUTHOR_JSON.select),
+}
+
+
+def uses_fragments(row_json: RowJSON, order_columns: tuple) -> bool:
+    """Собирать ли список из фрагментов: включен FRAGMENT_CACHE, компактный JSON и сортировка по id"""
+    if not fragments_enabled() or row_json not in FRAGMENT_KINDS:
+        return False
+    return len(order_columns) == 1 and order_columns[0] is FRAGMENT_KINDS[row_json][1]
+
+
+def row_fragments(session, query, row_json: RowJSON) -> tuple[list, list[bytes]]:
+    """Строки (id, версия...) запроса query и JSON каждой строки из кэша фрагментов
+
+    Сначала выбираются только id и версии с теми же условиями, порядком и
+    limit; строки целиком читаются только для промахов: пачками по id или,
+    если промахов больше половины, тем же запросом со всеми колонками.
+    """
+    kind, id_column, version_columns, select_rows = FRAGMENT_KINDS[row_json]
+    version_columns = [column.label(f'version_{i}') for i, column in enumerate(version_columns)]
+    keys = session.execute(query.with_only_columns(id_column, *version_columns)).all()
+    fragments, misses = fragment_cache.lookup(kind, keys)
+    if not misses:
+        return keys, fragments
+    if len(misses) * 2 > len(keys):
+        row_queries = [query.with_only_columns(*row_json.columns, id_column, *version_columns)]
+    else:
+        miss_ids = list(misses)
+        row_queries = [select_rows().add_columns(id_column, *version_columns)
+                       .where(id_column.in_(miss_ids[start:start + IMPORT_BATCH_SIZE]))
+                       for start in range(0, len(miss_ids), IMPORT_BATCH_SIZE)]
+    size = len(row_json.columns)
+    for row_query in row_queries:
+        for row in session.execute(row_query):
+            position = misses.get(row[size])
+            if position is None:
+                continue
+            fragment = row_json.dumps(row[:size]).encode()
+            fragment_cache.set(kind, row[size], row[size + 1:], fragment)
+            fragments[position] = fragment
+    if None in fragments:
+        # строку удалили между запросами
+        present = [position for position, fragment in enumerate(fragments) if fragment is not None]
+        keys = [keys[position] for position in present]
+        fragments = [fragments[position] for position in present]
+    return keys, fragments
+
+
+def fragments_enabled() -> bool:
+    return app.config['FRAGMENT_CACHE'] and json_is_compact()
+
+
+def fragments_body(keys: list, fragments: list[bytes], limit: int | None, order_columns: tuple) -> bytes:
+    """Тело как у rows_body, склеенное из готовых фрагментов (limit + 1 строк для страницы)"""
+    if not limit:
+        return b''.join((b'[', b','.join(fragments), b']\n'))
+    next_cursor = app.json.dumps(next_page_cursor(keys, limit, order_columns), separators=COMPACT_SEPARATORS)
+    return b''.join((b'{"items":[', b','.join(fragments[:limit]), b'],"next":', next_cursor.encode(), b'}\n'))
+
+
+def author_quotes_fragments_body(author: AuthorModel, fragments: list[bytes]) -> bytes:
+    """Тело как у author_quotes_body из фрагментов QUOTE_SHORT_JSON"""
+    author_json = app.json.dumps(author.to_dict(), separators=COMPACT_SEPARATORS).encode()
+    return b''.join((b'{"author":', author_json, b',"quotes":[', b','.join(fragments), b']}\n'))
+
+
+def top_size(args) -> int:
+    """Проверяет параметр n запроса топа"""
+    n = args.get('n', str(TOP_SIZE_DEFAULT))
+    if not n.isdigit() or int(n) not in range(1, PAGE_LIMIT_MAX + 1):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value n={n}, expected 1..{PAGE_LIMIT_MAX}")
+    return int(n)
+
+
+def random_size(args) -> int | None:
+    """Проверяет параметр n запроса случайных цитат; None - одна цитата без списка"""
+    n = args.get('n')
+    if n is not None and (not n.isdigit() or int(n) not in range(1, PAGE_LIMIT_MAX + 1)):
+        abort(HTTPStatus.BAD_REQUEST, f"Wrong value n={n}, expected 1..{PAGE_LIMIT_MAX}")
+    return int(n) if n is not None else None
+
+
+def rows_response(query, row_json: RowJSON):
+    """Выводит строки запроса по колонкам списком"""
+    rows = db.session.execute(query).all()
+    if json_is_compact():
+        return Response(rows_body(rows, None, (), row_json), mimetype=app.json.mimetype), HTTPStatus.OK
+    return jsonify([row_json.to_dict(row) for row in rows]), HTTPStatus.OK
+
+
+def stream_rows(query, serialize, stream_format: str):
+    """Генератор, отдающий строки запроса по частям в формате NDJSON или JSON-массива"""
+    rows = db.session.execute(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    if isinstance(serialize, RowJSON):
+        dumps = serialize.dumps_spaced
+    else:
+        rows = rows.scalars()
+
+        def dumps(row):
+            return app.json.dumps(serialize(row))
+
+    if stream_format == 'ndjson':
+        for row in rows:
+            yield dumps(row) + '\n'
+        return
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + dumps(row)
+        separator = ','
+    yield ']'
+
+
+def count_quotes_by_author() -> dict[int, int]:
+    """Возвращает количество неудаленных цитат по авторам (из authors.quotes_count или через SQL)"""
+    if app.config['QUOTES_COUNT_CACHE']:
+        query = db.select(AuthorModel.id, AuthorModel.quotes_count).where(AuthorModel.quotes_count > 0)
+    else:
+        query = db.select(QuoteModel.author_id, func.count()).filter_by(deleted=False).group_by(QuoteModel.author_id)
+    return dict(db.session.execute(query).all())
+
+
+def count_quotes_query():
+    """Запрос количества неудаленных цитат: сумма authors.quotes_count или COUNT по quotes"""
+    if app.config['QUOTES_COUNT_CACHE']:
+        return db.select(func.coalesce(func.sum(AuthorModel.quotes_count), 0))
+    return db.select(func.count()).select_from(QuoteModel).filter_by(deleted=False)
+
+
+def set_author_quotes_deleted(author_id: int, deleted: bool) -> list[int]:
+    """Одним UPDATE помечает цитаты автора удаленными/восстановленными (без коммита)
+
+    Возвращает id измененных цитат.
+    """
+    changed = db.session.execute(
+        db.update(QuoteModel)
+        .where(QuoteModel.author_id == author_id, QuoteModel.deleted == (not deleted))
+        .values(deleted=deleted)
+        .returning(QuoteModel.id)
+    ).scalars().all()
+    record_changes(quotes=[(quote_id, author_id) for quote_id in changed])
+    return changed
+
+
+def set_author_deleted(author_id: int, deleted: bool) -> list[int] | None:
+    """Удаляет (deleted=True) или восстанавливает автора вместе с цитатами и коммитит
+
+    Возвращает id измененных цитат или None, если автора нет или он уже в
+    нужном состоянии (поэтому повторный вызов ничего не меняет).
+    """
+    author = db.session.get(AuthorModel, author_id)
+    if author is None or author.deleted == deleted:
+        return None
+    author.deleted = deleted
+    changed = set_author_quotes_deleted(author_id, deleted)
+    db.session.commit()
+    pairs = [(quote_id, author_id) for quote_id in changed]
+    if deleted:
+        track_live_quotes(removed=pairs)
+    else:
+        track_live_quotes(added=pairs)
+    return changed
+
+
+def track_live_quotes(added=(), removed=()):
+    """Обновляет пул id после коммита, изменившего набор неудаленных цитат
+
+    added и removed - пары (id цитаты, id автора). Изменения применяются
+    пачкой: один проход по пулу id.
+    """
+    quote_ids.discard_many(quote_id for quote_id, _ in removed)
+    quote_ids.add_many(quote_id for quote_id, _ in added)
+
+
+def vote_quote(quote_id: int, delta: int) -> int | None:
+    """Меняет рейтинг цитаты на delta одним UPDATE, если он остается в RATE_RANGE
+
+    Возвращает новый рейтинг или None, если цитата не найдена или рейтинг на границе.
+    """
+    row = db.session.execute(
+        db.update(QuoteModel)
+        .where(QuoteModel.id == quote_id, QuoteModel.deleted == False,
+               (QuoteModel.rating + delta).between(min(RATE_RANGE), max(RATE_RANGE)))
+        .values(rating=QuoteModel.rating + delta)
+        .returning(QuoteModel.rating, QuoteModel.author_id)
+    ).one_or_none()
+    if row is None:
+        db.session.commit()
+        return None
+    new_rating, author_id = row
+    record_changes(quotes=[(quote_id, author_id)])
+    db.session.commit()
+    return new_rating
+
+
+def flush_votes():
+    """Записывает накопленные голоса одним executemany UPDATE
+
+    Сумма голосов применяется разом и обрезается до границ RATE_RANGE.
+    """
+    deltas = vote_buffer.drain()
+    if not deltas:
+        return
+    quotes = QuoteModel.__table__
+    new_rating = quotes.c.rating + bindparam('delta')
+    statement = (quotes.update()
+                 .where(quotes.c.id == bindparam('quote_id'), quotes.c.deleted == False)
+                 .values(rating=case((new_rating > max(RATE_RANGE), max(RATE_RANGE)),
+                                     (new_rating < min(RATE_RANGE), min(RATE_RANGE)),
+                                     else_=new_rating)))
+    db.session.execute(statement, [{'quote_id': quote_id, 'delta': delta} for quote_id, delta in deltas.items()])
+    record_changes(quotes=db.session.execute(
+        db.select(QuoteModel.id, QuoteModel.author_id).where(QuoteModel.id.in_(list(deltas)))).all())
+    db.session.commit()
+
+
+@atexit.register
+def flush_votes_at_exit():
+    with app.app_context():
+        flush_votes()
+
+
+def vote_response(quote_id: int, delta: int, limit_message: str):
+    """Применяет голос за цитату (сразу или через буфер) и формирует ответ"""
+    if app.config['VOTE_BUFFER']:
+        if quote_id not in live_quote_ids():
+            return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
+        if vote_buffer.add(quote_id, delta):
+            flush_votes()
+        return jsonify(message = "Your vote has been accepted."), HTTPStatus.ACCEPTED
+    new_rating = vote_quote(quote_id, delta)
+    if new_rating is not None:
+        return jsonify(message = f"Your vote has been accepted, new rating is {new_rating}."), HTTPStatus.OK
+    quote = db.session.get(QuoteModel, quote_id)
+    if quote and not quote.deleted:
+        return jsonify(message = limit_message), HTTPStatus.OK
+    return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
+
+
+def bulk_items() -> list:
+    """Возвращает список элементов из тела bulk-запроса"""
+    items = request.json
+    if not isinstance(items, list) or not items:
+        abort(HTTPStatus.BAD_REQUEST, "Expected non-empty JSON list")
+    if len(items) > BULK_MAX_ITEMS:
+        abort(HTTPStatus.BAD_REQUEST, f"Too many items, maximum is {BULK_MAX_ITEMS}")
+    return items
+
+
+def bulk_error(status: HTTPStatus, message: str) -> dict:
+    return {"status": status, "message": message}
+
+
+# типы полей элементов bulk-запросов; None - поле не задано
+BULK_FIELD_TYPES = {'id': int, 'author_id': int, 'text': str, 'name': str, 'surname': str}
+
+
+def bulk_type_error(key: str, value) -> dict | None:
+    """Ошибка 400, если значение поля не того типа (bool не считается int)"""
+    expected = BULK_FIELD_TYPES[key]
+    if value is None or (isinstance(value, expected) and not isinstance(value, bool)):
+        return None
+    return bulk_error(HTTPStatus.BAD_REQUEST, f"Wrong type of {key}={value!r}, expected {expected.__name__}")
+
+
+def bulk_item_error(item, keys) -> dict | None:
+    """Ошибка 400 для элемента bulk-запроса, который не объект или с полями keys не того типа"""
+    if not isinstance(item, dict):
+        return bulk_error(HTTPStatus.BAD_REQUEST, f"Wrong item {item}")
+    for key in keys:
+        error = bulk_type_error(key, item.get(key))
+        if error:
+            return error
+    return None
+
+
+def live_author_ids(author_ids) -> set[int]:
+    """Возвращает те id из author_ids, чьи авторы существуют и не удалены"""
+    ids = {author_id for author_id in author_ids if isinstance(author_id, int)}
+    return set(db.session.execute(
+        db.select(AuthorModel.id).where(AuthorModel.id.in_(ids), AuthorModel.deleted == False)).scalars())
+
+
+def export_records():
+    """Генератор записей экспорта: все авторы, затем все цитаты (с удаленными), по id"""
+    authors = db.session.execute(
+        db.select(AuthorModel.id, AuthorModel.name, AuthorModel.surname, AuthorModel.deleted)
+        .order_by(AuthorModel.id).execution_options(yield_per=STREAM_CHUNK_SIZE))
+    for author_id, name, surname, deleted in authors:
+        yield {'type': 'author', 'id': author_id, 'name': name, 'surname': surname, 'deleted': deleted}
+    quotes = db.session.execute(
+        db.select(QuoteModel.id, QuoteModel.author_id, QuoteModel.text, QuoteModel.rating, QuoteModel.deleted,
+                  QuoteModel.created_datetime)
+        .order_by(QuoteModel.id).execution_options(yield_per=STREAM_CHUNK_SIZE))
+    for quote_id, author_id, text, rating, deleted, created_datetime in quotes:
+        yield {'type': 'quote', 'id': quote_id, 'author_id': author_id, 'text': text, 'rating': rating,
+               'deleted': deleted, 'created_datetime': created_datetime.isoformat() if created_datetime else None}
+
+
+def export_chunks(export_format: str):
+    """Генератор частей файла экспорта (NDJSON или CSV) по STREAM_CHUNK_SIZE записей"""
+    buffer = io.StringIO()
+    if export_format == 'csv':
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS)
+        writer.writeheader()
+
+        def write(record):
+            writer.writerow(dict(record, deleted='true' if record['deleted'] else 'false'))
+    else:
+        def write(record):
+            buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    for count, record in enumerate(export_records(), 1):
+        write(record)
+        if count % STREAM_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def import_bool(value) -> bool:
+    return value in (True, 1, 'true', 'True', '1')
+
+
+def insert_ignoring_conflicts(table):
+    """INSERT ... ON CONFLICT DO NOTHING для диалекта текущей БД"""
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    return insert(table).on_conflict_do_nothing()
+
+
+class QuotesImporter:
+    """Импорт записей экспорта пачками по IMPORT_BATCH_SIZE, с коммитом после каждой пачки
+
+    Автор с теми же именем и фамилией (AuthorFullNameConstrant), что у
+    существующего, не создается - его цитаты привязываются к существующему;
+    id нового автора сохраняется, если он свободен. Цитата с занятым id
+    пропускается, поэтому повторный импорт того же файла ничего не дублирует.
+    progress(counts) вызывается после каждой пачки.
+    """
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.counts = {'authors_created': 0, 'authors_existing': 0, 'quotes_created': 0, 'quotes_skipped': 0}
+        self.author_ids: dict[int, int] = {}  # id автора в файле -> id в БД
+        self.authors: list[dict] = []
+        self.quotes: list[dict] = []
+
+    def run(self, stream, import_format: str) -> dict:
+        """Импортирует записи из текстового потока; при ошибке - ValueError с номером строки"""
+        lines = csv.DictReader(stream) if import_format == 'csv' else stream
+        line_number = 0
+        try:
+            for line_number, line in enumerate(lines, 1):
+                if import_format == 'csv':
+                    self.add(line)
+                elif line.strip():
+                    self.add(json.loads(line))
+            self.flush_authors()
+            self.flush_quotes()
+        except (ValueError, TypeError, KeyError, csv.Error) as e:
+            db.session.rollback()
+            raise ValueError(f"Line {lines.line_num if import_format == 'csv' else line_number}: {e}") from e
+        finally:
+            sync_id_sequences()
+        return self.counts
+
+    def add(self, record: dict):
+        if not isinstance(record, dict):
+            raise ValueError(f"Expected object, got {record!r}")
+        if record.get('type') == 'author':
+            self.authors.append(self.author_row(record))
+            if len(self.authors) >= IMPORT_BATCH_SIZE:
+                self.flush_authors()
+        elif record.get('type') == 'quote':
+            # цитаты ссылаются на авторов, поэтому авторы пишутся раньше
+            self.flush_authors()
+            self.quotes.append(self.quote_row(record))
+            if len(self.quotes) >= IMPORT_BATCH_SIZE:
+                self.flush_quotes()
+        else:
+            raise ValueError(f"Wrong record type {record.get('type')!r}, expected 'author' or 'quote'")
+
+    @staticmethod
+    def author_row(record: dict) -> dict:
+        if not record.get('name'):
+            raise ValueError(f"Author without name {record}")
+        return {'id': int(record['id']), 'name': str(record['name']), 'surname': str(record.get('surname') or ''),
+                'deleted': import_bool(record.get('deleted'))}
+
+    def quote_row(self, record: dict) -> dict:
+        author_id = int(record['author_id'])
+        if author_id not in self.author_ids:
+            raise ValueError(f"Author with id={author_id} not found in import")
+        if not record.get('text'):
+            raise ValueError(f"Quote without text {record}")
+        rating = int(record.get('rating') or min(RATE_RANGE))
+        created_datetime = record.get('created_datetime')
+        return {'id': int(record['id']), 'author_id': self.author_ids[author_id], 'text': str(record['text']),
+                'rating': rating if rating in RATE_RANGE else min(RATE_RANGE),
+                'deleted': import_bool(record.get('deleted')),
+                'created_datetime': datetime.datetime.fromisoformat(created_datetime) if created_datetime
+                                    else datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)}
+
+    def flush_authors(self):
+        rows, self.authors = self.authors, []
+        if not rows:
+            return
+        by_name, duplicates = {}, []
+        for row in rows:
+            full_name = (row['name'], row['surname'])
+            if full_name in by_name:
+                duplicates.append((row['id'], full_name))
+            else:
+                by_name[full_name] = row
+        db_ids = dict((tuple(full_name), author_id) for author_id, *full_name in db.session.execute(
+            db.select(AuthorModel.id, AuthorModel.name, AuthorModel.surname)
+            .where(tuple_(AuthorModel.name, AuthorModel.surname).in_(list(by_name)))))
+        self.counts['authors_existing'] += len(db_ids) + len(duplicates)
+        new_rows = [row for full_name, row in by_name.items() if full_name not in db_ids]
+        taken = set(db.session.execute(
+            db.select(AuthorModel.id).where(AuthorModel.id.in_([row['id'] for row in new_rows]))).scalars())
+        keep_id = [row for row in new_rows if row['id'] not in taken]
+        new_id = [row for row in new_rows if row['id'] in taken]
+        authors = AuthorModel.__table__
+        if keep_id:
+            db.session.execute(authors.insert(), keep_id)
+        if new_id:
+            ids = db.session.execute(
+                authors.insert().returning(authors.c.id, sort_by_parameter_order=True),
+                [{key: value for key, value in row.items() if key != 'id'} for row in new_id]).scalars().all()
+            new_id = [dict(row, id=author_id) for row, author_id in zip(new_id, ids)]
+        for row in keep_id + new_id:
+            db_ids[(row['name'], row['surname'])] = row['id']
+        for full_name, row in by_name.items():
+            self.author_ids[row['id']] = db_ids[full_name]
+        for file_id, full_name in duplicates:
+            self.author_ids[file_id] = db_ids[full_name]
+        self.counts['authors_created'] += len(new_rows)
+        self.commit(authors=[row['id'] for row in new_rows])
+
+    def flush_quotes(self):
+        rows, self.quotes = self.quotes, []
+        if not rows:
+            return
+        quotes = QuoteModel.__table__
+        inserted = set(db.session.execute(insert_ignoring_conflicts(quotes).returning(quotes.c.id), rows).scalars())
+        added = [(row['id'], row['author_id']) for row in rows if row['id'] in inserted]
+        self.counts['quotes_created'] += len(added)
+        self.counts['quotes_skipped'] += len(rows) - len(added)
+        self.commit(quotes=added)
+        track_live_quotes(added=[(row['id'], row['author_id']) for row in rows
+                                 if row['id'] in inserted and not row['deleted']])
+
+    def commit(self, quotes=(), authors=()):
+        record_changes(quotes=quotes, authors=authors)
+        db.session.commit()
+        if self.progress:
+            self.progress(self.counts)
+
+
+def sync_id_sequences():
+    """После вставки с явными id сдвигает последовательности id (PostgreSQL)"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for table_name in ('authors', 'quotes'):
+        db.session.execute(sql_text(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                                    f"coalesce(max(id), 0) + 1, false) FROM {table_name}"))
+    db.session.commit()
+
+
+def text_stream(binary, import_format: str):
+    """Текстовый поток UTF-8 поверх двоичного; newline='' сохраняет переводы строк внутри полей CSV"""
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='' if import_format == 'csv' else None)
+
+
+def file_format(path: str, chosen: str | None) -> str:
+    """Формат файла: заданный явно или по расширению (.csv), иначе NDJSON"""
+    return chosen or ('csv' if path.endswith('.csv') else 'ndjson')
+
+
+def format_import_counts(counts: dict) -> str:
+    return (f"authors: {counts['authors_created']} created, {counts['authors_existing']} existing; "
+            f"quotes: {counts['quotes_created']} created, {counts['quotes_skipped']} skipped")
+
+
+quotes_cli = AppGroup('quotes', help='Экспорт и импорт авторов и цитат (NDJSON/CSV).')
+app.cli.add_command(quotes_cli)
+
+
+@quotes_cli.command('export')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default=None,
+              help='Формат; по умолчанию по расширению файла, иначе ndjson.')
+@click.option('--output', '-o', default='-', help='Файл для выгрузки (по умолчанию stdout).')
+def export_command(export_format, output):
+    """Выгружает всех авторов и цитаты"""
+    export_format = file_format(output, export_format)
+    with click.open_file(output, 'wb') as file:
+        for chunk in export_chunks(export_format):
+            file.write(chunk.encode('utf-8'))
+
+
+@quotes_cli.command('import')
+@click.argument('source', default='-')
+@click.option('--format', 'import_format', type=click.Choice(list(EXPORT_FORMATS)), default=None,
+              help='Формат; по умолчанию по расширению файла, иначе ndjson.')
+def import_command(source, import_format):
+    """Загружает авторов и цитаты из файла экспорта (SOURCE, по умолчанию stdin)"""
+    import_format = file_format(source, import_format)
+
+    def progress(counts):
+        click.echo(f"\r{format_import_counts(counts)}", err=True, nl=False)
+
+    with click.open_file(source, 'rb') as file:
+        try:
+            counts = QuotesImporter(progress).run(text_stream(file, import_format), import_format)
+        except ValueError as e:
+            click.echo(err=True)
+            raise click.ClickException(str(e))
+    click.echo(f"\rImported: {format_import_counts(counts)}", err=True)
+
+
+jobs_cli = AppGroup('jobs', help='Фоновые задачи (таблица jobs).')
+app.cli.add_command(jobs_cli)
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Выполнить готовые задачи и выйти.')
+def work_command(once):
+    """Выполняет задачи, в том числе оставшиеся с прошлого запуска; без --once - пока не прервут"""
+    if not once:
+        job_queue._work()
+    done = 0
+    while (job := job_queue.claim()) is not None:
+        job_queue.run(job)
+        done += 1
+    click.echo(f"Jobs run: {done}", err=True)
+
+
+def prefers_async() -> bool:
+    """Просит ли клиент выполнить запрос в фоне (заголовок Prefer: respond-async, RFC 7240)"""
+    return any(preference.split(';')[0].strip().lower() == 'respond-async'
+               for preference in request.headers.get('Prefer', '').split(','))
+
+
+def idempotent_job() -> JobModel | None:
+    """Задача, уже поставленная запросом с тем же заголовком Idempotency-Key, если он есть"""
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    return db.session.execute(db.select(JobModel).filter_by(idempotency_key=key)).scalar_one_or_none()
+
+
+def job_accepted(job: JobModel):
+    return jsonify(job = job.to_dict()), HTTPStatus.ACCEPTED, {'Location': url_for('get_job', job_id=job.id)}
+
+
+def enqueue_job(kind: str, payload: dict):
+    """Ставит задачу в очередь и отвечает 202 со ссылкой на /jobs/<id> (ключ - заголовок Idempotency-Key)"""
+    return job_accepted(job_queue.enqueue(kind, payload, request.headers.get('Idempotency-Key')))
+
+
+@job_queue.handler('delete_author')
+def delete_author_job(author_id: int) -> dict:
+    return {'quotes_deleted': len(set_author_deleted(author_id, True) or [])}
+
+
+@job_queue.handler('restore_author')
+def restore_author_job(author_id: int) -> dict:
+    return {'quotes_restored': len(set_author_deleted(author_id, False) or [])}
+
+
+@job_queue.handler('import')
+def import_job(path: str, import_format: str) -> dict:
+    """Импорт файла, сохраненного POST /import; файл удаляется, когда повторять больше нечего"""
+    try:
+        with open(path, 'rb') as file:
+            counts = QuotesImporter().run(text_stream(file, import_format), import_format)
+    except ValueError:
+        os.remove(path)
+        raise
+    os.remove(path)
+    return counts
+
+
+@job_queue.handler('rebuild_indexes')
+def rebuild_indexes_job() -> dict:
+    """Пересчитывает quotes_count авторов, перестраивает FTS и обновляет статистику планировщика"""
+    live_count = (db.select(func.count()).select_from(QuoteModel)
+                  .where(QuoteModel.author_id == AuthorModel.id, QuoteModel.deleted == False).scalar_subquery())
+    fixed = db.session.execute(
+        db.update(AuthorModel).where(AuthorModel.quotes_count != live_count)
+        .values(quotes_count=live_count).returning(AuthorModel.id)).scalars().all()
+    record_changes(authors=fixed)
+    db.session.commit()
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(sql_text("INSERT INTO quotes_fts(quotes_fts) VALUES ('rebuild')"))
+        db.session.execute(sql_text("ANALYZE"))
+        db.session.commit()
+    return {'authors_fixed': len(fixed)}
+
+
 @app.errorhandler(HTTPException)
 def handle_exception(e):
     return jsonify(message = e.description), e.code
 
 
+@app.before_request
+def start_request_metrics():
+    if app.config['METRICS']:
+        g.metrics_started = time.perf_counter()
+        g.metrics_token = request_stats.set(new_request_stats(request.endpoint))
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Записывает метрики запроса; у потоковых ответов - без тела и SQL, выполненного при отдаче"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        metrics.observe_request(request_stats.get(), request.method, response.status_code,
+                                time.perf_counter() - started, response.content_length)
+    return response
+
+
+@app.before_request
+def limit_rate():
+    """Отвечает 429 с Retry-After, если клиент исчерпал корзину токенов обработчика
+
+    Запросы, уже проверенные ASGI-приложением (asgi.py), не проверяются повторно.
+    """
+    if app.config['RATE_LIMIT'] and request.endpoint and not request.environ.get('quotes.rate_limit_checked'):
+        retry_after = rate_limiter.retry_after(request.remote_addr, request.endpoint)
+        if retry_after:
+            message, headers = too_many_requests(retry_after)
+            return jsonify(message = message), HTTPStatus.TOO_MANY_REQUESTS, headers
+
+
+@app.teardown_request
+def reset_request_metrics(exc):
+    # g живет в контексте приложения, который может быть общим для нескольких запросов
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        request_stats.reset(token)
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route("/authors/<int:author_id>")
+@coalesced
+@conditional(author_version)
+@cached('author', 'author_id')
 def get_author(author_id): 
     """Возвращает автора по id"""
     author = db.session.get(AuthorModel, author_id)
@@ -112,16 +2813,17 @@ def get_author(author_id):
 
 
 @app.route("/authors")
+@conditional(functools.partial(collection_version, 'authors'))
+@cached('authors')
 def get_authors() -> list[dict[str, Any]]: 
     """Возвращает список авторов"""
-    authors_db = db.session.execute(db.select(AuthorModel).filter_by(deleted=False)).scalars()
-    authors = []
-    for author_db in authors_db:
-        authors.append(author_db.to_dict())        
-    return jsonify(authors), HTTPStatus.OK
+    query = AUTHOR_JSON.select().where(AuthorModel.deleted == False)
+    return list_response(query, (AuthorModel.id,), AUTHOR_JSON)
 
 
 @app.route("/authors/deleted")
+@conditional(functools.partial(collection_version, 'authors'))
+@cached('authors')
 def get_deleted_authors() -> list[dict[str, Any]]: 
     """Возвращает список удаленных авторов"""
     authors_db = db.session.execute(db.select(AuthorModel).filter_by(deleted=True)).scalars()
@@ -132,23 +2834,21 @@ def get_deleted_authors() -> list[dict[str, Any]]:
 
 
 @app.route("/authors/name")
+@conditional(functools.partial(collection_version, 'authors'))
+@cached('authors')
 def get_name_ordered_authors() -> list[dict[str, Any]]: 
     """Возвращает список авторов в сортировке по имени"""
-    authors_db = db.session.execute(db.select(AuthorModel).filter_by(deleted=False).order_by(AuthorModel.name)).scalars()
-    authors = []
-    for author_db in authors_db:
-        authors.append(author_db.to_dict())        
-    return jsonify(authors), HTTPStatus.OK
+    query = AUTHOR_JSON.select().where(AuthorModel.deleted == False)
+    return list_response(query, (AuthorModel.name, AuthorModel.id), AUTHOR_JSON)
 
 
 @app.route("/authors/surname")
+@conditional(functools.partial(collection_version, 'authors'))
+@cached('authors')
 def get_surname_ordered_authors() -> list[dict[str, Any]]: 
-    """Возвращает список авторов в сортировке по имени"""
-    authors_db = db.session.execute(db.select(AuthorModel).filter_by(deteted=False).order_by(AuthorModel.surname)).scalars()
-    authors = []
-    for author_db in authors_db:
-        authors.append(author_db.to_dict())        
-    return jsonify(authors), HTTPStatus.OK
+    """Возвращает список авторов в сортировке по фамилии"""
+    query = AUTHOR_JSON.select().where(AuthorModel.deleted == False)
+    return list_response(query, (AuthorModel.surname, AuthorModel.id), AUTHOR_JSON)
 
 
 @app.route("/authors", methods=["POST"])
@@ -197,40 +2897,56 @@ def edit_author(author_id):
 
 @app.route("/authors/<int:author_id>", methods=["DELETE"])
 def delete_author(author_id):
-    """Удаляет автора по id"""
+    """Удаляет автора по id (с Prefer: respond-async - в фоне)"""
+    job = idempotent_job() if prefers_async() else None
+    if job:
+        return job_accepted(job)
     author = db.session.get(AuthorModel, author_id)
     if author and not author.deleted:
-        author.deleted = True
-        # db.session.commit()
-        for quote in author.quotes:
-            quote.deleted = True        
-        db.session.commit()
-        return jsonify(message = f"Author with id={author_id} deleted."), HTTPStatus.OK
+        if prefers_async():
+            return enqueue_job('delete_author', {'author_id': author_id})
+        removed = set_author_deleted(author_id, True)
+        return jsonify(message = f"Author with id={author_id} deleted.", quotes_deleted = len(removed)), HTTPStatus.OK
     return jsonify(message = f"Author with id={author_id} not found"), HTTPStatus.NOT_FOUND
 
 
 @app.route("/authors/restore/<int:author_id>", methods=["PUT"])
 def restore_author(author_id):
-    """Восстанавливает удаленного автора по id"""
+    """Восстанавливает удаленного автора по id (с Prefer: respond-async - в фоне)"""
+    job = idempotent_job() if prefers_async() else None
+    if job:
+        return job_accepted(job)
     author = db.session.get(AuthorModel, author_id)
     if author and author.deleted:
-        author.deleted = False
-        for quote in author.quotes:
-            quote.deleted = False        
-        db.session.commit()
-        return jsonify(message = f"Author with id={author_id} restored."), HTTPStatus.OK
+        if prefers_async():
+            return enqueue_job('restore_author', {'author_id': author_id})
+        added = set_author_deleted(author_id, False)
+        return jsonify(message = f"Author with id={author_id} restored.", quotes_restored = len(added)), HTTPStatus.OK
     return jsonify(message = f"Deleted author with id={author_id} not found"), HTTPStatus.NOT_FOUND
 
 
 @app.route("/authors/<int:author_id>/quotes")
+@coalesced
+@conditional(author_quotes_version)
+@cached('author_quotes', 'author_id')
 def get_author_quotes(author_id):
     """Выводит список цитат по id автора""" 
-    author = db.session.get(AuthorModel, author_id)
-    if author and not author.deleted:
-        quotes = []
-        for quote_db in author.quotes:
-            quotes.append(quote_db.to_dict_short())        
-        return jsonify(author = author.to_dict(), quotes = quotes), HTTPStatus.OK
+    if app.config['READ_MODEL']:
+        author = synced_read_model().author(author_id)
+        rows = read_model.author_quotes_rows(author_id) if author else None
+    else:
+        author = db.session.get(AuthorModel, author_id)
+        if author and author.deleted:
+            author = None
+        query = QUOTE_SHORT_JSON.select().where(QuoteModel.author_id == author_id)
+        if author and fragments_enabled():
+            _, fragments = row_fragments(db.session, query, QUOTE_SHORT_JSON)
+            return Response(author_quotes_fragments_body(author, fragments), mimetype=app.json.mimetype), HTTPStatus.OK
+        rows = db.session.execute(query).all() if author else None
+    if author:
+        if json_is_compact():
+            return Response(author_quotes_body(author, rows), mimetype=app.json.mimetype), HTTPStatus.OK
+        return jsonify(author = author.to_dict(), quotes = [QUOTE_SHORT_JSON.to_dict(row) for row in rows]), HTTPStatus.OK
     return jsonify(message = f"Author with id={author_id} not found"), HTTPStatus.NOT_FOUND
 
 
@@ -246,19 +2962,20 @@ def create_author_quote(author_id: int):
             quote.rating = new_rating
         db.session.add(quote)
         db.session.commit()
+        track_live_quotes(added=[(quote.id, author_id)])
         return quote.to_dict(), HTTPStatus.CREATED
     return jsonify(message = f"Author with id={author_id} not found"), HTTPStatus.NOT_FOUND
 
 
 @app.route("/quotes")
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
 def get_quotes() -> list[dict[str, Any]]:
-    """Выводит список цитат""" 
-    quotes_db = db.session.execute(db.select(QuoteModel).filter_by(deleted=False)).scalars()
-    quotes = []
-    for quote_db in quotes_db:
-        author = db.session.get(AuthorModel ,quote_db.author_id)
-        quotes.append(quote_db.to_dict())        
-    return jsonify(quotes), HTTPStatus.OK
+    """Выводит список цитат"""
+    if app.config['READ_MODEL'] and 'stream' not in request.args:
+        return read_model_list_response()
+    query = select_quote_rows().where(QuoteModel.deleted == False)
+    return list_response(query, (QuoteModel.id,), QUOTE_JSON)
 
 
 # @app.route("/quotes", methods=['POST'])
@@ -281,9 +2998,17 @@ def get_quotes() -> list[dict[str, Any]]:
 
 
 @app.route("/quotes/<int:quote_id>")
+@coalesced
+@conditional(quote_version)
+@cached('quote', 'quote_id')
 def get_quote(quote_id : int) -> dict:
     """Выводит цитату по id"""
-    quote = db.session.get(QuoteModel, quote_id)
+    if app.config['READ_MODEL']:
+        row = synced_read_model().quote(quote_id)
+        if row:
+            return jsonify(QUOTE_JSON.to_dict(row)), HTTPStatus.OK
+        return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
+    quote = db.session.get(QuoteModel, quote_id, options=[joinedload(QuoteModel.author)])
     if quote and not quote.deleted:
         return jsonify(quote.to_dict()), HTTPStatus.OK
     return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
@@ -304,6 +3029,7 @@ def edit_quote(quote_id: int) -> dict:
     # Обновление записи
     quote = db.session.get(QuoteModel, quote_id)
     if quote and not quote.deleted:
+        old_author_id = quote.author_id
         new_author_id = new_data.get('author_id')
         if new_author_id:
             new_author = db.session.get(AuthorModel, new_author_id)
@@ -323,35 +3049,21 @@ def edit_quote(quote_id: int) -> dict:
         # quote_db.author = quote['author']
         # quote_db.text = quote['text']
         db.session.commit()
+        if quote.author_id != old_author_id:
+            track_live_quotes(added=[(quote_id, quote.author_id)], removed=[(quote_id, old_author_id)])
         return jsonify(quote.to_dict()), HTTPStatus.OK
     return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
 
 @app.route("/quotes/<int:quote_id>/up", methods=['PUT'])
 def up_quote(quote_id: int) -> None:
     """Повышает рейтинг цитаты"""
-    quote = db.session.get(QuoteModel, quote_id)
-    if quote and not quote.deleted:
-        new_rating = quote.rating + 1
-        if new_rating in RATE_RANGE:
-            quote.rating = new_rating
-            db.session.commit()
-            return jsonify(message = f"Your vote has been accepted, new rating is {new_rating}."), HTTPStatus.OK
-        return jsonify(message=f"Quote with id={quote_id} has maximal rating."), HTTPStatus.OK
-    return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
+    return vote_response(quote_id, 1, f"Quote with id={quote_id} has maximal rating.")
 
 
 @app.route("/quotes/<int:quote_id>/down", methods=['PUT'])
 def down_quote(quote_id: int) -> None:
     """Понижает рейтинг цитаты"""
-    quote = db.session.get(QuoteModel, quote_id)
-    if quote and not quote.deleted:
-        new_rating = quote.rating - 1
-        if new_rating in RATE_RANGE:
-            quote.rating = new_rating
-            db.session.commit()
-            return jsonify(message = f"Your vote has been accepted, new rating is {new_rating}."), HTTPStatus.OK
-        return jsonify(message=f"Quote with id={quote_id} has minimal rating."), HTTPStatus.OK
-    return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
+    return vote_response(quote_id, -1, f"Quote with id={quote_id} has minimal rating.")
 
 
 @app.route("/quotes/<int:quote_id>", methods=['DELETE'])
@@ -360,62 +3072,332 @@ def delete_quote(quote_id: int):
     # quote_db = db.session.execute(db.select(QuoteModel).filter_by(id=quote_id)).scalar_one_or_none()
     quote = db.session.get(QuoteModel, quote_id)
     if quote and not quote.deleted:
+        author_id = quote.author_id
         db.session.delete(quote)
         db.session.commit()
+        track_live_quotes(removed=[(quote_id, author_id)])
         return jsonify(message = f"Quote with id={quote_id} deleted."), HTTPStatus.OK
     return jsonify(message = f"Quote with id={quote_id} not found"), HTTPStatus.NOT_FOUND
 
 
+@app.route("/authors/bulk", methods=["POST"])
+def create_authors_bulk():
+    """Создает авторов из списка одной транзакцией"""
+    items = bulk_items()
+    results = [None] * len(items)
+    new_authors = {}
+    for index, item in enumerate(items):
+        error = bulk_item_error(item, ('name', 'surname'))
+        if error:
+            results[index] = error
+            continue
+        name = item.get('name')
+        if not name:
+            results[index] = bulk_error(HTTPStatus.BAD_REQUEST, f'Incomplete data {item}')
+            continue
+        full_name = (name, item.get('surname') or "")
+        if full_name in new_authors:
+            results[index] = bulk_error(HTTPStatus.CONFLICT, f"Duplicate author {full_name} in request")
+            continue
+        new_authors[full_name] = index
+
+    existing = set(db.session.execute(
+        db.select(AuthorModel.name, AuthorModel.surname)
+        .where(tuple_(AuthorModel.name, AuthorModel.surname).in_(list(new_authors)))))
+    for full_name in existing:
+        results[new_authors.pop(full_name)] = bulk_error(HTTPStatus.CONFLICT, f"Author {full_name} already exists")
+
+    if new_authors:
+        rows = [{'name': name, 'surname': surname} for name, surname in new_authors]
+        new_ids = db.session.execute(
+            db.insert(AuthorModel).returning(AuthorModel.id, sort_by_parameter_order=True), rows).scalars().all()
+        record_changes(authors=new_ids)
+        db.session.commit()
+        for (full_name, index), author_id in zip(new_authors.items(), new_ids):
+            results[index] = {"status": HTTPStatus.CREATED, "id": author_id}
+    return jsonify(results = results), HTTPStatus.OK
+
+
+@app.route("/quotes/bulk", methods=["POST"])
+def create_quotes_bulk():
+    """Создает цитаты из списка одной транзакцией"""
+    items = bulk_items()
+    results = [bulk_item_error(item, ('author_id', 'text')) for item in items]
+    authors = live_author_ids(item.get('author_id') for item, error in zip(items, results) if error is None)
+    rows, row_indexes = [], []
+    for index, item in enumerate(items):
+        if results[index]:
+            continue
+        wrong_keys = set(item.keys()) - QUOTES_KEYS
+        if wrong_keys:
+            results[index] = bulk_error(HTTPStatus.BAD_REQUEST, f"Wrong keys {wrong_keys}")
+            continue
+        if not item.get('text'):
+            results[index] = bulk_error(HTTPStatus.BAD_REQUEST, f'Incomplete data {item}')
+            continue
+        if item.get('author_id') not in authors:
+            results[index] = bulk_error(HTTPStatus.NOT_FOUND, f"Author with id={item.get('author_id')} not found")
+            continue
+        rating = item.get('rating')
+        rows.append({'author_id': item['author_id'], 'text': item['text'],
+                     'rating': rating if rating in RATE_RANGE else min(RATE_RANGE)})
+        row_indexes.append(index)
+
+    if rows:
+        new_ids = db.session.execute(
+            db.insert(QuoteModel).returning(QuoteModel.id, sort_by_parameter_order=True), rows).scalars().all()
+        record_changes(quotes=[(quote_id, row['author_id']) for quote_id, row in zip(new_ids, rows)])
+        db.session.commit()
+        track_live_quotes(added=[(quote_id, row['author_id']) for quote_id, row in zip(new_ids, rows)])
+        for index, quote_id in zip(row_indexes, new_ids):
+            results[index] = {"status": HTTPStatus.CREATED, "id": quote_id}
+    return jsonify(results = results), HTTPStatus.OK
+
+
+@app.route("/quotes/bulk", methods=["PATCH"])
+def edit_quotes_bulk():
+    """Редактирует цитаты из списка одной транзакцией (в каждом элементе - id цитаты)"""
+    items = bulk_items()
+    results = [bulk_item_error(item, ('id', 'author_id', 'text')) for item in items]
+    valid_items = [item for item, error in zip(items, results) if error is None]
+    quotes = dict(db.session.execute(
+        db.select(QuoteModel.id, QuoteModel.author_id)
+        .where(QuoteModel.id.in_([item['id'] for item in valid_items if item.get('id') is not None]),
+               QuoteModel.deleted == False)).all())
+    authors = live_author_ids(item.get('author_id') for item in valid_items)
+    rows, row_indexes, moved = [], [], []
+    for index, item in enumerate(items):
+        if results[index]:
+            continue
+        wrong_keys = set(item.keys()) - QUOTES_KEYS - {'id'}
+        if wrong_keys:
+            results[index] = bulk_error(HTTPStatus.BAD_REQUEST, f"Wrong keys {wrong_keys}")
+            continue
+        quote_id = item.get('id')
+        if quote_id not in quotes:
+            results[index] = bulk_error(HTTPStatus.NOT_FOUND, f"Quote with id={quote_id} not found")
+            continue
+        row = {'id': quote_id}
+        new_author_id = item.get('author_id')
+        if new_author_id:
+            if new_author_id not in authors:
+                results[index] = bulk_error(HTTPStatus.BAD_REQUEST, f"Author with id={new_author_id} not found")
+                continue
+            row['author_id'] = new_author_id
+        if item.get('text'):
+            row['text'] = item['text']
+        if item.get('rating') in RATE_RANGE:
+            row['rating'] = item['rating']
+        if new_author_id and new_author_id != quotes[quote_id]:
+            moved.append((quote_id, quotes[quote_id], new_author_id))
+        rows.append(row)
+        row_indexes.append(index)
+
+    if rows:
+        db.session.execute(db.update(QuoteModel), rows)
+        # перенесенная цитата меняет списки и старого, и нового автора
+        record_changes(quotes=[(row['id'], quotes[row['id']]) for row in rows]
+                       + [(quote_id, new_author) for quote_id, _, new_author in moved])
+        db.session.commit()
+        track_live_quotes(added=[(quote_id, new_author) for quote_id, _, new_author in moved],
+                          removed=[(quote_id, old_author) for quote_id, old_author, _ in moved])
+        for index, row in zip(row_indexes, rows):
+            results[index] = {"status": HTTPStatus.OK, "id": row['id']}
+    return jsonify(results = results), HTTPStatus.OK
+
+
+@app.route("/quotes/bulk", methods=["DELETE"])
+def delete_quotes_bulk():
+    """Удаляет цитаты по списку id одной транзакцией"""
+    quote_ids_in_request = bulk_items()
+    errors = [bulk_type_error('id', quote_id) for quote_id in quote_ids_in_request]
+    quotes = dict(db.session.execute(
+        db.select(QuoteModel.id, QuoteModel.author_id)
+        .where(QuoteModel.id.in_([quote_id for quote_id, error in zip(quote_ids_in_request, errors)
+                                  if error is None and quote_id is not None]),
+               QuoteModel.deleted == False)).all())
+    if quotes:
+        db.session.execute(db.delete(QuoteModel).where(QuoteModel.id.in_(list(quotes))))
+        record_changes(quotes=quotes.items())
+        db.session.commit()
+        track_live_quotes(removed=list(quotes.items()))
+    results = []
+    for quote_id, error in zip(quote_ids_in_request, errors):
+        if error:
+            results.append(error)
+        elif quotes.pop(quote_id, None) is not None:
+            results.append({"status": HTTPStatus.OK, "id": quote_id})
+        else:
+            results.append(bulk_error(HTTPStatus.NOT_FOUND, f"Quote with id={quote_id} not found"))
+    return jsonify(results = results), HTTPStatus.OK
+
+
+@app.route("/export")
+def export_data():
+    """Выгружает всех авторов и цитаты потоком NDJSON (format=ndjson) или CSV (format=csv)"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(message = f"Wrong value format={export_format}, expected one of {list(EXPORT_FORMATS)}"), HTTPStatus.BAD_REQUEST
+    return Response(stream_with_context(export_chunks(export_format)), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename=quotes.{export_format}'})
+
+
+@app.route("/import", methods=["POST"])
+def import_data():
+    """Загружает авторов и цитаты из тела запроса в формате выгрузки /export
+
+    С Prefer: respond-async тело сохраняется в instance/imports, а импорт
+    выполняется фоновой задачей.
+    """
+    import_format = request.args.get('format', 'ndjson')
+    if import_format not in EXPORT_FORMATS:
+        return jsonify(message = f"Wrong value format={import_format}, expected one of {list(EXPORT_FORMATS)}"), HTTPStatus.BAD_REQUEST
+    if prefers_async():
+        job = idempotent_job()
+        if job:
+            return job_accepted(job)
+        imports_dir = Path(app.instance_path) / 'imports'
+        imports_dir.mkdir(parents=True, exist_ok=True)
+        path = imports_dir / f"{time.time_ns()}-{threading.get_ident()}.{import_format}"
+        with open(path, 'wb') as file:
+            shutil.copyfileobj(request.stream, file)
+        return enqueue_job('import', {'path': str(path), 'import_format': import_format})
+    importer = QuotesImporter()
+    try:
+        counts = importer.run(text_stream(request.stream, import_format), import_format)
+    except ValueError as e:
+        return jsonify(message = str(e), **importer.counts), HTTPStatus.BAD_REQUEST
+    return jsonify(counts), HTTPStatus.OK
+
+
+@app.route("/jobs/<int:job_id>")
+def get_job(job_id: int):
+    """Выводит состояние фоновой задачи"""
+    job = db.session.get(JobModel, job_id)
+    if job:
+        return jsonify(job = job.to_dict()), HTTPStatus.OK
+    return jsonify(message = f"Job with id={job_id} not found"), HTTPStatus.NOT_FOUND
+
+
+@app.route("/jobs/rebuild-indexes", methods=["POST"])
+def rebuild_indexes():
+    """Ставит в очередь пересчет quotes_count, перестройку FTS и ANALYZE"""
+    return enqueue_job('rebuild_indexes', {})
+
+
+@app.route("/changes")
+def get_changes():
+    """Выводит записи журнала изменений после since; next - since для следующего запроса"""
+    since, limit = changes_args(request.args, None)
+    items = change_items(since, limit)
+    return jsonify(items = items, next = items[-1]['seq'] if items else since), HTTPStatus.OK
+
+
+@app.route("/changes/stream")
+def stream_changes():
+    """Поток SSE записей журнала изменений, продолжается с since или Last-Event-ID"""
+    since, _ = changes_args(request.args, request.headers.get('Last-Event-ID'))
+    return Response(stream_with_context(change_events(since)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route("/quotes/count")
 def quotes_count():
     """Выводит количество цитат в базе данных"""
-    # todo Странный метод
-    # user = db.session.execute(db.select(User).filter_by(username=username)).scalar_one()
-    quotes = db.session.execute(db.select(QuoteModel.id).filter_by(deleted=False)).scalars()
-    if quotes:
-        i = 0
-        for quote in quotes:
-            i += 1
-        return jsonify(count = i), HTTPStatus.OK
-    abort(503)
-    
-    # db.session.query()
-    # count_quotes = "SELECT count(*) as Count FROM quotes"
-    # cursor = get_db().cursor()
-    # cursor.execute(count_quotes)
-    # count = cursor.fetchone()
-    # if count:
-    #     return jsonify(count = count[0]), HTTPStatus.OK
-    # abort(503)
+    count = db.session.execute(count_quotes_query()).scalar_one()
+    return jsonify(count = count), HTTPStatus.OK
+
+
+@app.route("/quotes/count/authors")
+def quotes_count_by_author():
+    """Выводит количество цитат по каждому автору"""
+    counts = count_quotes_by_author()
+    return jsonify([{"author_id": author_id, "count": count} for author_id, count in sorted(counts.items())]), HTTPStatus.OK
+
+
+@app.route("/quotes/top")
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
+def top_quotes():
+    """Выводит n цитат с наибольшим рейтингом"""
+    query = select_quote_rows().where(QuoteModel.deleted == False).order_by(*TOP_QUOTES_ORDER)
+    return rows_response(query.limit(top_size(request.args)), QUOTE_JSON)
+
+
+@app.route("/authors/top")
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
+def top_authors():
+    """Выводит n авторов с наибольшим числом цитат"""
+    query = AUTHOR_TOP_JSON.select().where(AuthorModel.deleted == False).order_by(*TOP_AUTHORS_ORDER)
+    return rows_response(query.limit(top_size(request.args)), AUTHOR_TOP_JSON)
 
 
 @app.route("/quotes/random")
 def random_quote() -> dict:
-    """Выводит случайную цитату"""
-    quotes_db = db.session.execute(db.select(QuoteModel).filter_by(deleted=False)).scalars()
-    quotes = []
-    for quote_db in quotes_db:
-        quotes.append(quote_db.to_dict())        
-    return jsonify(choice(quotes)), HTTPStatus.OK
+    """Выводит случайную цитату или n=<число> (до PAGE_LIMIT_MAX) различных случайных цитат"""
+    n = random_size(request.args)
+    if app.config['READ_MODEL']:
+        quotes = [QUOTE_JSON.to_dict(row) for row in synced_read_model().sample(n or 1)]
+    else:
+        pool = live_quote_ids()
+        ids = pool.sample(n or 1)
+        quotes_db = db.session.execute(select_quotes().where(QuoteModel.id.in_(ids)).filter_by(deleted=False)).scalars()
+        quotes_by_id = {quote_db.id: quote_db for quote_db in quotes_db}
+        for quote_id in set(ids) - quotes_by_id.keys():
+            # id устарел (цитату изменил другой процесс) - убираем его из пула
+            pool.discard(quote_id)
+        quotes = [quotes_by_id[quote_id].to_dict() for quote_id in ids if quote_id in quotes_by_id]
+    if not quotes:
+        return jsonify(message = "No quotes found"), HTTPStatus.NOT_FOUND
+    if n is None:
+        return jsonify(quotes[0]), HTTPStatus.OK
+    return jsonify(quotes), HTTPStatus.OK
+
+
+@app.route("/quotes/search")
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
+def search_quotes():
+    """Ищет цитаты по тексту (FTS5), самые релевантные (bm25) - первыми"""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return jsonify(message = "Full-text search requires SQLite FTS5"), HTTPStatus.NOT_IMPLEMENTED
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify(message = "Empty search query q"), HTTPStatus.BAD_REQUEST
+    limit = request.args.get('limit', str(SEARCH_LIMIT_DEFAULT))
+    if not limit.isdigit() or int(limit) not in range(1, PAGE_LIMIT_MAX + 1):
+        return jsonify(message = f"Wrong value limit={limit}, expected 1..{PAGE_LIMIT_MAX}"), HTTPStatus.BAD_REQUEST
+    after = request.args.get('after')
+    offset = decode_cursor(after, 1)[0] if after else 0
+    if not isinstance(offset, int) or offset < 0:
+        return jsonify(message = f"Wrong cursor after={after}"), HTTPStatus.BAD_REQUEST
+
+    rank = func.bm25(literal_column('quotes_fts'))
+    query = (db.select(QuoteModel, rank)
+             .join(quotes_fts, quotes_fts.c.rowid == QuoteModel.id)
+             .join(QuoteModel.author)
+             .options(contains_eager(QuoteModel.author))
+             .where(literal_column('quotes_fts').op('MATCH')(fts_match_query(q)),
+                    QuoteModel.deleted == False, AuthorModel.deleted == False)
+             .order_by(rank, QuoteModel.id)
+             .offset(offset).limit(int(limit) + 1))
+    rows = db.session.execute(query).all()
+    items = [dict(quote.to_dict(), rank=quote_rank) for quote, quote_rank in rows[:int(limit)]]
+    next_cursor = encode_cursor([offset + int(limit)]) if len(rows) > int(limit) else None
+    return jsonify(items = items, next = next_cursor), HTTPStatus.OK
 
 
 @app.route("/quotes/filter", methods=['GET'])
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
 def filtered_quotes() -> list[dict]:
     """Выводит отфильтрованный список цитат"""
-    args = request.args.to_dict()
-
-    # quotes = db.session.execute(db.select(QuoteModel).filter_by(id=id)).scalar_one_or_none()
-    # if name_filter:
-        # quotes_db = db.session.execute(db.select(QuoteModel).filter_by(QuoteModel.author.has(name=name_filter)).scalars()
-        # query = db.select(QuoteModel).filter_by(**args)
-
-    query = db.select(QuoteModel).filter_by(**args)
-    quotes_db = db.session.execute(query).scalars()
-    quotes = []
-    for quote_db in quotes_db:
-        if not quote_db.deleted:
-            quotes.append(quote_db.to_dict())        
-    return jsonify(quotes), HTTPStatus.OK
+    args = [(key, value) for key, value in request.args.items(multi=True) if key not in PAGING_ARGS]
+    if app.config['READ_MODEL'] and 'stream' not in request.args:
+        return read_model_list_response(*compile_quote_predicates(args))
+    query = select_quote_rows().where(QuoteModel.deleted == False, *compile_quote_filters(args))
+    return list_response(query, (QuoteModel.id,), QUOTE_JSON)
 
 
 if __name__ == "__main__":
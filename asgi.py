@@ -0,0 +1,617 @@
+"""ASGI-точка входа: маршруты /authors и /quotes на асинхронном движке SQLAlchemy
+
+Запуск:
+    uvicorn asgi:application --timeout-graceful-shutdown 5
+
+uvicorn при остановке ждет закрытия соединений, а поток /changes/stream сам не
+заканчивается, поэтому время ожидания ограничено --timeout-graceful-shutdown.
+
+Частые запросы (списки, автор, цитата, цитаты автора, количество, случайные
+цитаты, голосование) и поток журнала изменений /changes/stream выполняются в
+цикле событий через AsyncSession (aiosqlite для SQLite, asyncpg для PostgreSQL),
+поэтому медленные клиенты, ожидание БД и открытые потоки SSE не занимают потоки. Остальные маршруты, HEAD и потоковые ответы
+(stream) обслуживает Flask-приложение в пуле из ASGI_WSGI_THREADS потоков.
+
+flask_application - то же Flask-приложение целиком через пул потоков, для
+сравнения под той же ASGI-серверной частью (benchmarks/async_load.py).
+"""
+import asyncio
+import concurrent.futures
+import functools
+import io
+import re
+import sys
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import joinedload
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags, parse_date, quote_etag, http_date
+
+from app import (app, AuthorModel, QuoteModel, READER_BIND, READ_METHODS, apply_sqlite_pragmas, select_quotes,
+                 paging_args, page_query, page_items, collection_version, quote_version, author_version,
+                 author_quotes_version, http_validators, is_not_modified, record_changes, response_cache,
+                 live_quote_ids, count_quotes_query, RATE_RANGE, RowJSON, AUTHOR_JSON, QUOTE_JSON, QUOTE_SHORT_JSON,
+                 select_quote_rows, json_is_compact, rows_body, author_quotes_body, metrics, request_stats,
+                 new_request_stats, rate_limiter, too_many_requests, PAGE_LIMIT_MAX, change_notifier, changes_args,
+                 change_items, change_event, SSE_KEEPALIVE, read_model, read_model_page, uses_fragments,
+                 fragments_enabled, row_fragments, fragments_body, author_quotes_fragments_body, random_size)
+
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_uri(uri: str):
+    """URL БД с асинхронным драйвером вместо синхронного"""
+    url = make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def create_engine(uri: str):
+    engine = create_async_engine(async_database_uri(uri), **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', apply_sqlite_pragmas)
+    return engine
+
+
+engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+reader_engine = engine
+if READER_BIND in app.config.get('SQLALCHEMY_BINDS', {}):
+    reader_engine = create_engine(app.config['SQLALCHEMY_BINDS'][READER_BIND])
+WriterSession = async_sessionmaker(engine, expire_on_commit=False)
+ReaderSession = async_sessionmaker(reader_engine, expire_on_commit=False)
+
+
+class AsyncRequest:
+    """Данные HTTP-запроса из ASGI scope, которые нужны обработчикам"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope['query_string'].decode('latin-1')
+        self.args = MultiDict(parse_qsl(self.query_string, keep_blank_values=True))
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.if_none_match = parse_etags(headers.get('if-none-match'))
+        self.if_modified_since = parse_date(headers.get('if-modified-since'))
+        # как ключ app.coalesced: URL и заголовки условного запроса
+        self.coalescing_key = (self.full_path, headers.get('if-none-match'), headers.get('if-modified-since'))
+        self.client = scope['client'][0] if scope.get('client') else ''
+        self.last_event_id = headers.get('last-event-id')
+        # ETag ответа из conditional - часть ключа кэша ответов (cached)
+        self.etag = None
+
+    @property
+    def full_path(self) -> str:
+        """Путь с параметрами, как request.full_path во Flask (ключ кэша ответов)"""
+        return f"{self.path}?{self.query_string}"
+
+
+def json_response(data, status: int = HTTPStatus.OK) -> tuple:
+    """Ответ (тело, статус, заголовки) с тем же JSON, что дает jsonify"""
+    response = app.json.response(data)
+    return response.get_data(), status, [(b'content-type', response.mimetype.encode())]
+
+
+def text_response(body: str | bytes, status: int = HTTPStatus.OK) -> tuple:
+    """Ответ с уже готовым JSON"""
+    body = body if isinstance(body, bytes) else body.encode()
+    return body, status, [(b'content-type', app.json.mimetype.encode())]
+
+
+ROUTES = []
+
+
+def route(pattern: str, methods=('GET',)):
+    """Регистрирует асинхронный обработчик; именованные группы pattern - целые аргументы"""
+    def decorator(handler):
+        ROUTES.append((re.compile(pattern + '$'), methods, handler))
+        return handler
+    return decorator
+
+
+def conditional(version_func):
+    """Асинхронный аналог app.conditional: ETag/Last-Modified и 304"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, session, **kwargs):
+            version = await session.run_sync(lambda sync_session: version_func(**kwargs, session=sync_session))
+            if version is None:
+                return await handler(request, session, **kwargs)
+            etag, last_modified = http_validators(version)
+            request.etag = etag
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                body, status, headers = b'', HTTPStatus.NOT_MODIFIED, []
+            else:
+                body, status, headers = await handler(request, session, **kwargs)
+                if status != HTTPStatus.OK:
+                    return body, status, headers
+            headers = headers + [(b'etag', quote_etag(etag).encode())]
+            if last_modified is not None:
+                headers.append((b'last-modified', http_date(last_modified).encode()))
+            return body, status, headers
+        return wrapper
+    return decorator
+
+
+def cached(namespace: str, key_arg: str | None = None):
+    """Асинхронный аналог app.cached: записи общие с Flask-обработчиками"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, session, **kwargs):
+            if not app.config['RESPONSE_CACHE'] or request.etag is None:
+                return await handler(request, session, **kwargs)
+            key = response_cache.key(namespace, kwargs[key_arg] if key_arg else request.full_path, request.etag)
+            entry = response_cache.get(key)
+            if entry is not None:
+                body, status, mimetype = entry
+                return body, status, [(b'content-type', mimetype.encode())]
+            epoch = response_cache.epoch
+            body, status, headers = await handler(request, session, **kwargs)
+            if status == HTTPStatus.OK:
+                response_cache.set(key, (body, status, 'application/json'), epoch)
+            return body, status, headers
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    """Асинхронный аналог app.SingleFlight в цикле событий (без блокировок)"""
+
+    def __init__(self):
+        self._calls: dict[tuple, asyncio.Future] = {}
+
+    async def do(self, key, func):
+        """Результат await func() и признак того, что он получен от чужого вызова"""
+        call = self._calls.get(key)
+        if call is not None:
+            result = await asyncio.shield(call)
+            # None - у ведущего вызова исключение, выполняем сами
+            return (result, True) if result is not None else (await func(), False)
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await func()
+            return result, False
+        finally:
+            del self._calls[key]
+            call.set_result(result)
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(handler):
+    """Асинхронный аналог app.coalesced: одинаковые одновременные GET выполняются один раз"""
+    @functools.wraps(handler)
+    async def wrapper(request, session, **kwargs):
+        if not app.config['SINGLE_FLIGHT']:
+            return await handler(request, session, **kwargs)
+        response, shared = await single_flight.do(request.coalescing_key,
+                                                  lambda: handler(request, session, **kwargs))
+        if shared:
+            metrics.coalesced_requests.inc((handler.__name__,))
+        return response
+    return wrapper
+
+
+async def list_response(request, session, query, order_columns: tuple, serialize) -> tuple:
+    """Список целиком или страница (limit, after), как app.list_response без stream"""
+    limit, _ = paging_args(request.args)
+    query = page_query(query, order_columns, request.args.get('after'))
+    if isinstance(serialize, RowJSON) and uses_fragments(serialize, order_columns):
+        query = query.limit(limit + 1) if limit else query
+        keys, fragments = await session.run_sync(lambda sync_session: row_fragments(sync_session, query, serialize))
+        return text_response(fragments_body(keys, fragments, limit, order_columns))
+    result = await session.execute(query.limit(limit + 1) if limit else query)
+    if isinstance(serialize, RowJSON):
+        return rows_list_response(result.all(), limit, order_columns, serialize)
+    rows = result.scalars().all()
+    if limit:
+        return json_response(page_items(rows, limit, order_columns, serialize))
+    return json_response([serialize(row) for row in rows])
+
+
+def rows_list_response(rows: list, limit: int | None, order_columns: tuple, row_json: RowJSON) -> tuple:
+    """Аналог app.rows_list_response"""
+    if json_is_compact():
+        return text_response(rows_body(rows, limit, order_columns, row_json))
+    if limit:
+        return json_response(page_items(rows, limit, order_columns, row_json.to_dict))
+    return json_response([row_json.to_dict(row) for row in rows])
+
+
+async def synced_read_model(session):
+    """Аналог app.synced_read_model: журнал изменений читается через AsyncSession"""
+    await session.run_sync(read_model.sync)
+    return read_model
+
+
+@route(r'/authors/(?P<author_id>\d+)')
+@coalesced
+@conditional(author_version)
+@cached('author', 'author_id')
+async def get_author(request, session, author_id):
+    """Возвращает автора по id"""
+    author = await session.get(AuthorModel, author_id)
+    if author and not author.deleted:
+        return json_response({"author": author.to_dict()})
+    return json_response({"message": f"Author with id={author_id} not found"}, HTTPStatus.NOT_FOUND)
+
+
+@route(r'/authors')
+@conditional(functools.partial(collection_version, 'authors'))
+@cached('authors')
+async def get_authors(request, session):
+    """Возвращает список авторов"""
+    query = AUTHOR_JSON.select().where(AuthorModel.deleted == False)
+    return await list_response(request, session, query, (AuthorModel.id,), AUTHOR_JSON)
+
+
+@route(r'/authors/(?P<author_id>\d+)/quotes')
+@coalesced
+@conditional(author_quotes_version)
+@cached('author_quotes', 'author_id')
+async def get_author_quotes(request, session, author_id):
+    """Выводит список цитат по id автора"""
+    if app.config['READ_MODEL']:
+        author = (await synced_read_model(session)).author(author_id)
+        rows = read_model.author_quotes_rows(author_id) if author else None
+    else:
+        author = await session.get(AuthorModel, author_id)
+        if author and author.deleted:
+            author = None
+        query = QUOTE_SHORT_JSON.select().where(QuoteModel.author_id == author_id)
+        if author and fragments_enabled():
+            _, fragments = await session.run_sync(lambda sync_session: row_fragments(sync_session, query, QUOTE_SHORT_JSON))
+            return text_response(author_quotes_fragments_body(author, fragments))
+        rows = (await session.execute(query)).all() if author else None
+    if author:
+        if json_is_compact():
+            return text_response(author_quotes_body(author, rows))
+        return json_response({"author": author.to_dict(), "quotes": [QUOTE_SHORT_JSON.to_dict(row) for row in rows]})
+    return json_response({"message": f"Author with id={author_id} not found"}, HTTPStatus.NOT_FOUND)
+
+
+@route(r'/quotes')
+@conditional(functools.partial(collection_version, 'quotes'))
+@cached('quotes')
+async def get_quotes(request, session):
+    """Выводит список цитат"""
+    if app.config['READ_MODEL']:
+        rows, limit = read_model_page(request.args, await synced_read_model(session))
+        return rows_list_response(rows, limit, (QuoteModel.id,), QUOTE_JSON)
+    query = select_quote_rows().where(QuoteModel.deleted == False)
+    return await list_response(request, session, query, (QuoteModel.id,), QUOTE_JSON)
+
+
+@route(r'/quotes/(?P<quote_id>\d+)')
+@coalesced
+@conditional(quote_version)
+@cached('quote', 'quote_id')
+async def get_quote(request, session, quote_id):
+    """Выводит цитату по id"""
+    if app.config['READ_MODEL']:
+        row = (await synced_read_model(session)).quote(quote_id)
+        if row:
+            return json_response(QUOTE_JSON.to_dict(row))
+        return json_response({"message": f"Quote with id={quote_id} not found"}, HTTPStatus.NOT_FOUND)
+    quote = await session.get(QuoteModel, quote_id, options=[joinedload(QuoteModel.author)])
+    if quote and not quote.deleted:
+        return json_response(quote.to_dict())
+    return json_response({"message": f"Quote with id={quote_id} not found"}, HTTPStatus.NOT_FOUND)
+
+
+@route(r'/quotes/count')
+async def quotes_count(request, session):
+    """Выводит количество цитат в базе данных"""
+    count = await session.scalar(count_quotes_query())
+    return json_response({"count": count})
+
+
+@route(r'/quotes/random')
+async def random_quote(request, session):
+    """Выводит случайную цитату или n=<число> (до PAGE_LIMIT_MAX) различных случайных цитат"""
+    n = random_size(request.args)
+    if app.config['READ_MODEL']:
+        quotes = [QUOTE_JSON.to_dict(row) for row in (await synced_read_model(session)).sample(n or 1)]
+    else:
+        pool = await session.run_sync(live_quote_ids)
+        ids = pool.sample(n or 1)
+        quotes_db = await session.scalars(select_quotes().where(QuoteModel.id.in_(ids)).filter_by(deleted=False))
+        quotes_by_id = {quote_db.id: quote_db for quote_db in quotes_db}
+        for quote_id in set(ids) - quotes_by_id.keys():
+            pool.discard(quote_id)
+        quotes = [quotes_by_id[quote_id].to_dict() for quote_id in ids if quote_id in quotes_by_id]
+    if not quotes:
+        return json_response({"message": "No quotes found"}, HTTPStatus.NOT_FOUND)
+    if n is None:
+        return json_response(quotes[0])
+    return json_response(quotes)
+
+
+async def change_events(since: int):
+    """Асинхронный аналог app.change_events: ждет коммитов без потока из пула"""
+    loop = asyncio.get_running_loop()
+    committed = asyncio.Event()
+
+    def listener():
+        loop.call_soon_threadsafe(committed.set)
+
+    change_notifier.subscribe(listener)
+    try:
+        yield SSE_KEEPALIVE.encode()
+        last_sent = loop.time()
+        while True:
+            committed.clear()
+            async with ReaderSession() as session:
+                items = await session.run_sync(
+                    lambda sync_session: change_items(since, PAGE_LIMIT_MAX, session=sync_session))
+            if items:
+                yield ''.join(map(change_event, items)).encode()
+                since = items[-1]['seq']
+                last_sent = loop.time()
+                if len(items) == PAGE_LIMIT_MAX:
+                    continue
+            elif loop.time() - last_sent >= app.config['CHANGES_KEEPALIVE']:
+                yield SSE_KEEPALIVE.encode()
+                last_sent = loop.time()
+            try:
+                await asyncio.wait_for(committed.wait(), app.config['CHANGES_POLL_INTERVAL'])
+            except TimeoutError:
+                pass
+    finally:
+        change_notifier.unsubscribe(listener)
+
+
+@route(r'/changes/stream')
+async def stream_changes(request, session):
+    """Поток SSE записей журнала изменений, продолжается с since или Last-Event-ID"""
+    since, _ = changes_args(request.args, request.last_event_id)
+    return change_events(since), HTTPStatus.OK, [
+        (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no')]
+
+
+async def vote_response(session, quote_id: int, delta: int, limit_message: str):
+    """Голос за цитату одним UPDATE, как app.vote_response; буфер голосов остается за Flask"""
+    if app.config['VOTE_BUFFER']:
+        return None
+    row = (await session.execute(
+        update(QuoteModel)
+        .where(QuoteModel.id == quote_id, QuoteModel.deleted == False,
+               (QuoteModel.rating + delta).between(min(RATE_RANGE), max(RATE_RANGE)))
+        .values(rating=QuoteModel.rating + delta)
+        .returning(QuoteModel.rating, QuoteModel.author_id)
+    )).one_or_none()
+    if row is not None:
+        new_rating, author_id = row
+        await session.run_sync(lambda sync_session: record_changes(quotes=[(quote_id, author_id)], session=sync_session))
+        await session.commit()
+        return json_response({"message": f"Your vote has been accepted, new rating is {new_rating}."})
+    quote = await session.get(QuoteModel, quote_id)
+    if quote and not quote.deleted:
+        return json_response({"message": limit_message})
+    return json_response({"message": f"Quote with id={quote_id} not found"}, HTTPStatus.NOT_FOUND)
+
+
+@route(r'/quotes/(?P<quote_id>\d+)/up', methods=('PUT',))
+async def up_quote(request, session, quote_id):
+    """Повышает рейтинг цитаты"""
+    return await vote_response(session, quote_id, 1, f"Quote with id={quote_id} has maximal rating.")
+
+
+@route(r'/quotes/(?P<quote_id>\d+)/down', methods=('PUT',))
+async def down_quote(request, session, quote_id):
+    """Понижает рейтинг цитаты"""
+    return await vote_response(session, quote_id, -1, f"Quote with id={quote_id} has minimal rating.")
+
+
+class ReceiveStream(io.RawIOBase):
+    """Тело запроса для wsgi.input: сообщения ASGI receive читаются по мере чтения потоком пула
+
+    Так /import и bulk-маршруты через Flask читают тело частями, не собирая
+    его целиком в памяти.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = b''
+        self._offset = 0
+        self._more_body = True
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._offset == len(self._chunk) and self._more_body:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            # после http.disconnect тела больше не будет: конец потока
+            self._chunk, self._offset = message.get('body', b''), 0
+            self._more_body = message['type'] == 'http.request' and message.get('more_body', False)
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+def wsgi_environ(scope, wsgi_input) -> dict:
+    """WSGI environ из ASGI scope и потока тела запроса"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': wsgi_input,
+        # тело без Content-Length (chunked) читается до конца потока
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'quotes.rate_limit_checked': scope.get('quotes.rate_limit_checked', False),
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class WSGIApplication:
+    """ASGI-обертка WSGI-приложения: каждый запрос целиком выполняется в одном потоке пула
+
+    Поток занят, пока ответ не отправлен клиенту, как у обычного WSGI-сервера
+    с пулом потоков; потоковые ответы (stream_with_context) работают без изменений.
+    Тело запроса поток читает из receive по мере надобности (ReceiveStream).
+    """
+
+    def __init__(self, wsgi_app, threads: int):
+        self.wsgi_app = wsgi_app
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        wsgi_input = io.BufferedReader(ReceiveStream(receive, loop))
+        await loop.run_in_executor(self.executor, self.run, wsgi_environ(scope, wsgi_input), send, loop)
+
+    def run(self, environ: dict, send, loop):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            started = False
+            for chunk in iterable:
+                if not started:
+                    send_message({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+                    started = True
+                if chunk:
+                    send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_message({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+
+flask_application = WSGIApplication(app.wsgi_app, app.config['ASGI_WSGI_THREADS'])
+
+
+def match_route(request: AsyncRequest):
+    """Асинхронный обработчик и его аргументы или (None, None), если маршрут обслуживает Flask"""
+    if 'stream' in request.args:
+        return None, None
+    for pattern, methods, handler in ROUTES:
+        match = pattern.match(request.path)
+        if match and request.method in methods:
+            return handler, {name: int(value) for name, value in match.groupdict().items()}
+    return None, None
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            if reader_engine is not engine:
+                await reader_engine.dispose()
+            flask_application.executor.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    request = AsyncRequest(scope)
+    handler, kwargs = match_route(request)
+    response = None
+    if handler is not None:
+        started = time.perf_counter()
+        stats_token = request_stats.set(new_request_stats(handler.__name__))
+        session_class = ReaderSession if request.method in READ_METHODS else WriterSession
+        try:
+            retry_after = rate_limiter.retry_after(request.client, handler.__name__) if app.config['RATE_LIMIT'] else 0
+            # если обработчик вернет None, запрос уйдет во Flask - там он уже не проверяется
+            scope['quotes.rate_limit_checked'] = True
+            try:
+                if retry_after:
+                    message, headers = too_many_requests(retry_after)
+                    body, status, content_type = json_response({"message": message}, HTTPStatus.TOO_MANY_REQUESTS)
+                    response = body, status, content_type + [(b'retry-after', headers['Retry-After'].encode())]
+                else:
+                    async with session_class() as session:
+                        response = await handler(request, session, **kwargs)
+            except HTTPException as e:
+                response = json_response({"message": e.description}, e.code)
+            if response is not None:
+                body, status, headers = response
+                # потоковый ответ учитывается в метриках до отдачи, как во Flask
+                streaming = not isinstance(body, bytes)
+                if not streaming:
+                    await send_response(send, body, status, headers)
+                if app.config['METRICS']:
+                    metrics.observe_request(request_stats.get(), request.method, status,
+                                            time.perf_counter() - started, None if streaming else len(body))
+                if streaming:
+                    await send_stream(send, receive, body, status, headers)
+        finally:
+            request_stats.reset(stats_token)
+    if response is None:
+        await flask_application(scope, receive, send)
+
+
+async def send_response(send, body: bytes, status: int, headers: list):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_stream(send, receive, chunks, status: int, headers: list):
+    """Отдает части асинхронного генератора chunks, пока он не кончится или клиент не отключится"""
+    async def stream():
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    streamer = asyncio.create_task(stream())
+    watcher = asyncio.create_task(wait_disconnect())
+    try:
+        await asyncio.wait((streamer, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        streamer.cancel()
+        watcher.cancel()
+        await asyncio.gather(streamer, watcher, return_exceptions=True)
+        await chunks.aclose()
+    if not streamer.cancelled() and streamer.exception() is not None:
+        raise streamer.exception()
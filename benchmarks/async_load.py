@@ -0,0 +1,134 @@
+"""Задержки при большом числе одновременных соединений: asgi:application против Flask в пуле потоков
+
+Оба варианта запускаются под uvicorn на одной и той же БД: 'asgi' - асинхронные
+обработчики (asgi.application), 'wsgi' - все запросы через Flask в пуле из
+ASGI_WSGI_THREADS потоков (asgi.flask_application). Клиент держит --connections
+keep-alive соединений, каждое шлет запросы подряд: чтение цитаты, цитат автора
+и голосование. Результат - p50/p90/p99 задержек и запросы в секунду.
+
+Запуск из корня репозитория (нужны uvicorn и aiosqlite):
+    python benchmarks/async_load.py --connections 1000 --seconds 20
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BASE_DIR, create_database, write_results
+
+MODES = {'asgi': 'asgi:application', 'wsgi': 'asgi:flask_application'}
+
+
+def request_target(quotes: int, authors: int) -> tuple[str, str]:
+    roll = random.random()
+    if roll < 0.8:
+        return 'GET', f'/quotes/{random.randint(1, quotes)}'
+    if roll < 0.9:
+        return 'GET', f'/authors/{random.randint(1, authors)}/quotes'
+    return 'PUT', f'/quotes/{random.randint(1, quotes)}/{random.choice(("up", "down"))}'
+
+
+async def read_response(reader) -> int:
+    """Читает ответ HTTP/1.1 с Content-Length и возвращает статус"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def connection(port: int, args, deadline: float, latencies: list, counters: dict):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        counters['errors'] += 1
+        return
+    try:
+        while time.monotonic() < deadline:
+            method, path = request_target(args.quotes, args.authors)
+            started = time.perf_counter()
+            writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n'.encode())
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            counters['ok' if status < 500 else 'errors'] += 1
+    except (OSError, asyncio.IncompleteReadError):
+        counters['errors'] += 1
+    finally:
+        writer.close()
+
+
+async def load(port: int, args) -> dict:
+    latencies, counters = [], {'ok': 0, 'errors': 0}
+    deadline = time.monotonic() + args.seconds
+    await asyncio.gather(*(connection(port, args, deadline, latencies, counters) for _ in range(args.connections)))
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+    return {
+        'requests_per_second': round(len(latencies) / args.seconds, 1),
+        'errors': counters['errors'],
+        'p50_ms': percentile(0.5),
+        'p90_ms': percentile(0.9),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def run_mode(mode: str, args, db_dir: str) -> dict:
+    create_database(f'sqlite:///{Path(db_dir) / mode}.db', args.authors, args.quotes, args.seed, args.profile)
+
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', MODES[mode], '--port', str(args.port),
+                               '--log-level', 'warning', '--no-access-log', '--backlog', str(args.connections * 2)],
+                              cwd=BASE_DIR)
+    try:
+        wait_for_port(args.port)
+        summary = asyncio.run(load(args.port, args))
+    finally:
+        server.terminate()
+        server.wait()
+    return {'mode': mode, 'profile': args.profile, 'connections': args.connections, **summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--quotes', type=int, default=10000)
+    parser.add_argument('--authors', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', default='production', help='профиль SQLite сервера (app.SQLITE_PROFILES)')
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        results = [run_mode(mode, args, db_dir) for mode in args.modes]
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Общее для бенчмарков: временная БД с данными datagen, коммит и вывод результатов
+
+Каждый бенчмарк создает свои БД через create_database: схема - миграциями
+(flask db upgrade), данные - datagen.seed_database в отдельном процессе, потому
+что app читает QUOTES_DATABASE_URI и QUOTES_SQLITE_PROFILE один раз при импорте,
+а бенчмарки создают по БД на профиль или режим. Процессы, запущенные после
+create_database (сервер, исполнители, import app), работают с этой БД и профилем.
+"""
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# app импортируется из корня репозитория, в том числе в дочерних процессах spawn
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+
+def create_database(uri: str, authors: int, quotes: int, seed: int = 0, profile: str = 'default'):
+    """Создает схему миграциями и заполняет БД по адресу uri профилем SQLITE_PROFILES profile"""
+    from datagen import seed_database
+    os.environ['QUOTES_DATABASE_URI'] = uri
+    os.environ['QUOTES_SQLITE_PROFILE'] = profile
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                   cwd=BASE_DIR, check=True, capture_output=True)
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        pool.apply(seed_database, (authors, quotes, seed))
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def write_results(results, output: str | None):
+    """Печатает результаты в JSON и, если задан output, сохраняет их в файл"""
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(text)
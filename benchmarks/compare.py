@@ -0,0 +1,48 @@
+"""Сравнение результатов бенчмарков двух коммитов
+
+Понимает JSON pytest-benchmark (benchmarks/micro.py, медиана) и
+benchmarks/load_scenario.py (p99 по задачам и в целом). Выводит изменение в
+процентах и завершается с кодом 1, если что-то замедлилось больше --threshold.
+
+Запуск:
+    python benchmarks/compare.py benchmarks/results/micro-abc123.json benchmarks/results/micro-def456.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def measurements(path: str) -> dict[str, float]:
+    """Показатели файла результатов: имя -> значение (меньше - лучше)"""
+    data = json.loads(Path(path).read_text())
+    if 'benchmarks' in data:
+        return {bench['fullname']: bench['stats']['median'] for bench in data['benchmarks']}
+    values = {'total:p99_ms': data['total']['p99_ms']}
+    for name, task in data['tasks'].items():
+        values[f'{name}:p99_ms'] = task['p99_ms']
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10, help='допустимое замедление, %%')
+    args = parser.parse_args()
+
+    baseline, candidate = measurements(args.baseline), measurements(args.candidate)
+    regressions = 0
+    for name in sorted(baseline.keys() & candidate.keys()):
+        change = (candidate[name] - baseline[name]) / baseline[name] * 100 if baseline[name] else 0
+        regressed = change > args.threshold
+        regressions += regressed
+        print(f"{'SLOWER' if regressed else 'ok':6}  {change:+7.1f}%  {baseline[name]:.6g} -> {candidate[name]:.6g}  {name}")
+    for name in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{'only in ' + ('baseline' if name in baseline else 'candidate'):>24}  {name}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
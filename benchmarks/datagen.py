@@ -0,0 +1,80 @@
+"""Генератор данных для бенчмарков: N авторов и M цитат в форме sqlite_examples
+
+Имена авторов, тексты и рейтинги берутся из sqlite_examples/sql_create_quotes.py
+и размножаются с номерами; при одном и том же --seed данные одинаковые.
+Строки вставляются пачками (executemany) напрямую в БД приложения.
+
+Запуск из корня репозитория (БД из QUOTES_DATABASE_URI или quotes.db):
+    flask --app app db upgrade
+    python benchmarks/datagen.py --authors 1000 --quotes 100000
+"""
+import argparse
+import ast
+import random
+import re
+
+from common import BASE_DIR
+
+EXAMPLE_ROW_RE = re.compile(r"\('((?:[^']|'')*)', '((?:[^']|'')*)', (\d+)\)")
+BATCH_SIZE = 5000
+
+
+def example_quotes() -> list[tuple[str, str, int]]:
+    """Строки (author, text, rate) из create_quotes в sqlite_examples/sql_create_quotes.py
+
+    Файл не импортируется: при импорте он пишет в store.db.
+    """
+    module = ast.parse((BASE_DIR / 'sqlite_examples' / 'sql_create_quotes.py').read_text(encoding='utf-8'))
+    for node in module.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == 'create_quotes':
+            return [(author.replace("''", "'"), text.replace("''", "'"), int(rate))
+                    for author, text, rate in EXAMPLE_ROW_RE.findall(node.value.value)]
+    raise ValueError('create_quotes not found in sqlite_examples/sql_create_quotes.py')
+
+
+def generate_rows(authors: int, quotes: int, seed: int = 0, first_author_id: int = 1):
+    """Строки авторов (name, surname) и цитат (author_id, text, rating) по образцам
+
+    Авторы получают id first_author_id, first_author_id + 1, ...; номер в имени
+    делает пару (name, surname) уникальной (AuthorFullNameConstrant).
+    """
+    examples = example_quotes()
+    rng = random.Random(seed)
+    author_rows = []
+    for author_id in range(first_author_id, first_author_id + authors):
+        name, _, surname = examples[author_id % len(examples)][0].partition(' ')
+        author_rows.append({'name': f'{name[:20]} {author_id}', 'surname': surname[:32]})
+    quote_rows = []
+    for i in range(quotes):
+        _, text, rate = examples[rng.randrange(len(examples))]
+        quote_rows.append({'author_id': rng.randrange(first_author_id, first_author_id + authors),
+                           'text': f'{text[:240]} #{i}', 'rating': rng.choice((rate, rng.randint(1, 5)))})
+    return author_rows, quote_rows
+
+
+def seed_database(authors: int, quotes: int, seed: int = 0):
+    """Вставляет сгенерированные строки в БД приложения (app.config['SQLALCHEMY_DATABASE_URI'])"""
+    from app import app, db, AuthorModel, QuoteModel, bump_collection_versions
+    with app.app_context():
+        first_author_id = (db.session.execute(db.select(db.func.max(AuthorModel.id))).scalar() or 0) + 1
+        author_rows, quote_rows = generate_rows(authors, quotes, seed, first_author_id)
+        for rows, model in ((author_rows, AuthorModel), (quote_rows, QuoteModel)):
+            for start in range(0, len(rows), BATCH_SIZE):
+                db.session.execute(db.insert(model), rows[start:start + BATCH_SIZE])
+        bump_collection_versions(db.session.connection(), {'authors', 'quotes'})
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--quotes', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    seed_database(args.authors, args.quotes, args.seed)
+    print(f'Inserted {args.authors} authors and {args.quotes} quotes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Нагрузочный сценарий смешанного трафика: чтение, голосование и запись
+
+Как в locust: --users виртуальных пользователей, у каждого свое keep-alive
+соединение; пользователь выбирает задачу по весу из TASKS, выполняет запрос
+и ждет --think-time секунд. По каждой задаче считаются запросы, ошибки (5xx и
+разрывы) и задержки p50/p95/p99.
+
+Без --host сервер запускается сам под uvicorn на временной БД из
+benchmarks/common.py с профилем SQLite --profile (--mode asgi или wsgi,
+см. benchmarks/async_load.py).
+
+Запуск из корня репозитория:
+    python benchmarks/load_scenario.py --users 200 --seconds 30 \
+        --output benchmarks/results/load-$(git rev-parse --short HEAD).json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from async_load import MODES, read_response, wait_for_port
+from common import BASE_DIR, create_database, git_commit, write_results
+from datagen import example_quotes
+
+SEARCH_WORDS = ('теория', 'программы', 'вселенная', 'практика', 'танцы')
+
+
+class User:
+    """Виртуальный пользователь: выбирает id из диапазона сгенерированных данных"""
+
+    def __init__(self, authors: int, quotes: int):
+        self.authors = authors
+        self.quotes = quotes
+        self.examples = example_quotes()
+
+    def quote_id(self) -> int:
+        return random.randint(1, self.quotes)
+
+    def author_id(self) -> int:
+        return random.randint(1, self.authors)
+
+    def list_quotes(self):
+        # курсор как у app.encode_cursor: страница, начинающаяся со случайного id
+        cursor = base64.urlsafe_b64encode(json.dumps([self.quote_id()]).encode()).decode().rstrip('=')
+        return 'GET', f'/quotes?limit=50&after={cursor}', None
+
+    def get_quote(self):
+        return 'GET', f'/quotes/{self.quote_id()}', None
+
+    def author_quotes(self):
+        return 'GET', f'/authors/{self.author_id()}/quotes', None
+
+    def random_quotes(self):
+        return 'GET', f'/quotes/random?n={random.randint(1, 10)}', None
+
+    def filter_quotes(self):
+        return 'GET', f'/quotes/filter?rating__gte={random.randint(1, 5)}&limit=50', None
+
+    def search_quotes(self):
+        return 'GET', f'/quotes/search?q={quote(random.choice(SEARCH_WORDS))}', None
+
+    def vote(self):
+        return 'PUT', f'/quotes/{self.quote_id()}/{random.choice(("up", "down"))}', None
+
+    def create_quote(self):
+        _, text, rate = random.choice(self.examples)
+        return 'POST', f'/authors/{self.author_id()}/quotes', {'text': text[:200], 'rating': rate}
+
+    def edit_quote(self):
+        return 'PUT', f'/quotes/{self.quote_id()}', {'rating': random.randint(1, 5)}
+
+    def delete_quote(self):
+        return 'DELETE', f'/quotes/{self.quote_id()}', None
+
+
+# задача -> вес; доли примерно как в рабочем трафике: чтение ~75%, голоса ~15%, запись ~10%
+TASKS = {
+    User.get_quote: 30,
+    User.list_quotes: 10,
+    User.author_quotes: 10,
+    User.random_quotes: 10,
+    User.filter_quotes: 10,
+    User.search_quotes: 5,
+    User.vote: 15,
+    User.create_quote: 6,
+    User.edit_quote: 3,
+    User.delete_quote: 1,
+}
+
+
+async def run_user(host: str, port: int, args, deadline: float, stats: dict):
+    user = User(args.authors, args.quotes)
+    tasks, weights = list(TASKS), list(TASKS.values())
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.monotonic() < deadline:
+            task = random.choices(tasks, weights)[0]
+            method, path, payload = task(user)
+            body = json.dumps(payload).encode() if payload is not None else b''
+            headers = f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n'
+            if payload is not None:
+                headers += 'Content-Type: application/json\r\n'
+            task_stats = stats.setdefault(task.__name__, {'latencies': [], 'errors': 0})
+            started = time.perf_counter()
+            try:
+                writer.write(headers.encode() + b'\r\n' + body)
+                status = await read_response(reader)
+            except (OSError, asyncio.IncompleteReadError):
+                task_stats['errors'] += 1
+                return
+            task_stats['latencies'].append(time.perf_counter() - started)
+            if status >= 500:
+                task_stats['errors'] += 1
+            if args.think_time:
+                await asyncio.sleep(random.uniform(0, 2 * args.think_time))
+    finally:
+        writer.close()
+
+
+def summarize(latencies: list, errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(p: float):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / seconds, 1),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+async def load(host: str, port: int, args) -> dict:
+    stats = {}
+    deadline = time.monotonic() + args.seconds
+    await asyncio.gather(*(run_user(host, port, args, deadline, stats) for _ in range(args.users)))
+    tasks = {name: summarize(task['latencies'], task['errors'], args.seconds) for name, task in sorted(stats.items())}
+    total = summarize([latency for task in stats.values() for latency in task['latencies']],
+                      sum(task['errors'] for task in stats.values()), args.seconds)
+    return {'total': total, 'tasks': tasks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', help='адрес работающего сервера, например http://127.0.0.1:5000')
+    parser.add_argument('--mode', choices=list(MODES), default='asgi')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--think-time', type=float, default=0, help='средняя пауза между запросами, секунды')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--quotes', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', default='production', help='профиль SQLite сервера (app.SQLITE_PROFILES)')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        server = None
+        if args.host:
+            url = urlsplit(args.host)
+            host, port = url.hostname, url.port or 80
+        else:
+            create_database(f"sqlite:///{Path(db_dir) / 'load.db'}", args.authors, args.quotes, args.seed,
+                            args.profile)
+            host, port = '127.0.0.1', args.port
+            server = subprocess.Popen([sys.executable, '-m', 'uvicorn', MODES[args.mode], '--port', str(port),
+                                       '--log-level', 'warning', '--no-access-log'], cwd=BASE_DIR)
+            wait_for_port(port)
+        try:
+            summary = asyncio.run(load(host, port, args))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    results = {
+        'commit': git_commit(),
+        'scenario': {'mode': None if args.host else args.mode, 'profile': None if args.host else args.profile,
+                     'users': args.users, 'think_time': args.think_time, 'seconds': args.seconds, 'authors': args.authors, 'quotes': args.quotes, 'seed': args.seed},
+        **summary,
+    }
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Микробенчмарки (pytest-benchmark): сериализация цитат и запросы обработчиков
+
+БД создается во временном каталоге и заполняется benchmarks/datagen.py
+(BENCH_AUTHORS авторов, BENCH_QUOTES цитат). Функции бенчмарков называются
+bench_*, поэтому при обычном запуске pytest они не собираются.
+
+Запуск из корня репозитория, результаты - в JSON для сравнения между коммитами:
+    python -m pytest benchmarks/micro.py -o python_functions='bench_*' \
+        --benchmark-json=benchmarks/results/micro-$(git rev-parse --short HEAD).json
+    python benchmarks/compare.py old.json new.json
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import create_database
+
+BENCH_AUTHORS = int(os.environ.get('BENCH_AUTHORS', 1000))
+BENCH_QUOTES = int(os.environ.get('BENCH_QUOTES', 50000))
+PAGE = 1000
+
+
+@pytest.fixture(scope='session')
+def app():
+    with tempfile.TemporaryDirectory() as db_dir:
+        create_database(f"sqlite:///{Path(db_dir) / 'bench.db'}", BENCH_AUTHORS, BENCH_QUOTES)
+        import app as quotes_app
+        with quotes_app.app.app_context():
+            yield quotes_app
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def quotes(app):
+    return app.db.session.execute(app.select_quotes().order_by(app.QuoteModel.id).limit(PAGE)).scalars().all()
+
+
+@pytest.fixture(scope='session')
+def quote_rows(app):
+    return app.db.session.execute(app.select_quote_rows().order_by(app.QuoteModel.id).limit(PAGE)).all()
+
+
+def bench_quote_to_dict(benchmark, quotes):
+    benchmark(lambda: [quote.to_dict() for quote in quotes])
+
+
+def bench_quote_to_dict_json(benchmark, app, quotes):
+    benchmark(lambda: app.app.json.dumps([quote.to_dict() for quote in quotes], separators=app.COMPACT_SEPARATORS))
+
+
+def bench_quote_row_json(benchmark, app, quote_rows):
+    benchmark(app.QUOTE_JSON.dumps_list, quote_rows)
+
+
+def bench_select_quotes_orm(benchmark, app):
+    query = app.select_quotes().where(app.QuoteModel.deleted == False).order_by(app.QuoteModel.id).limit(PAGE)
+    benchmark(lambda: app.db.session.execute(query).scalars().all())
+
+
+def bench_select_quote_rows(benchmark, app):
+    query = app.select_quote_rows().where(app.QuoteModel.deleted == False).order_by(app.QuoteModel.id).limit(PAGE)
+    benchmark(lambda: app.db.session.execute(query).all())
+
+
+@pytest.mark.parametrize('path', [
+    f'/quotes?limit={PAGE}',
+    '/quotes/1',
+    '/authors/1/quotes',
+    '/quotes/filter?rating__gte=4&limit=100',
+    '/quotes/filter?author.name=Rick%204&text__contains=%D0%BF%D1%80%D0%B0%D0%BA',
+    '/quotes/random',
+    '/quotes/random?n=10',
+    '/quotes/search?q=%D1%82%D0%B5%D0%BE%D1%80%D0%B8%D1%8F',
+    '/quotes/count',
+    '/quotes/top?n=100',
+    '/authors/top?n=100',
+])
+def bench_get(benchmark, client, path):
+    response = client.get(path)
+    assert response.status_code == 200, response.data
+    benchmark(client.get, path)
+
+
+@pytest.mark.parametrize('path', ['/quotes', f'/quotes?limit={PAGE}', '/authors', '/authors/1/quotes'])
+def bench_get_fragments(benchmark, app, client, path):
+    """То же, что bench_get, со списками из кэша JSON-фрагментов (FRAGMENT_CACHE)"""
+    app.app.config['FRAGMENT_CACHE'] = True
+    try:
+        response = client.get(path)
+        assert response.status_code == 200, response.data
+        benchmark(client.get, path)
+    finally:
+        app.app.config['FRAGMENT_CACHE'] = False
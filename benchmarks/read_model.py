@@ -0,0 +1,108 @@
+"""Read model (app.ReadModel) против ORM: память на строку и запросы в секунду
+
+Память - прирост tracemalloc после загрузки каталога: ORM - все QuoteModel с
+авторами (select_quotes) плюс их to_dict(), read model - ReadModel.load().
+Запросы в секунду - тестовый клиент Flask по путям PATHS при READ_MODEL
+выключенном и включенном, --seconds секунд на путь, в одном потоке.
+
+Запуск из корня репозитория:
+    python benchmarks/read_model.py --authors 1000 --quotes 100000 \
+        --output benchmarks/results/read-model-$(git rev-parse --short HEAD).json
+"""
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import create_database, git_commit, write_results
+
+PATHS = (
+    '/quotes?limit=1000',
+    '/quotes/1',
+    '/authors/1/quotes',
+    '/quotes/filter?rating__gte=4&limit=100',
+    '/quotes/filter?author.name=Rick%204&text__contains=%D0%BF%D1%80%D0%B0%D0%BA',
+    '/quotes/random?n=10',
+)
+
+
+def allocated(load) -> tuple[int, object]:
+    """Прирост выделенной памяти (байт) после load() и ее результат, который держит эту память"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = load()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, result
+
+
+def memory_per_row(quotes_app) -> dict:
+    db, session = quotes_app.db, quotes_app.db.session
+
+    def load_orm():
+        quotes = session.execute(quotes_app.select_quotes()).scalars().all()
+        return quotes, [quote.to_dict() for quote in quotes]
+
+    orm_bytes, (quotes, _) = allocated(load_orm)
+    rows = len(quotes)
+    session.expunge_all()
+    del quotes
+    read_model = quotes_app.ReadModel()
+    read_model_bytes, _ = allocated(lambda: read_model.load(session))
+    session.rollback()
+    return {
+        'rows': rows,
+        'orm_bytes_per_row': round(orm_bytes / rows, 1),
+        'read_model_bytes_per_row': round(read_model_bytes / rows, 1),
+    }
+
+
+def requests_per_second(client, path: str, seconds: float) -> float:
+    response = client.get(path)
+    assert response.status_code == 200, response.data
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.get(path)
+        count += 1
+    return round(count / seconds, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--quotes', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        create_database(f"sqlite:///{Path(db_dir) / 'read_model.db'}", args.authors, args.quotes, args.seed)
+        import app as quotes_app
+        with quotes_app.app.app_context():
+            memory = memory_per_row(quotes_app)
+            client = quotes_app.app.test_client()
+            paths = {}
+            for path in PATHS:
+                quotes_app.app.config['READ_MODEL'] = False
+                orm = requests_per_second(client, path, args.seconds)
+                quotes_app.app.config['READ_MODEL'] = True
+                read_model = requests_per_second(client, path, args.seconds)
+                paths[path] = {'orm_rps': orm, 'read_model_rps': read_model, 'speedup': round(read_model / orm, 2)}
+
+    results = {
+        'commit': git_commit(),
+        'scenario': {'authors': args.authors, 'quotes': args.quotes, 'seed': args.seed, 'seconds': args.seconds},
+        'memory': memory,
+        'paths': paths,
+    }
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
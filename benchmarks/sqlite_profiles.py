@@ -0,0 +1,84 @@
+"""Сравнение пропускной способности чтения/записи для профилей SQLITE_PROFILES
+
+Для каждого профиля создается отдельная БД, в нее загружаются цитаты, затем
+процессы-читатели (GET /quotes/<id>) и процессы-писатели (PUT /quotes/<id>/up
+и /down) работают одновременно заданное время.
+
+Запуск из корня репозитория:
+    python benchmarks/sqlite_profiles.py --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import create_database, write_results
+
+
+def worker(role: str, quotes: int, seconds: float, ready, go, results):
+    from app import app
+    client = app.test_client()
+    ok = errors = 0
+    ready.put(role)
+    go.wait()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        quote_id = random.randint(1, quotes)
+        if role == 'reader':
+            response = client.get(f'/quotes/{quote_id}')
+        else:
+            response = client.put(f'/quotes/{quote_id}/{random.choice(("up", "down"))}')
+        if response.status_code < 500:
+            ok += 1
+        else:
+            errors += 1
+    results.put({'role': role, 'ok': ok, 'errors': errors})
+
+
+def run_profile(profile: str, args, db_dir: str) -> dict:
+    create_database(f'sqlite:///{Path(db_dir) / profile}.db', args.authors, args.quotes, args.seed, profile)
+    context = multiprocessing.get_context('spawn')
+    roles = ['reader'] * args.readers + ['writer'] * args.writers
+    ready, results, go = context.Queue(), context.Queue(), context.Event()
+    processes = [context.Process(target=worker, args=(role, args.quotes, args.seconds, ready, go, results))
+                 for role in roles]
+    for process in processes:
+        process.start()
+    for _ in roles:
+        ready.get()
+    go.set()
+    worker_results = [results.get() for _ in roles]
+    for process in processes:
+        process.join()
+
+    summary = {'profile': profile}
+    for role in ('reader', 'writer'):
+        ok = sum(result['ok'] for result in worker_results if result['role'] == role)
+        summary[f'{role}s'] = {
+            'ok_per_second': round(ok / args.seconds, 1),
+            'errors': sum(result['errors'] for result in worker_results if result['role'] == role),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['default', 'production'])
+    parser.add_argument('--quotes', type=int, default=10000)
+    parser.add_argument('--authors', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        results = [run_profile(profile, args, db_dir) for profile in args.profiles]
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
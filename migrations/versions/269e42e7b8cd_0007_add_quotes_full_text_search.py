@@ -0,0 +1,54 @@
+"""0007 Add quotes full-text search
+
+Revision ID: 269e42e7b8cd
+Revises: 44a700476b87
+Create Date: 2026-10-18 11:24:09.506117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '269e42e7b8cd'
+down_revision = '44a700476b87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 есть только в SQLite
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    # external content: текст хранится только в quotes, quotes_fts - индекс
+    op.execute("""
+        CREATE VIRTUAL TABLE quotes_fts USING fts5(
+            text, content='quotes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER quotes_fts_insert AFTER INSERT ON quotes BEGIN
+            INSERT INTO quotes_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER quotes_fts_delete AFTER DELETE ON quotes BEGIN
+            INSERT INTO quotes_fts(quotes_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER quotes_fts_update AFTER UPDATE OF text ON quotes BEGIN
+            INSERT INTO quotes_fts(quotes_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO quotes_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """)
+    op.execute("INSERT INTO quotes_fts(quotes_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER quotes_fts_update")
+    op.execute("DROP TRIGGER quotes_fts_delete")
+    op.execute("DROP TRIGGER quotes_fts_insert")
+    op.execute("DROP TABLE quotes_fts")
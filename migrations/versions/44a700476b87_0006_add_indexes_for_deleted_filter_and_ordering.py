@@ -0,0 +1,43 @@
+"""0006 Add indexes for deleted filter and ordering
+
+Revision ID: 44a700476b87
+Revises: 90bf4718cd1a
+Create Date: 2026-10-18 11:02:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '44a700476b87'
+down_revision = '90bf4718cd1a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('authors', schema=None) as batch_op:
+        batch_op.create_index('ix_authors_deleted_name', ['deleted', 'name'], unique=False)
+        batch_op.create_index('ix_authors_deleted_surname', ['deleted', 'surname'], unique=False)
+
+    # Частичные индексы только по неудаленным цитатам: SQLAlchemy подставляет
+    # deleted=False литералом (deleted = 0 / deleted = false), поэтому
+    # планировщик может их использовать.
+    with op.batch_alter_table('quotes', schema=None) as batch_op:
+        batch_op.create_index('ix_quotes_author_id_deleted', ['author_id', 'deleted'], unique=False)
+        batch_op.create_index('ix_quotes_live_id', ['id'], unique=False,
+                              sqlite_where=sa.text('deleted = 0'), postgresql_where=sa.text('deleted = false'))
+        batch_op.create_index('ix_quotes_live_author_id', ['author_id'], unique=False,
+                              sqlite_where=sa.text('deleted = 0'), postgresql_where=sa.text('deleted = false'))
+
+
+def downgrade():
+    with op.batch_alter_table('quotes', schema=None) as batch_op:
+        batch_op.drop_index('ix_quotes_live_author_id')
+        batch_op.drop_index('ix_quotes_live_id')
+        batch_op.drop_index('ix_quotes_author_id_deleted')
+
+    with op.batch_alter_table('authors', schema=None) as batch_op:
+        batch_op.drop_index('ix_authors_deleted_surname')
+        batch_op.drop_index('ix_authors_deleted_name')
@@ -0,0 +1,42 @@
+"""0008 Add row and collection versions
+
+Revision ID: 4a3f1b2fe2b6
+Revises: 269e42e7b8cd
+Create Date: 2026-10-18 12:05:37.214860
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a3f1b2fe2b6'
+down_revision = '269e42e7b8cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Колонки добавляются простым ALTER TABLE, без пересоздания таблиц
+    # (batch), чтобы не потерять триггеры FTS на quotes. Поэтому updated_at
+    # без server_default: SQLite не разрешает ADD COLUMN с DEFAULT CURRENT_TIMESTAMP.
+    for table_name in ('authors', 'quotes'):
+        op.add_column(table_name, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table_name, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table_name} SET updated_at = CURRENT_TIMESTAMP")
+
+    collection_versions = op.create_table('collection_versions',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(collection_versions, [{'name': 'authors'}, {'name': 'quotes'}])
+    op.execute("UPDATE collection_versions SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    op.drop_table('collection_versions')
+    for table_name in ('quotes', 'authors'):
+        op.drop_column(table_name, 'updated_at')
+        op.drop_column(table_name, 'version')
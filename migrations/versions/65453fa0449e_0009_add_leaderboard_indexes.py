@@ -0,0 +1,82 @@
+"""0009 Add leaderboard indexes
+
+Revision ID: 65453fa0449e
+Revises: 4a3f1b2fe2b6
+Create Date: 2026-10-18 14:02:51.318407
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '65453fa0449e'
+down_revision = '4a3f1b2fe2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Без batch: пересоздание quotes удалило бы триггеры FTS (см. 0008)
+    op.add_column('authors', sa.Column('quotes_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE authors SET quotes_count = (
+            SELECT count(*) FROM quotes WHERE quotes.author_id = authors.id AND NOT quotes.deleted
+        )
+    """)
+
+    # quotes_count - число неудаленных цитат автора, его ведут триггеры на
+    # quotes, поэтому он верен при любом способе записи (ORM, Core, bulk)
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("""
+            CREATE TRIGGER authors_quotes_count_insert AFTER INSERT ON quotes WHEN NOT new.deleted BEGIN
+                UPDATE authors SET quotes_count = quotes_count + 1 WHERE id = new.author_id;
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_count_delete AFTER DELETE ON quotes WHEN NOT old.deleted BEGIN
+                UPDATE authors SET quotes_count = quotes_count - 1 WHERE id = old.author_id;
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_count_update AFTER UPDATE OF author_id, deleted ON quotes BEGIN
+                UPDATE authors SET quotes_count = quotes_count - 1 WHERE id = old.author_id AND NOT old.deleted;
+                UPDATE authors SET quotes_count = quotes_count + 1 WHERE id = new.author_id AND NOT new.deleted;
+            END
+        """)
+    elif op.get_context().dialect.name == 'postgresql':
+        op.execute("""
+            CREATE FUNCTION authors_quotes_count() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') AND NOT OLD.deleted THEN
+                    UPDATE authors SET quotes_count = quotes_count - 1 WHERE id = OLD.author_id;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'INSERT') AND NOT NEW.deleted THEN
+                    UPDATE authors SET quotes_count = quotes_count + 1 WHERE id = NEW.author_id;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_count AFTER INSERT OR DELETE OR UPDATE OF author_id, deleted ON quotes
+            FOR EACH ROW EXECUTE FUNCTION authors_quotes_count()
+        """)
+
+    # Топы читаются обратным проходом по индексу: O(log n + k), без сортировки таблицы
+    op.create_index('ix_quotes_live_rating', 'quotes', ['rating', 'id'], unique=False,
+                    sqlite_where=sa.text('deleted = 0'), postgresql_where=sa.text('deleted = false'))
+    op.create_index('ix_authors_deleted_quotes_count', 'authors', ['deleted', 'quotes_count', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_authors_deleted_quotes_count', table_name='authors')
+    op.drop_index('ix_quotes_live_rating', table_name='quotes')
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER authors_quotes_count_update")
+        op.execute("DROP TRIGGER authors_quotes_count_delete")
+        op.execute("DROP TRIGGER authors_quotes_count_insert")
+    elif op.get_context().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER authors_quotes_count ON quotes")
+        op.execute("DROP FUNCTION authors_quotes_count()")
+    op.drop_column('authors', 'quotes_count')
@@ -0,0 +1,26 @@
+"""0012 Add authors deleted id index
+
+Revision ID: b81d4e6f2a37
+Revises: f3b7c1a9d204
+Create Date: 2026-10-18 18:12:40.104551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d4e6f2a37'
+down_revision = 'f3b7c1a9d204'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Список авторов по id (GET /authors): без этого индекса SQLite берет
+    # ix_authors_deleted_quotes_count и сортирует через временное B-дерево
+    op.create_index('ix_authors_deleted_id', 'authors', ['deleted', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_authors_deleted_id', table_name='authors')
@@ -0,0 +1,126 @@
+"""0013 Add authors quotes version and autoincrement quote ids
+
+Revision ID: c5e2a9d7f016
+Revises: b81d4e6f2a37
+Create Date: 2026-10-18 19:05:27.660318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2a9d7f016'
+down_revision = 'b81d4e6f2a37'
+branch_labels = None
+depends_on = None
+
+
+def rebuild_quotes(autoincrement: bool):
+    """Пересоздает quotes в SQLite с AUTOINCREMENT или без него
+
+    Не через batch_alter_table: он не переносит триггеры FTS (0007) и
+    quotes_count (0009). Индексы и триггеры quotes сохраняются из sqlite_master
+    и создаются заново после замены таблицы.
+    """
+    connection = op.get_bind()
+    saved = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'quotes' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        " ORDER BY type, rowid").scalars().all()
+    op.create_table('quotes_rebuild',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.String(length=255), nullable=False),
+    sa.Column('rating', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('deleted', sa.Boolean(), server_default='False', nullable=False),
+    sa.Column('created_datetime', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['author_id'], ['authors.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=autoincrement
+    )
+    columns = 'id, author_id, text, rating, deleted, created_datetime, version, updated_at'
+    op.execute(f"INSERT INTO quotes_rebuild ({columns}) SELECT {columns} FROM quotes")
+    op.execute("DROP TABLE quotes")
+    op.execute("ALTER TABLE quotes_rebuild RENAME TO quotes")
+    for sql in saved:
+        op.execute(sql)
+
+
+def upgrade():
+    # quotes_version растет при любом изменении цитат автора, включая перенос
+    # цитаты к другому автору и удаление; по нему строится ETag /authors/<id>/quotes
+    op.add_column('authors', sa.Column('quotes_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('authors', sa.Column('quotes_updated_at', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE authors SET
+            quotes_version = (SELECT count(*) FROM quotes WHERE quotes.author_id = authors.id),
+            quotes_updated_at = (SELECT max(coalesce(quotes.updated_at, quotes.created_datetime))
+                                 FROM quotes WHERE quotes.author_id = authors.id)
+    """)
+
+    if op.get_context().dialect.name == 'sqlite':
+        # id цитат без AUTOINCREMENT переиспользуются после удаления последней
+        # цитаты, и новая цитата получила бы ETag удаленной. Счетчик начинается
+        # с наибольшего id, когда-либо попавшего в журнал изменений (0011).
+        rebuild_quotes(autoincrement=True)
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'quotes'")
+        op.execute("""
+            INSERT INTO sqlite_sequence (name, seq) SELECT 'quotes', max(
+                coalesce((SELECT max(id) FROM quotes), 0),
+                coalesce((SELECT max(entity_id) FROM changes WHERE entity = 'quote'), 0))
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_version_insert AFTER INSERT ON quotes BEGIN
+                UPDATE authors SET quotes_version = quotes_version + 1, quotes_updated_at = CURRENT_TIMESTAMP
+                WHERE id = new.author_id;
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_version_delete AFTER DELETE ON quotes BEGIN
+                UPDATE authors SET quotes_version = quotes_version + 1, quotes_updated_at = CURRENT_TIMESTAMP
+                WHERE id = old.author_id;
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_version_update AFTER UPDATE ON quotes BEGIN
+                UPDATE authors SET quotes_version = quotes_version + 1, quotes_updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (old.author_id, new.author_id);
+            END
+        """)
+    elif op.get_context().dialect.name == 'postgresql':
+        # id из последовательности не переиспользуются, пересоздавать quotes не нужно
+        op.execute("""
+            CREATE FUNCTION authors_quotes_version() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE authors SET quotes_version = quotes_version + 1, quotes_updated_at = now()
+                    WHERE id = OLD.author_id;
+                END IF;
+                IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.author_id <> OLD.author_id) THEN
+                    UPDATE authors SET quotes_version = quotes_version + 1, quotes_updated_at = now()
+                    WHERE id = NEW.author_id;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER authors_quotes_version AFTER INSERT OR DELETE OR UPDATE ON quotes
+            FOR EACH ROW EXECUTE FUNCTION authors_quotes_version()
+        """)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER authors_quotes_version_update")
+        op.execute("DROP TRIGGER authors_quotes_version_delete")
+        op.execute("DROP TRIGGER authors_quotes_version_insert")
+        rebuild_quotes(autoincrement=False)
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'quotes'")
+    elif op.get_context().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER authors_quotes_version ON quotes")
+        op.execute("DROP FUNCTION authors_quotes_version()")
+    op.drop_column('authors', 'quotes_updated_at')
+    op.drop_column('authors', 'quotes_version')
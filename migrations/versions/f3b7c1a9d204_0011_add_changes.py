@@ -0,0 +1,32 @@
+"""0011 Add changes
+
+Revision ID: f3b7c1a9d204
+Revises: 690b046ab2a2
+Create Date: 2026-10-18 16:41:09.537216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7c1a9d204'
+down_revision = '690b046ab2a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # AUTOINCREMENT: seq не переиспользуется, даже если последние записи журнала удалят
+    op.create_table('changes',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=16), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+
+
+def downgrade():
+    op.drop_table('changes')
@@ -0,0 +1,155 @@
+"""Общие фикстуры тестов: приложение на временной БД, созданной миграциями
+
+Схема создается один раз (flask db upgrade) в файл-шаблон, который копируется
+перед каждым тестом. Реплика для чтения (READER_BIND) - тот же файл: GET-запросы
+идут через отдельный движок, как с настоящей репликой без задержки.
+
+Запуск из корня репозитория:
+    python -m pytest tests
+"""
+import asyncio
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DB_DIR = Path(tempfile.mkdtemp(prefix='quotes-tests-'))
+DB_PATH = DB_DIR / 'quotes.db'
+TEMPLATE_PATH = DB_DIR / 'template.db'
+
+os.environ['QUOTES_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+os.environ['QUOTES_READER_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+               cwd=BASE_DIR, check=True, capture_output=True)
+# шаблон - один файл без WAL: журнал переносится в БД и выключается
+with sqlite3.connect(DB_PATH) as connection:
+    connection.execute("PRAGMA journal_mode = DELETE")
+connection.close()
+shutil.move(DB_PATH, TEMPLATE_PATH)
+# после atexit-обработчиков приложения (они регистрируются при импорте app ниже)
+atexit.register(shutil.rmtree, DB_DIR, ignore_errors=True)
+
+sys.path.insert(0, str(BASE_DIR))
+import app as quotes_app  # noqa: E402
+
+
+def reset_state():
+    """Сбрасывает структуры в памяти процесса, которые переживают запросы"""
+    quotes_app.quote_ids.reset()
+    quotes_app.vote_buffer.drain()
+    quotes_app.read_model.reset()
+    quotes_app.fragment_cache.clear()
+    # бэкенды создаются заново по текущим настройкам при первом обращении
+    quotes_app.response_cache._backend = None
+    quotes_app.rate_limiter._backend = None
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Чистая БД из шаблона и исходные настройки приложения для каждого теста"""
+    config = dict(quotes_app.app.config)
+    with quotes_app.app.app_context():
+        for engine in quotes_app.db.engines.values():
+            engine.dispose()
+    # файлы WAL прошлого теста относятся к прошлой БД
+    for suffix in ('-wal', '-shm'):
+        Path(f'{DB_PATH}{suffix}').unlink(missing_ok=True)
+    shutil.copyfile(TEMPLATE_PATH, DB_PATH)
+    reset_state()
+    # задачи выполняются в тестах явно (job_queue.claim/run), без потоков-исполнителей
+    quotes_app.app.config['JOB_WORKERS'] = 0
+    yield DB_PATH
+    quotes_app.app.config.clear()
+    quotes_app.app.config.update(config)
+    reset_state()
+
+
+@pytest.fixture
+def app():
+    with quotes_app.app.app_context():
+        yield quotes_app.app
+
+
+@pytest.fixture
+def client():
+    return quotes_app.app.test_client()
+
+
+@pytest.fixture
+def catalog(client):
+    """Два автора и пять цитат, созданные через API: {'authors': [...], 'quotes': [...]}"""
+    authors = [client.post('/authors', json={'name': 'Rick', 'surname': 'Cook'}).json['id'],
+               client.post('/authors', json={'name': 'Waldi', 'surname': 'Ravens'}).json['id']]
+    quotes = []
+    for author_id, text, rating in ((authors[0], 'Программирование сегодня - это гонка', 3),
+                                    (authors[0], 'Вселенная пока выигрывает', 5),
+                                    (authors[1], 'Программирование на С похоже на быстрые танцы', 2),
+                                    (authors[1], 'Мы не знаем, где ошибка', 1),
+                                    (authors[0], 'Учиться никогда не поздно', 4)):
+        response = client.post(f'/authors/{author_id}/quotes', json={'text': text, 'rating': rating})
+        quotes.append(response.json['id'])
+    return {'authors': authors, 'quotes': quotes}
+
+
+class ASGIResponse:
+    def __init__(self, status_code: int, headers: dict, data: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    @property
+    def json(self):
+        return json.loads(self.data)
+
+
+class ASGIClient:
+    """Запросы к asgi.application, каждый - в новом цикле событий"""
+
+    def request(self, method: str, path: str, headers: dict | None = None, body: bytes = b'') -> ASGIResponse:
+        import asgi
+        path, _, query_string = path.partition('?')
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+            'root_path': '', 'query_string': query_string.encode(), 'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+            'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            try:
+                await asgi.application(scope, receive, send)
+            finally:
+                # соединения aiosqlite привязаны к циклу событий
+                await asgi.engine.dispose()
+                await asgi.reader_engine.dispose()
+
+        asyncio.run(run())
+        start = next(message for message in messages if message['type'] == 'http.response.start')
+        data = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return ASGIResponse(start['status'], {name.decode(): value.decode() for name, value in start['headers']}, data)
+
+    def get(self, path: str, headers: dict | None = None) -> ASGIResponse:
+        return self.request('GET', path, headers)
+
+    def put(self, path: str, headers: dict | None = None) -> ASGIResponse:
+        return self.request('PUT', path, headers)
+
+
+@pytest.fixture
+def asgi_client():
+    return ASGIClient()
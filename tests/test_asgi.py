@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+
+import app as quotes_app
+
+NATIVE_PATHS = ['/authors', '/authors?limit=1', '/authors/{author}', '/authors/{author}/quotes', '/quotes',
+                '/quotes?limit=2', '/quotes/{quote}', '/quotes/count']
+
+
+@pytest.fixture(params=[False, True], ids=['orm', 'read_model'])
+def read_model(request):
+    quotes_app.app.config['READ_MODEL'] = request.param
+    return request.param
+
+
+@pytest.mark.parametrize('path', NATIVE_PATHS)
+def test_native_routes_match_flask(client, asgi_client, catalog, read_model, path):
+    path = path.format(author=catalog['authors'][0], quote=catalog['quotes'][0])
+    expected = client.get(path)
+    response = asgi_client.get(path)
+    assert response.status_code == expected.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json == expected.json
+
+
+@pytest.mark.parametrize('path', ['/authors/1000', '/authors/1000/quotes', '/quotes/1000'])
+def test_native_not_found(asgi_client, catalog, path):
+    response = asgi_client.get(path)
+    assert response.status_code == 404
+    assert response.json['message'].endswith('not found')
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'after=abc'])
+def test_native_wrong_paging(asgi_client, catalog, query):
+    assert asgi_client.get(f'/quotes?{query}').status_code == 400
+
+
+def test_native_votes(client, asgi_client, catalog):
+    quote = catalog['quotes'][0]
+    response = asgi_client.put(f'/quotes/{quote}/up')
+    assert response.status_code == 200
+    assert response.json['message'] == 'Your vote has been accepted, new rating is 4.'
+    assert asgi_client.put(f"/quotes/{catalog['quotes'][1]}/up").json['message'] == \
+        f"Quote with id={catalog['quotes'][1]} has maximal rating."
+    assert asgi_client.put('/quotes/1000/down').status_code == 404
+    assert client.get(f'/quotes/{quote}').json['rating'] == 4
+
+
+def test_other_routes_fall_back_to_flask(client, asgi_client, catalog):
+    body = json.dumps({'name': 'Alan', 'surname': 'Perlis'}).encode()
+    response = asgi_client.request('POST', '/authors', {'Content-Type': 'application/json',
+                                                        'Content-Length': str(len(body))}, body)
+    assert response.status_code == 201
+    assert client.get(f"/authors/{response.json['id']}").json['author']['name'] == 'Alan'
+    assert asgi_client.get('/quotes/search?q=гонка').json['items'][0]['id'] == catalog['quotes'][0]
+    assert asgi_client.get('/quotes?stream=ndjson').data.count(b'\n') == 5
+
+
+def test_unknown_route(asgi_client):
+    assert asgi_client.get('/nothing').status_code == 404
+
+
+def test_native_reads_see_flask_writes(client, asgi_client, catalog):
+    asgi_client.get('/quotes')
+    client.put(f"/quotes/{catalog['quotes'][0]}", json={'text': 'Новый текст'})
+    assert asgi_client.get('/quotes').json[0]['text'] == 'Новый текст'
+
+
+def test_flask_fallback_streams_request_body(client, catalog):
+    """Тело запроса во Flask читается из receive частями, а не собирается целиком заранее"""
+    import asgi
+    records = [{'type': 'author', 'id': 10, 'name': 'Yoggi', 'surname': 'Berra'}] + \
+        [{'type': 'quote', 'id': 100 + number, 'author_id': 10, 'text': f'Цитата {number}'} for number in range(20)]
+    lines = [json.dumps(record, ensure_ascii=False).encode() + b'\n' for record in records]
+    received, sent = [], []
+
+    async def receive():
+        received.append(1)
+        return {'type': 'http.request', 'body': lines[len(received) - 1], 'more_body': len(received) < len(lines)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http', 'path': '/import',
+             'root_path': '', 'query_string': b'format=ndjson', 'client': ('127.0.0.1', 50000),
+             'server': ('localhost', 80), 'headers': [(b'content-type', b'application/x-ndjson')]}
+    application = asgi.WSGIApplication(quotes_app.app.wsgi_app, 1)
+    try:
+        asyncio.run(application(scope, receive, send))
+    finally:
+        application.executor.shutdown()
+    # тело без Content-Length (chunked) прочитано до конца
+    assert len(received) == len(lines)
+    assert sent[0]['status'] == 200
+    assert json.loads(b''.join(message.get('body', b'') for message in sent[1:]))['quotes_created'] == 20
+    assert client.get('/quotes/count').json['count'] == 25
+
+
+def test_receive_stream_reads_on_demand():
+    import asgi
+    chunks = [b'abc', b'', b'defgh', b'ij']
+    calls = []
+
+    async def receive():
+        calls.append(1)
+        return {'type': 'http.request', 'body': chunks[len(calls) - 1], 'more_body': len(calls) < len(chunks)}
+
+    async def read():
+        loop = asyncio.get_running_loop()
+        stream = asgi.ReceiveStream(receive, loop)
+        first = await loop.run_in_executor(None, stream.read, 2)
+        assert len(calls) == 1
+        rest = await loop.run_in_executor(None, stream.readall)
+        return first, rest
+
+    assert asyncio.run(read()) == (b'ab', b'cdefghij')
+    assert len(calls) == 4
@@ -0,0 +1,52 @@
+from app import count_queries
+
+
+def quote_updates(queries) -> int:
+    return sum(query.statement.startswith('UPDATE quotes') for query in queries)
+
+
+def test_delete_author_with_quotes(client, catalog):
+    rick, waldi = catalog['authors']
+    response = client.delete(f'/authors/{rick}')
+    assert response.status_code == 200
+    assert response.json == {'message': f'Author with id={rick} deleted.', 'quotes_deleted': 3}
+    assert client.get(f'/authors/{rick}').status_code == 404
+    assert [quote['id'] for quote in client.get('/quotes').json] == catalog['quotes'][2:4]
+    assert [author['id'] for author in client.get('/authors/deleted').json] == [rick]
+    assert client.get('/quotes/count').json['count'] == 2
+
+
+def test_restore_author_with_quotes(client, catalog):
+    rick = catalog['authors'][0]
+    client.delete(f'/authors/{rick}')
+    response = client.put(f'/authors/restore/{rick}')
+    assert response.status_code == 200
+    assert response.json == {'message': f'Author with id={rick} restored.', 'quotes_restored': 3}
+    assert [quote['id'] for quote in client.get('/quotes').json] == catalog['quotes']
+    assert client.get('/authors/deleted').json == []
+
+
+def test_delete_and_restore_missing_author(client, catalog):
+    rick = catalog['authors'][0]
+    assert client.put(f'/authors/restore/{rick}').status_code == 404
+    assert client.delete('/authors/1000').status_code == 404
+    client.delete(f'/authors/{rick}')
+    assert client.delete(f'/authors/{rick}').status_code == 404
+
+
+def test_author_without_quotes(client):
+    author = client.post('/authors', json={'name': 'Alan', 'surname': 'Perlis'}).json['id']
+    assert client.delete(f'/authors/{author}').json['quotes_deleted'] == 0
+    assert client.put(f'/authors/restore/{author}').json['quotes_restored'] == 0
+
+
+def test_quotes_updated_with_one_statement(app, client, catalog):
+    rick = catalog['authors'][0]
+    for number in range(20):
+        client.post(f'/authors/{rick}/quotes', json={'text': f'Цитата {number}'})
+    with count_queries() as queries:
+        assert client.delete(f'/authors/{rick}').json['quotes_deleted'] == 23
+    assert quote_updates(queries) == 1
+    with count_queries() as queries:
+        assert client.put(f'/authors/restore/{rick}').json['quotes_restored'] == 23
+    assert quote_updates(queries) == 1
@@ -0,0 +1,101 @@
+import pytest
+
+from app import BULK_MAX_ITEMS, count_queries
+
+
+def statuses(response) -> list[int]:
+    assert response.status_code == 200, response.json
+    return [result['status'] for result in response.json['results']]
+
+
+def test_create_authors(client, catalog):
+    response = client.post('/authors/bulk', json=[
+        {'name': 'Alan', 'surname': 'Perlis'}, {'name': 'Alan', 'surname': 'Perlis'},
+        {'name': 'Rick', 'surname': 'Cook'}, {'surname': 'Без имени'}, {'name': 'Linus'}])
+    assert statuses(response) == [201, 409, 409, 400, 201]
+    alan = response.json['results'][0]['id']
+    assert client.get(f'/authors/{alan}').json['author'] == {'id': alan, 'name': 'Alan', 'surname': 'Perlis'}
+
+
+def test_create_quotes(client, catalog):
+    rick, waldi = catalog['authors']
+    client.delete(f'/authors/{waldi}')
+    response = client.post('/quotes/bulk', json=[
+        {'author_id': rick, 'text': 'Первая', 'rating': 5}, {'author_id': rick, 'text': 'Вторая', 'rating': 10},
+        {'author_id': waldi, 'text': 'Удаленный автор'}, {'author_id': rick}, {'author_id': rick, 'text': 'x', 'votes': 1},
+        'строка'])
+    assert statuses(response) == [201, 201, 404, 400, 400, 400]
+    first, second = (result['id'] for result in response.json['results'][:2])
+    assert client.get(f'/quotes/{first}').json['rating'] == 5
+    assert client.get(f'/quotes/{second}').json['rating'] == 1
+
+
+def test_edit_quotes(client, catalog):
+    rick, waldi = catalog['authors']
+    first, second = catalog['quotes'][:2]
+    response = client.patch('/quotes/bulk', json=[
+        {'id': first, 'text': 'Новый текст', 'rating': 1}, {'id': second, 'author_id': waldi},
+        {'id': 1000, 'text': 'Нет такой'}, {'id': first, 'author_id': 1000}, {'id': first, 'deleted': True}])
+    assert statuses(response) == [200, 200, 404, 400, 400]
+    assert client.get(f'/quotes/{first}').json['text'] == 'Новый текст'
+    assert client.get(f'/quotes/{second}').json['author']['id'] == waldi
+    assert second in [quote['id'] for quote in client.get(f'/authors/{waldi}/quotes').json['quotes']]
+    assert second not in [quote['id'] for quote in client.get(f'/authors/{rick}/quotes').json['quotes']]
+
+
+def test_edit_quotes_records_changes_once(app, client, catalog):
+    """Изменения пишутся одним вызовом record_changes: один журнал на запрос"""
+    waldi = catalog['authors'][1]
+    since = client.get('/changes').json['next']
+    with count_queries() as queries:
+        client.patch('/quotes/bulk', json=[{'id': catalog['quotes'][0], 'author_id': waldi},
+                                           {'id': catalog['quotes'][1], 'text': 'Другой текст'}])
+    assert sum('INSERT INTO changes' in query.statement for query in queries) == 1
+    changed = {item['id'] for item in client.get(f'/changes?since={since}').json['items']}
+    assert {catalog['quotes'][0], catalog['quotes'][1]} <= changed
+
+
+def test_delete_quotes(client, catalog):
+    first, second = catalog['quotes'][:2]
+    response = client.delete('/quotes/bulk', json=[first, second, first, 1000])
+    assert statuses(response) == [200, 200, 404, 404]
+    assert client.get(f'/quotes/{first}').status_code == 404
+
+
+@pytest.mark.parametrize('item', [{'name': ['Rick']}, {'name': {'first': 'Rick'}}, {'name': 1},
+                                  {'name': 'Rick', 'surname': ['Cook']}, {'name': True}])
+def test_create_authors_wrong_types(client, catalog, item):
+    response = client.post('/authors/bulk', json=[item, {'name': 'Alan', 'surname': 'Perlis'}])
+    assert statuses(response) == [400, 201]
+    assert response.json['results'][0]['message'].startswith('Wrong type of')
+
+
+@pytest.mark.parametrize('item', [{'author_id': [1], 'text': 'x'}, {'author_id': {'id': 1}, 'text': 'x'},
+                                  {'author_id': True, 'text': 'x'}, {'author_id': '1', 'text': 'x'},
+                                  {'author_id': 1, 'text': ['x']}, {'author_id': 1.0, 'text': 'x'}])
+def test_create_quotes_wrong_types(client, catalog, item):
+    response = client.post('/quotes/bulk', json=[item, {'author_id': catalog['authors'][0], 'text': 'Верная'}])
+    assert statuses(response) == [400, 201]
+    assert response.json['results'][0]['message'].startswith('Wrong type of')
+
+
+@pytest.mark.parametrize('item', [{'id': [1]}, {'id': {'id': 1}}, {'id': True}, {'id': '1'},
+                                  {'id': 1, 'author_id': [2]}, {'id': 1, 'text': {'a': 1}}])
+def test_edit_quotes_wrong_types(client, catalog, item):
+    response = client.patch('/quotes/bulk', json=[item, {'id': catalog['quotes'][1], 'rating': 1}])
+    assert statuses(response) == [400, 200]
+    assert response.json['results'][0]['message'].startswith('Wrong type of')
+
+
+@pytest.mark.parametrize('quote_id', [[1], {'id': 1}, True, '1', 1.5])
+def test_delete_quotes_wrong_types(client, catalog, quote_id):
+    response = client.delete('/quotes/bulk', json=[quote_id, catalog['quotes'][1]])
+    assert statuses(response) == [400, 200]
+    assert client.get(f"/quotes/{catalog['quotes'][0]}").status_code == 200
+
+
+@pytest.mark.parametrize('method, path', [('POST', '/authors/bulk'), ('POST', '/quotes/bulk'),
+                                          ('PATCH', '/quotes/bulk'), ('DELETE', '/quotes/bulk')])
+@pytest.mark.parametrize('body', [[], {}, 'items', [1] * (BULK_MAX_ITEMS + 1)])
+def test_bulk_wrong_body(client, method, path, body):
+    assert client.open(path, method=method, json=body).status_code == 400
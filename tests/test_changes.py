@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import pytest
+
+import app as quotes_app
+from app import PAGE_LIMIT_MAX
+
+
+def changes(client, since: int = 0, **args) -> list[tuple]:
+    response = client.get('/changes', query_string={'since': since, **args})
+    assert response.status_code == 200
+    items = response.json['items']
+    assert response.json['next'] == (items[-1]['seq'] if items else since)
+    return [(item['type'], item['id'], item['op']) for item in items]
+
+
+def last_seq(client) -> int:
+    return client.get('/changes', query_string={'limit': PAGE_LIMIT_MAX}).json['next']
+
+
+def parse_events(chunks) -> list[dict]:
+    """События SSE из частей потока (без комментариев keep-alive)"""
+    events = []
+    for block in ''.join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            events.append({'id': int(fields['id']), 'event': fields['event'], 'data': json.loads(fields['data'])})
+    return events
+
+
+@pytest.fixture
+def fast_polling(app):
+    app.config['CHANGES_POLL_INTERVAL'] = 0.05
+
+
+def test_changes_of_catalog(client, catalog):
+    rick, waldi = catalog['authors']
+    assert changes(client) == [('author', rick, 'upsert'), ('author', waldi, 'upsert')] + \
+        [('quote', quote_id, 'upsert') for quote_id in catalog['quotes']]
+    items = client.get('/changes?limit=1&since=2').json['items']
+    assert items == [{'seq': 3, 'type': 'quote', 'id': catalog['quotes'][0], 'op': 'upsert',
+                      'data': client.get(f"/quotes/{catalog['quotes'][0]}").json}]
+    assert changes(client, since=7) == []
+
+
+def test_changes_follow_writes(client, catalog):
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    since = last_seq(client)
+    client.put(f'/quotes/{quotes[0]}/up')
+    client.put(f'/quotes/{quotes[1]}', json={'author_id': waldi})
+    client.delete(f'/quotes/{quotes[2]}')
+    client.put(f'/authors/{rick}', json={'name': 'Richard'})
+    assert changes(client, since) == [('quote', quotes[0], 'upsert'), ('quote', quotes[1], 'upsert'),
+                                      ('quote', quotes[2], 'delete'), ('author', rick, 'upsert')]
+    # data - текущее состояние строки на момент чтения журнала
+    items = client.get(f'/changes?since={since}').json['items']
+    assert items[0]['data']['author']['name'] == 'Richard'
+    assert items[2]['data'] is None
+
+
+def test_changes_of_bulk_and_author_delete(client, catalog):
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    since = last_seq(client)
+    client.patch('/quotes/bulk', json=[{'id': quotes[0], 'rating': 1}, {'id': quotes[3], 'rating': 5}])
+    assert sorted(changes(client, since)) == [('quote', quotes[0], 'upsert'), ('quote', quotes[3], 'upsert')]
+    since = last_seq(client)
+    client.delete(f'/authors/{waldi}')
+    assert sorted(changes(client, since)) == [('author', waldi, 'delete'), ('quote', quotes[2], 'delete'),
+                                              ('quote', quotes[3], 'delete')]
+    since = last_seq(client)
+    client.put(f'/authors/restore/{waldi}')
+    assert sorted(changes(client, since)) == [('author', waldi, 'upsert'), ('quote', quotes[2], 'upsert'),
+                                              ('quote', quotes[3], 'upsert')]
+
+
+def test_rolled_back_write_is_not_logged(app, client, catalog):
+    since = last_seq(client)
+    generation = quotes_app.change_notifier.generation
+    author = quotes_app.db.session.get(quotes_app.AuthorModel, catalog['authors'][0])
+    quotes_app.db.session.add(quotes_app.QuoteModel(author, 'Не сохранится'))
+    author.name = 'Richard'
+    quotes_app.db.session.flush()
+    quotes_app.db.session.rollback()
+    assert client.put(f"/quotes/{catalog['quotes'][1]}/up").json['message'].endswith('has maximal rating.')
+    assert changes(client, since) == []
+    assert quotes_app.change_notifier.generation == generation
+
+
+@pytest.mark.parametrize('query, message', [
+    ('since=abc', 'Wrong value since=abc'),
+    ('since=-1', 'Wrong value since=-1'),
+    ('limit=0', f'Wrong value limit=0, expected 1..{PAGE_LIMIT_MAX}'),
+    (f'limit={PAGE_LIMIT_MAX + 1}', f'Wrong value limit={PAGE_LIMIT_MAX + 1}, expected 1..{PAGE_LIMIT_MAX}'),
+])
+@pytest.mark.parametrize('path', ['/changes', '/changes/stream'])
+def test_wrong_changes_args(client, path, query, message):
+    response = client.get(f'{path}?{query}')
+    assert response.status_code == 400
+    assert response.json['message'] == message
+
+
+def test_stream(client, catalog, fast_polling):
+    response = client.get('/changes/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    chunks = iter(response.response)
+    assert next(chunks) == b': keep-alive\n\n'
+    events = parse_events(next(chunks) for _ in range(7))
+    assert [event['id'] for event in events] == list(range(1, 8))
+    assert events[0] == {'id': 1, 'event': 'author', 'data': client.get('/changes?limit=1').json['items'][0]}
+    # новые коммиты приходят в открытый поток
+    client.put(f"/quotes/{catalog['quotes'][0]}/up")
+    event, = parse_events([next(chunks)])
+    assert (event['id'], event['event'], event['data']['id'], event['data']['data']['rating']) == \
+        (8, 'quote', catalog['quotes'][0], 4)
+    response.close()
+
+
+def test_stream_resumes_from_last_event_id(client, catalog, fast_polling):
+    response = client.get('/changes/stream', headers={'Last-Event-ID': '6'}, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    event, = parse_events([next(chunks)])
+    assert (event['id'], event['data']['id']) == (7, catalog['quotes'][4])
+    response.close()
+    # since в адресе важнее заголовка
+    response = client.get('/changes/stream?since=5', headers={'Last-Event-ID': '6'}, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    assert parse_events([next(chunks)])[0]['id'] == 6
+    response.close()
+
+
+def test_stream_keepalive(app, client, catalog, fast_polling):
+    app.config['CHANGES_KEEPALIVE'] = 0
+    response = client.get('/changes/stream?since=7', buffered=False)
+    chunks = iter(response.response)
+    assert [next(chunks), next(chunks)] == [b': keep-alive\n\n'] * 2
+    response.close()
+
+
+def test_asgi_stream(client, catalog, fast_polling):
+    import asgi
+
+    async def read():
+        events = asgi.change_events(6)
+        try:
+            assert await anext(events) == b': keep-alive\n\n'
+            first = parse_events([await anext(events)])
+            # коммит Flask будит асинхронный поток через change_notifier
+            client.put(f"/quotes/{catalog['quotes'][0]}/down")
+            second = parse_events([await asyncio.wait_for(anext(events), 5)])
+            return first, second
+        finally:
+            await events.aclose()
+            await asgi.reader_engine.dispose()
+
+    first, second = asyncio.run(read())
+    assert [event['id'] for event in first] == [7]
+    assert [(event['id'], event['data']['data']['rating']) for event in second] == [(8, 2)]
+
+
+def test_asgi_stream_wrong_args(asgi_client):
+    response = asgi_client.get('/changes/stream?since=abc')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Wrong value since=abc'
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+
+def etag(client, path: str) -> str:
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.last_modified is not None
+    return response.headers['ETag']
+
+
+def not_modified(client, path: str, tag: str) -> bool:
+    return client.get(path, headers={'If-None-Match': tag}).status_code == 304
+
+
+@pytest.mark.parametrize('path', ['/quotes', '/quotes?limit=2', '/quotes/{quote}', '/authors', '/authors/{author}',
+                                  '/authors/{author}/quotes', '/quotes/filter?rating__gte=3'])
+def test_if_none_match(client, catalog, path):
+    path = path.format(quote=catalog['quotes'][0], author=catalog['authors'][0])
+    tag = etag(client, path)
+    response = client.get(path, headers={'If-None-Match': tag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == tag
+
+
+def test_if_modified_since(client, catalog):
+    path = f"/quotes/{catalog['quotes'][0]}"
+    last_modified = client.get(path).headers['Last-Modified']
+    assert client.get(path, headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get(path, headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+
+def test_writes_change_etags(client, catalog):
+    rick = catalog['authors'][0]
+    quote = catalog['quotes'][0]
+    paths = [f'/quotes/{quote}', f'/authors/{rick}/quotes', '/quotes']
+    tags = [etag(client, path) for path in paths]
+    client.put(f'/quotes/{quote}/up')
+    assert not any(not_modified(client, path, tag) for path, tag in zip(paths, tags))
+    tags = [etag(client, path) for path in paths]
+    client.put(f'/authors/{rick}', json={'name': 'Richard'})
+    assert not any(not_modified(client, path, tag) for path, tag in zip(paths, tags))
+
+
+def test_missing_resource_has_no_etag(client, catalog):
+    response = client.get('/quotes/1000')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_quote_ids_are_not_reused(client, catalog):
+    """Удаленная последняя цитата и новая не делят id, а с ним и ETag"""
+    rick = catalog['authors'][0]
+    last = catalog['quotes'][-1]
+    tag = etag(client, f'/quotes/{last}')
+    client.delete(f'/quotes/{last}')
+    new = client.post(f'/authors/{rick}/quotes', json={'text': 'Учиться никогда не поздно', 'rating': 4}).json['id']
+    assert new > last
+    assert client.get(f'/quotes/{last}', headers={'If-None-Match': tag}).status_code == 404
+
+
+def test_bulk_created_ids_are_not_reused(client, catalog):
+    rick = catalog['authors'][0]
+    last = catalog['quotes'][-1]
+    client.delete('/quotes/bulk', json=[last])
+    new = client.post('/quotes/bulk', json=[{'author_id': rick, 'text': 'Снова'}]).json['results'][0]['id']
+    assert new > last
+
+
+def test_author_quotes_etag_after_delete_and_create(client, catalog):
+    rick = catalog['authors'][0]
+    path = f'/authors/{rick}/quotes'
+    tag = etag(client, path)
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    client.post(f'/authors/{rick}/quotes', json={'text': 'Программирование сегодня - это гонка', 'rating': 3})
+    assert not not_modified(client, path, tag)
+
+
+def test_author_quotes_etag_after_moves(client, catalog):
+    """Цитата ушла к другому автору, а похожая пришла: состав другой, ETag тоже"""
+    rick, waldi = catalog['authors']
+    path = f'/authors/{rick}/quotes'
+    tag = etag(client, path)
+    client.put(f"/quotes/{catalog['quotes'][0]}", json={'author_id': waldi})
+    client.put(f"/quotes/{catalog['quotes'][2]}", json={'author_id': rick})
+    assert not not_modified(client, path, tag)
+    tag, waldi_tag = etag(client, path), etag(client, f'/authors/{waldi}/quotes')
+    client.patch('/quotes/bulk', json=[{'id': catalog['quotes'][2], 'author_id': waldi}])
+    assert not not_modified(client, path, tag)
+    assert not not_modified(client, f'/authors/{waldi}/quotes', waldi_tag)
+
+
+def test_author_quotes_etag_sees_other_processes(client, catalog, database):
+    rick = catalog['authors'][0]
+    path = f'/authors/{rick}/quotes'
+    tag = etag(client, path)
+    with sqlite3.connect(database) as connection:
+        connection.execute("UPDATE quotes SET text = 'Изменено напрямую' WHERE id = ?", (catalog['quotes'][0],))
+    connection.close()
+    assert not not_modified(client, path, tag)
+
+
+def test_asgi_if_none_match(asgi_client, catalog):
+    path = f"/quotes/{catalog['quotes'][0]}"
+    tag = asgi_client.get(path).headers['etag']
+    assert asgi_client.get(path, {'If-None-Match': tag}).status_code == 304
+    path = f"/authors/{catalog['authors'][0]}/quotes"
+    tag = asgi_client.get(path).headers['etag']
+    assert asgi_client.get(path, {'If-None-Match': tag}).status_code == 304
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from app import assert_num_queries
+
+
+@pytest.fixture(params=[False, True], ids=['sql', 'quotes_count'])
+def counter(request, app):
+    app.config['QUOTES_COUNT_CACHE'] = request.param
+    return request.param
+
+
+def counts(client) -> tuple[int, dict[int, int]]:
+    total = client.get('/quotes/count').json['count']
+    per_author = {item['author_id']: item['count'] for item in client.get('/quotes/count/authors').json}
+    return total, per_author
+
+
+def test_counts(client, counter, catalog):
+    rick, waldi = catalog['authors']
+    assert counts(client) == (5, {rick: 3, waldi: 2})
+
+
+def test_counts_without_quotes(client, counter):
+    assert counts(client) == (0, {})
+
+
+def test_counts_follow_writes(client, counter, catalog):
+    rick, waldi = catalog['authors']
+    counts(client)
+    client.post(f'/authors/{waldi}/quotes', json={'text': 'Новая цитата', 'rating': 1})
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    assert counts(client) == (5, {rick: 2, waldi: 3})
+    client.put(f"/quotes/{catalog['quotes'][1]}", json={'author_id': waldi})
+    assert counts(client) == (5, {rick: 1, waldi: 4})
+    client.delete(f'/authors/{waldi}')
+    assert counts(client) == (1, {rick: 1})
+    client.put(f'/authors/restore/{waldi}')
+    assert counts(client) == (5, {rick: 1, waldi: 4})
+
+
+def test_counts_follow_bulk_writes(client, counter, catalog):
+    rick, waldi = catalog['authors']
+    counts(client)
+    client.post('/quotes/bulk', json=[{'author_id': rick, 'text': f'Цитата {number}'} for number in range(3)])
+    client.delete('/quotes/bulk', json=catalog['quotes'][2:4])
+    assert counts(client) == (6, {rick: 6})
+
+
+def test_counter_is_one_query(app, client, catalog):
+    app.config['QUOTES_COUNT_CACHE'] = True
+    with assert_num_queries(1):
+        assert client.get('/quotes/count').json['count'] == 5
+
+
+def test_counts_see_other_processes(client, asgi_client, counter, catalog, database):
+    """Счетчики authors.quotes_count ведут триггеры, поэтому видны записи в обход приложения"""
+    rick, waldi = catalog['authors']
+    counts(client)
+    with sqlite3.connect(database) as connection:
+        connection.execute("INSERT INTO quotes (author_id, text, rating, deleted) VALUES (?, 'Чужая цитата', 1, 0)",
+                           (waldi,))
+        connection.execute("UPDATE quotes SET deleted = 1 WHERE id = ?", (catalog['quotes'][0],))
+    connection.close()
+    assert counts(client) == (5, {rick: 2, waldi: 3})
+    assert asgi_client.get('/quotes/count').json == {'count': 5}
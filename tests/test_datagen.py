@@ -0,0 +1,48 @@
+import sqlite3
+import sys
+
+import pytest
+
+from conftest import BASE_DIR
+
+sys.path.insert(0, str(BASE_DIR / 'benchmarks'))
+from common import create_database  # noqa: E402
+from datagen import example_quotes, generate_rows  # noqa: E402
+
+
+def test_example_quotes():
+    examples = example_quotes()
+    assert [author for author, _, _ in examples] == [
+        'Rick Cook', 'Waldi Ravens', 'Mosher’s Law of Software Engineering', 'Yoggi Berra']
+    assert examples[3] == ('Yoggi Berra', 'В теории, теория и практика неразделимы. На практике это не так.', 2)
+
+
+def test_generate_rows_is_deterministic():
+    assert generate_rows(5, 50, seed=1) == generate_rows(5, 50, seed=1)
+    assert generate_rows(5, 50, seed=1)[1] != generate_rows(5, 50, seed=2)[1]
+
+
+def test_generate_rows_fit_schema():
+    authors, quotes = generate_rows(300, 1000, first_author_id=11)
+    assert len({(author['name'], author['surname']) for author in authors}) == 300
+    assert all(len(author['name']) <= 32 and len(author['surname']) <= 32 for author in authors)
+    assert {quote['author_id'] for quote in quotes} <= set(range(11, 311))
+    assert len({quote['text'] for quote in quotes}) == 1000
+    assert all(len(quote['text']) <= 255 and 1 <= quote['rating'] <= 5 for quote in quotes)
+
+
+@pytest.mark.parametrize('profile', ['default', 'production'])
+def test_create_database(tmp_path, monkeypatch, profile):
+    # create_database меняет окружение процесса для следующих за ним процессов
+    monkeypatch.setenv('QUOTES_DATABASE_URI', '')
+    monkeypatch.setenv('QUOTES_SQLITE_PROFILE', '')
+    path = tmp_path / 'bench.db'
+    create_database(f'sqlite:///{path}', 3, 20, profile=profile)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT count(*) FROM authors").fetchone() == (3,)
+        assert connection.execute("SELECT count(*) FROM quotes").fetchone() == (20,)
+        assert connection.execute("SELECT min(id), max(id) FROM quotes").fetchone() == (1, 20)
+        # триггеры FTS и счетчиков работают и на вставке пачками
+        assert connection.execute("SELECT count(*) FROM quotes_fts").fetchone() == (20,)
+        assert connection.execute("SELECT sum(quotes_count) FROM authors").fetchone() == (20,)
+    connection.close()
@@ -0,0 +1,174 @@
+import json
+
+import pytest
+
+import app as quotes_app
+
+RECORDS = [
+    {'type': 'author', 'id': 1, 'name': 'Rick', 'surname': 'Cook', 'deleted': False},
+    {'type': 'author', 'id': 2, 'name': 'Waldi', 'surname': 'Ravens', 'deleted': True},
+    {'type': 'quote', 'id': 1, 'author_id': 1, 'text': 'Вселенная пока выигрывает', 'rating': 5,
+     'deleted': False, 'created_datetime': '2024-01-02T03:04:05'},
+    {'type': 'quote', 'id': 3, 'author_id': 2, 'text': 'Программирование на С похоже на "быстрые танцы",\nс бритвами',
+     'rating': 2, 'deleted': True, 'created_datetime': '2024-02-03T04:05:06'},
+    {'type': 'quote', 'id': 4, 'author_id': 1, 'text': 'Учиться никогда не поздно', 'rating': 4,
+     'deleted': False, 'created_datetime': '2024-03-04T05:06:07'},
+]
+NDJSON = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in RECORDS)
+CSV = (
+    'type,id,name,surname,author_id,text,rating,deleted,created_datetime\r\n'
+    'author,1,Rick,Cook,,,,false,\r\n'
+    'author,2,Waldi,Ravens,,,,true,\r\n'
+    'quote,1,,,1,Вселенная пока выигрывает,5,false,2024-01-02T03:04:05\r\n'
+    'quote,3,,,2,"Программирование на С похоже на ""быстрые танцы"",\nс бритвами",2,true,2024-02-03T04:05:06\r\n'
+    'quote,4,,,1,Учиться никогда не поздно,4,false,2024-03-04T05:06:07\r\n'
+)
+FILES = {'ndjson': NDJSON, 'csv': CSV}
+CREATED = {'authors_created': 2, 'authors_existing': 0, 'quotes_created': 3, 'quotes_skipped': 0}
+
+
+def import_file(client, data: str, import_format: str = 'ndjson', **kwargs):
+    return client.post(f'/import?format={import_format}', data=data.encode(), **kwargs)
+
+
+@pytest.mark.parametrize('import_format', list(FILES))
+@pytest.mark.parametrize('export_format', list(FILES))
+def test_round_trip(client, import_format, export_format):
+    response = import_file(client, FILES[import_format], import_format)
+    assert response.status_code == 200
+    assert response.json == CREATED
+    response = client.get(f'/export?format={export_format}')
+    assert response.status_code == 200
+    assert response.mimetype == quotes_app.EXPORT_FORMATS[export_format]
+    assert response.headers['Content-Disposition'] == f'attachment; filename=quotes.{export_format}'
+    assert response.get_data(as_text=True) == FILES[export_format]
+
+
+def test_imported_quotes_are_live(client):
+    import_file(client, NDJSON)
+    assert [quote['id'] for quote in client.get('/quotes').json] == [1, 4]
+    assert client.get('/quotes/count').json == {'count': 2}
+    assert {quote['id'] for quote in client.get('/quotes/random?n=10').json} == {1, 4}
+    search = client.get('/quotes/search', query_string={'q': 'вселенная'}).json
+    assert [quote['id'] for quote in search['items']] == [1]
+    assert client.get('/authors/top').json[0]['quotes_count'] == 2
+    # восстановленный автор возвращает и свою импортированную цитату
+    client.put('/authors/restore/2')
+    assert [quote['id'] for quote in client.get('/quotes').json] == [1, 3, 4]
+
+
+def test_import_is_repeatable(client):
+    import_file(client, NDJSON)
+    response = import_file(client, NDJSON)
+    assert response.json == {'authors_created': 0, 'authors_existing': 2, 'quotes_created': 0, 'quotes_skipped': 3}
+    assert client.get('/export').get_data(as_text=True) == NDJSON
+
+
+def test_import_into_existing_catalog(client, catalog):
+    """Автор с тем же именем переиспользуется, занятые id авторов заменяются, цитаты с занятым id пропускаются"""
+    rick, waldi = catalog['authors']
+    records = [
+        {'type': 'author', 'id': waldi, 'name': 'Rick', 'surname': 'Cook'},
+        {'type': 'author', 'id': rick, 'name': 'Yoggi', 'surname': 'Berra'},
+        {'type': 'quote', 'id': 100, 'author_id': waldi, 'text': 'Новая цитата Рика'},
+        {'type': 'quote', 'id': 101, 'author_id': rick, 'text': 'В теории, теория и практика неразделимы'},
+        {'type': 'quote', 'id': catalog['quotes'][0], 'author_id': rick, 'text': 'Занятый id'},
+    ]
+    response = import_file(client, ''.join(json.dumps(record) + '\n' for record in records))
+    assert response.json == {'authors_created': 1, 'authors_existing': 1, 'quotes_created': 2, 'quotes_skipped': 1}
+    yoggi = client.get('/quotes/101').json['author']
+    assert yoggi['name'] == 'Yoggi' and yoggi['id'] not in catalog['authors']
+    assert client.get('/quotes/100').json['author']['id'] == rick
+    assert client.get(f"/quotes/{catalog['quotes'][0]}").json['text'] == 'Программирование сегодня - это гонка'
+
+
+@pytest.mark.parametrize('line, message', [
+    ('{"type": "topic", "id": 1}', "Line 3: Wrong record type 'topic', expected 'author' or 'quote'"),
+    ('{"type": "quote", "id": 9, "author_id": 7, "text": "x"}', "Line 3: Author with id=7 not found in import"),
+    ('{"type": "quote", "id": 9, "author_id": 1}', "Line 3: Quote without text"),
+    ('{"type": "author", "id": 5}', "Line 3: Author without name"),
+    ('[1, 2]', "Line 3: Expected object, got [1, 2]"),
+    ('{"type": "quote", ', "Line 3: "),
+])
+def test_import_wrong_record(client, monkeypatch, line, message):
+    # пачки по одной записи: все, что до ошибки, уже сохранено
+    monkeypatch.setattr(quotes_app, 'IMPORT_BATCH_SIZE', 1)
+    data = json.dumps(RECORDS[0]) + '\n' + json.dumps(RECORDS[2]) + '\n' + line + '\n'
+    response = import_file(client, data)
+    assert response.status_code == 400
+    assert response.json['message'].startswith(message)
+    assert response.json['authors_created'] == 1 and response.json['quotes_created'] == 1
+    assert [quote['id'] for quote in client.get('/quotes').json] == [1]
+
+
+def test_import_wrong_csv_line_number(client):
+    data = CSV.replace('quote,4,,,1,', 'quote,4,,,x,')
+    response = import_file(client, data, 'csv')
+    assert response.status_code == 400
+    # номер строки файла: поле цитаты 3 занимает две строки
+    assert response.json['message'].startswith('Line 7: ')
+
+
+@pytest.mark.parametrize('path', ['/export?format=xml', '/import?format=xml'])
+def test_wrong_format(client, path):
+    response = client.open(path, method='GET' if path.startswith('/export') else 'POST')
+    assert response.status_code == 400
+    assert response.json['message'] == "Wrong value format=xml, expected one of ['ndjson', 'csv']"
+
+
+def test_export_large_catalog_in_chunks(client, monkeypatch):
+    monkeypatch.setattr(quotes_app, 'STREAM_CHUNK_SIZE', 2)
+    import_file(client, NDJSON)
+    response = client.get('/export', buffered=False)
+    chunks = [chunk for chunk in response.response if chunk]
+    assert len(chunks) == 3
+    assert b''.join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks).decode() == NDJSON
+
+
+def run_jobs():
+    while (job := quotes_app.job_queue.claim()) is not None:
+        quotes_app.job_queue.run(job)
+
+
+def test_async_import(app, client):
+    response = import_file(client, CSV, 'csv', headers={'Prefer': 'respond-async', 'Idempotency-Key': 'import-1'})
+    assert response.status_code == 202
+    job = response.json['job']
+    assert response.headers['Location'] == f"/jobs/{job['id']}"
+    assert job['status'] == 'queued'
+    path = quotes_app.db.session.get(quotes_app.JobModel, job['id']).payload['path']
+    # повтор с тем же ключом не ставит второй импорт
+    again = import_file(client, CSV, 'csv', headers={'Prefer': 'respond-async', 'Idempotency-Key': 'import-1'})
+    assert again.json['job']['id'] == job['id']
+    run_jobs()
+    job = client.get(f"/jobs/{job['id']}").json['job']
+    assert job['status'] == 'done'
+    assert job['result'] == CREATED
+    assert not quotes_app.Path(path).exists()
+    assert client.get('/export').get_data(as_text=True) == NDJSON
+
+
+def test_async_import_wrong_file(app, client):
+    response = import_file(client, '{"type": "topic"}\n', headers={'Prefer': 'respond-async'})
+    path = quotes_app.db.session.get(quotes_app.JobModel, response.json['job']['id']).payload['path']
+    run_jobs()
+    job = client.get(f"/jobs/{response.json['job']['id']}").json['job']
+    assert job['status'] == 'failed'
+    assert job['error'].startswith("ValueError: Line 1: Wrong record type 'topic'")
+    assert not quotes_app.Path(path).exists()
+
+
+def test_cli_export_import(app, tmp_path):
+    source = tmp_path / 'in.csv'
+    source.write_text(CSV, encoding='utf-8', newline='')
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['quotes', 'import', str(source)])
+    assert result.exit_code == 0, result.output
+    assert 'Imported: authors: 2 created, 0 existing; quotes: 3 created, 0 skipped' in result.output
+    target = tmp_path / 'out.ndjson'
+    result = runner.invoke(args=['quotes', 'export', '--output', str(target)])
+    assert result.exit_code == 0, result.output
+    assert target.read_text(encoding='utf-8') == NDJSON
+    result = runner.invoke(args=['quotes', 'import', '--format', 'ndjson', '-'], input='{"type": "x"}\n')
+    assert result.exit_code == 1
+    assert "Line 1: Wrong record type 'x'" in result.output
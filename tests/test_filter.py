@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+# Даты цитат каталога в том виде, как их хранит SQLite: CURRENT_TIMESTAMP без
+# долей секунды и значения из Python с микросекундами
+CREATED = (
+    '2025-04-01 10:00:00',
+    '2025-04-01 10:00:00.500000',
+    '2025-04-01 10:00:01.000000',
+    '2025-04-01 09:59:59.999999',
+    '2025-04-02 00:00:00',
+)
+# Одна и та же секунда 2025-04-01 10:00:00 UTC в разной записи
+BOUNDARY = ('2025-04-01T10:00:00', '2025-04-01 10:00:00', '2025-04-01T10:00:00.900',
+            '2025-04-01T13:00:00+03:00', '2025-04-01T10:00:00Z')
+# оператор -> номера цитат каталога, попадающих в выборку на границе
+EXPECTED = {
+    'eq': {0, 1},
+    'ne': {2, 3, 4},
+    'lt': {3},
+    'lte': {0, 1, 3},
+    'gt': {2, 4},
+    'gte': {0, 1, 2, 4},
+}
+
+
+@pytest.fixture
+def dated_catalog(catalog, database):
+    with sqlite3.connect(database) as connection:
+        connection.executemany("UPDATE quotes SET created_datetime = ? WHERE id = ?",
+                               zip(CREATED, catalog['quotes']))
+    connection.close()
+    return catalog
+
+
+def filtered(client, query: str, catalog: dict) -> set[int]:
+    response = client.get(f'/quotes/filter?{query}')
+    assert response.status_code == 200, response.json
+    return {catalog['quotes'].index(quote['id']) for quote in response.json}
+
+
+@pytest.mark.parametrize('op', EXPECTED)
+@pytest.mark.parametrize('value', BOUNDARY)
+def test_created_datetime_boundary(client, dated_catalog, op, value):
+    query = f'created_datetime__{op}={value.replace("+", "%2B")}'
+    assert filtered(client, query, dated_catalog) == EXPECTED[op]
+
+
+def test_created_datetime_eq_without_operator(client, dated_catalog):
+    assert filtered(client, 'created_datetime=2025-04-01T10:00:00', dated_catalog) == {0, 1}
+
+
+def test_created_datetime_in(client, dated_catalog):
+    query = 'created_datetime__in=2025-04-01T10:00:01,2025-04-01T12:59:59%2B03:00'
+    assert filtered(client, query, dated_catalog) == {2, 3}
+
+
+def test_created_datetime_date_only(client, dated_catalog):
+    assert filtered(client, 'created_datetime__gte=2025-04-02', dated_catalog) == {4}
+
+
+@pytest.mark.parametrize('query', ['created_datetime__lt=вчера', 'created_datetime__contains=2025',
+                                   'rating__startswith=1', 'id__contains=1', 'rating__like=1', 'deleted=1'])
+def test_wrong_filters(client, dated_catalog, query):
+    assert client.get(f'/quotes/filter?{query}').status_code == 400
@@ -0,0 +1,154 @@
+import sqlite3
+
+import pytest
+
+import app as quotes_app
+from app import FragmentCache
+
+PATHS = ['/quotes', '/quotes?limit=2', '/quotes?limit=2&after=2', '/quotes/filter?rating__gte=2',
+         '/quotes/filter?author.name=Rick&limit=2', '/authors', '/authors/1/quotes', '/authors/2/quotes',
+         '/authors/100/quotes']
+
+
+def responses(app, client, paths) -> list[tuple]:
+    """Ответы на paths: (адрес, статус, тело как есть) - тела сравниваются побайтно"""
+    return [(path, response.status_code, response.data) for path in paths for response in [client.get(path)]]
+
+
+def assert_same_as_plain(app, client, paths=PATHS):
+    """Ответы с FRAGMENT_CACHE совпадают с ответами без него - и на промахах, и из кэша"""
+    app.config['FRAGMENT_CACHE'] = False
+    expected = responses(app, client, paths)
+    app.config['FRAGMENT_CACHE'] = True
+    assert responses(app, client, paths) == expected
+    assert responses(app, client, paths) == expected
+
+
+@pytest.fixture
+def fragments(app):
+    app.config['FRAGMENT_CACHE'] = True
+    return quotes_app.fragment_cache
+
+
+def test_fragment_cache_lookup(app):
+    cache = FragmentCache()
+    cache.set('quote', 1, (1, 'a'), b'{"id":1}')
+    cache.set('quote', 2, (1, 'a'), b'{"id":2}')
+    fragments, misses = cache.lookup('quote', [(1, 1, 'a'), (2, 2, 'a'), (3, 1, 'a')])
+    # фрагмент другой версии - промах
+    assert fragments == [b'{"id":1}', None, None]
+    assert misses == {2: 1, 3: 2}
+    assert cache.lookup('quote_short', [(1, 1, 'a')])[1] == {1: 0}
+
+
+def test_fragment_cache_discard_and_evict(app):
+    app.config['FRAGMENT_CACHE_MAX_SIZE'] = 3
+    cache = FragmentCache()
+    for kind in ('quote', 'quote_short', 'author'):
+        cache.set(kind, 1, (1,), kind.encode())
+    cache.discard(quote_ids=[1])
+    assert len(cache) == 1
+    cache.discard(author_ids=[1])
+    assert len(cache) == 0
+    for row_id in range(5):
+        cache.set('quote', row_id, (1,), b'')
+    # вытесняются самые старые записи
+    assert len(cache) == 3
+    assert cache.lookup('quote', [(0, 1), (4, 1)])[1] == {0: 0}
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_fragments_match_plain_responses(app, client, catalog, fragments):
+    assert_same_as_plain(app, client)
+    # 5 цитат в двух видах и 2 автора
+    assert len(fragments) == 12
+
+
+def test_fragments_are_off_by_default(client, catalog):
+    client.get('/quotes')
+    client.get('/authors')
+    assert len(quotes_app.fragment_cache) == 0
+
+
+def test_fragments_need_compact_json(app, client, catalog, fragments):
+    app.json.compact = False
+    try:
+        response = client.get('/quotes')
+    finally:
+        app.json.compact = None
+    assert response.data.startswith(b'[\n')
+    assert len(fragments) == 0
+
+
+def test_fragments_follow_writes(app, client, catalog, fragments):
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    client.get('/quotes')
+    client.get(f'/authors/{rick}/quotes')
+    client.get('/authors')
+    client.put(f'/quotes/{quotes[0]}/up')
+    client.put(f'/quotes/{quotes[1]}', json={'author_id': waldi, 'text': 'Вселенная снова выигрывает'})
+    client.delete(f'/quotes/{quotes[2]}')
+    client.patch('/quotes/bulk', json=[{'id': quotes[3], 'rating': 5}])
+    # имя автора входит во фрагменты его цитат
+    client.put(f'/authors/{rick}', json={'name': 'Richard'})
+    client.post(f'/authors/{rick}/quotes', json={'text': 'Новая цитата', 'rating': 2})
+    assert_same_as_plain(app, client)
+    assert [quote['author']['name'] for quote in client.get('/quotes').json] == ['Richard', 'Waldi', 'Waldi', 'Richard',
+                                                                                 'Richard']
+    client.delete(f'/authors/{waldi}')
+    assert_same_as_plain(app, client)
+    client.put(f'/authors/restore/{waldi}')
+    assert_same_as_plain(app, client)
+
+
+def test_fragments_see_other_processes(app, client, catalog, database, fragments):
+    """Запись другого процесса отсекается сравнением версий, а не удалением из кэша
+
+    Версию поднимает сам UPDATE - так же, как onupdate моделей в другом процессе.
+    """
+    quotes = catalog['quotes']
+    client.get('/quotes')
+    with sqlite3.connect(database) as connection:
+        connection.execute("UPDATE quotes SET rating = 1, version = version + 1 WHERE id = ?", (quotes[0],))
+        connection.execute("UPDATE authors SET surname = 'Cooke', version = version + 1 WHERE id = ?",
+                           (catalog['authors'][0],))
+    connection.close()
+    ratings = {quote['id']: (quote['rating'], quote['author']['surname']) for quote in client.get('/quotes').json}
+    assert ratings[quotes[0]] == (1, 'Cooke')
+    assert ratings[quotes[2]] == (2, 'Ravens')
+    assert_same_as_plain(app, client)
+
+
+def test_reused_id_gets_new_fragment(app, client, catalog, database, fragments):
+    """Новая строка с id удаленной отличается по updated_at, даже если version совпал"""
+    quote = catalog['quotes'][-1]
+    client.get('/quotes')
+    with sqlite3.connect(database) as connection:
+        row = connection.execute("SELECT author_id, rating, version FROM quotes WHERE id = ?", (quote,)).fetchone()
+        connection.execute("DELETE FROM quotes WHERE id = ?", (quote,))
+        connection.execute("INSERT INTO quotes (id, author_id, text, rating, deleted, version, updated_at) "
+                           "VALUES (?, ?, 'Другая цитата', ?, 0, ?, '2030-01-01 00:00:00')", (quote, *row))
+    connection.close()
+    assert client.get('/quotes').json[-1]['text'] == 'Другая цитата'
+
+
+def test_partial_misses_are_fetched_by_id(app, client, catalog, fragments, monkeypatch):
+    """Меньше половины промахов - строки читаются пачками по id"""
+    monkeypatch.setattr(quotes_app, 'IMPORT_BATCH_SIZE', 1)
+    client.get('/quotes')
+    client.put(f"/quotes/{catalog['quotes'][0]}/up")
+    client.put(f"/quotes/{catalog['quotes'][3]}/up")
+    assert_same_as_plain(app, client, ['/quotes'])
+
+
+def test_asgi_fragments(app, client, asgi_client, catalog, fragments):
+    paths = ['/quotes', '/quotes?limit=2', '/authors', '/authors/1/quotes']
+    expected = {path: client.get(path).data for path in paths}
+    fragments.clear()
+    assert {path: asgi_client.get(path).data for path in paths} == expected
+    # 5 цитат, 3 цитаты Рика без автора и 2 автора
+    assert len(fragments) == 10
+    client.put(f"/quotes/{catalog['quotes'][0]}/down")
+    assert asgi_client.get('/quotes').json[0]['rating'] == 2
@@ -0,0 +1,196 @@
+import datetime
+
+import pytest
+
+import app as quotes_app
+from app import count_queries
+
+
+def job_state(client, job_id: int) -> dict:
+    response = client.get(f'/jobs/{job_id}')
+    assert response.status_code == 200
+    return response.json['job']
+
+
+def run_next():
+    job = quotes_app.job_queue.claim()
+    if job is not None:
+        quotes_app.job_queue.run(job)
+    return job
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """Регистрирует задачу вида 'test', которая вызывает переданную функцию"""
+    def register(func):
+        monkeypatch.setitem(quotes_app.job_queue._handlers, 'test', func)
+    return register
+
+
+def test_async_author_delete_and_restore(app, client, catalog):
+    rick = catalog['authors'][0]
+    response = client.delete(f'/authors/{rick}', headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+    job_id = response.json['job']['id']
+    assert response.headers['Location'] == f'/jobs/{job_id}'
+    assert job_state(client, job_id)['status'] == 'queued'
+    assert len(client.get('/quotes').json) == 5
+    run_next()
+    job = job_state(client, job_id)
+    assert (job['status'], job['attempts'], job['result'], job['error']) == ('done', 1, {'quotes_deleted': 3}, None)
+    assert len(client.get('/quotes').json) == 2
+
+    response = client.put(f'/authors/restore/{rick}', headers={'Prefer': 'respond-async; wait=0'})
+    assert response.status_code == 202
+    run_next()
+    assert job_state(client, response.json['job']['id'])['result'] == {'quotes_restored': 3}
+    assert len(client.get('/quotes').json) == 5
+
+
+def test_async_request_for_missing_author(app, client, catalog):
+    response = client.delete('/authors/100', headers={'Prefer': 'respond-async'})
+    assert response.status_code == 404
+    assert run_next() is None
+
+
+def test_idempotency_key(app, client, catalog):
+    headers = {'Prefer': 'respond-async', 'Idempotency-Key': 'delete-rick'}
+    first = client.delete(f"/authors/{catalog['authors'][0]}", headers=headers)
+    run_next()
+    # автор уже удален, но повтор с тем же ключом отвечает той же задачей, а не 404
+    again = client.delete(f"/authors/{catalog['authors'][0]}", headers=headers)
+    assert again.status_code == 202
+    assert again.json['job']['id'] == first.json['job']['id']
+    assert again.json['job']['status'] == 'done'
+    assert run_next() is None
+
+
+def test_rebuild_indexes(app, client, catalog, database):
+    quotes_app.db.session.execute(quotes_app.db.update(quotes_app.AuthorModel).values(quotes_count=10))
+    quotes_app.db.session.commit()
+    response = client.post('/jobs/rebuild-indexes')
+    assert response.status_code == 202
+    run_next()
+    assert job_state(client, response.json['job']['id'])['result'] == {'authors_fixed': 2}
+    assert [author['quotes_count'] for author in client.get('/authors/top').json] == [3, 2]
+
+
+def test_jobs_run_in_order(app, handler):
+    done = []
+    handler(lambda number: done.append(number) or {'number': number})
+    jobs = [quotes_app.job_queue.enqueue('test', {'number': number}) for number in range(3)]
+    while run_next():
+        pass
+    assert done == [0, 1, 2]
+    assert [quotes_app.db.session.get(quotes_app.JobModel, job.id).result for job in jobs] == \
+        [{'number': number} for number in range(3)]
+
+
+def test_failed_attempts_are_retried(app, client, handler):
+    app.config['JOB_RETRY_DELAY'] = 0
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError('temporary')
+        return {'attempts': len(attempts)}
+
+    handler(flaky)
+    job_id = quotes_app.job_queue.enqueue('test', {}).id
+    run_next()
+    job = job_state(client, job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('queued', 1, 'RuntimeError: temporary')
+    run_next()
+    run_next()
+    job = job_state(client, job_id)
+    assert (job['status'], job['attempts'], job['result'], job['error']) == ('done', 3, {'attempts': 3}, None)
+
+
+def test_retry_waits_for_backoff(app, client, handler):
+    app.config['JOB_RETRY_DELAY'] = 60
+    handler(lambda: 1 / 0)
+    job_id = quotes_app.job_queue.enqueue('test', {}).id
+    before = quotes_app.utcnow()
+    run_next()
+    assert run_next() is None
+    run_after = quotes_app.db.session.get(quotes_app.JobModel, job_id).run_after
+    assert before + datetime.timedelta(seconds=59) <= run_after <= quotes_app.utcnow() + datetime.timedelta(seconds=60)
+
+
+def test_job_fails_after_max_attempts(app, client, handler):
+    app.config['JOB_RETRY_DELAY'] = 0
+    app.config['JOB_MAX_ATTEMPTS'] = 2
+    handler(lambda: 1 / 0)
+    job_id = quotes_app.job_queue.enqueue('test', {}).id
+    run_next()
+    run_next()
+    assert run_next() is None
+    job = job_state(client, job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('failed', 2, 'ZeroDivisionError: division by zero')
+
+
+def test_data_error_is_not_retried(app, client, handler):
+    def wrong_data():
+        raise ValueError('Line 1: wrong record')
+
+    handler(wrong_data)
+    job_id = quotes_app.job_queue.enqueue('test', {}).id
+    run_next()
+    job = job_state(client, job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('failed', 1, 'ValueError: Line 1: wrong record')
+
+
+def test_expired_lease_is_claimed_again(app, client, handler):
+    """Задачу процесса, упавшего посреди работы, забирает другой исполнитель"""
+    handler(lambda: {'ok': True})
+    job_id = quotes_app.job_queue.enqueue('test', {}).id
+    claimed = quotes_app.job_queue.claim()
+    assert claimed.id == job_id
+    # аренда еще действует: задачу никто не заберет
+    assert quotes_app.job_queue.claim() is None
+    quotes_app.db.session.execute(quotes_app.db.update(quotes_app.JobModel).values(
+        locked_until=quotes_app.utcnow() - datetime.timedelta(seconds=1)))
+    quotes_app.db.session.commit()
+    reclaimed = quotes_app.job_queue.claim()
+    assert (reclaimed.id, reclaimed.attempts) == (job_id, 2)
+    quotes_app.job_queue.run(reclaimed)
+    assert job_state(client, job_id)['status'] == 'done'
+
+
+def test_job_not_found(client):
+    response = client.get('/jobs/100')
+    assert response.status_code == 404
+    assert response.json['message'] == 'Job with id=100 not found'
+
+
+def test_idle_claim_does_not_write(app, handler):
+    """Без готовых задач исполнитель только читает: блокировка записи SQLite не берется"""
+    app.config['JOB_RETRY_DELAY'] = 60
+    handler(lambda: 1 / 0)
+    quotes_app.job_queue.enqueue('test', {})
+    run_next()
+    with count_queries() as queries:
+        assert quotes_app.job_queue.claim() is None
+    assert [query.statement.split()[0] for query in queries] == ['SELECT']
+
+
+def test_requests_do_not_start_workers(app, client, monkeypatch):
+    app.config['JOB_WORKERS'] = 2
+    started = []
+    monkeypatch.setattr(quotes_app.job_queue, 'start', lambda: started.append(1))
+    client.get('/quotes')
+    assert started == []
+    client.post('/jobs/rebuild-indexes')
+    assert started == [1]
+
+
+def test_cli_runs_pending_jobs(app, handler):
+    done = []
+    handler(lambda number: done.append(number) or {})
+    for number in range(2):
+        quotes_app.job_queue.enqueue('test', {'number': number})
+    result = app.test_cli_runner().invoke(args=['jobs', 'work', '--once'])
+    assert result.exit_code == 0, result.output
+    assert 'Jobs run: 2' in result.output
+    assert done == [0, 1]
@@ -0,0 +1,69 @@
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+
+import app as quotes_app
+from app import COMPACT_SEPARATORS, JSON_PROVIDERS, QUOTE_JSON, db, select_quote_rows
+
+PATHS = ['/quotes', '/quotes?limit=2', '/quotes/{quote}', '/authors', '/authors/name?limit=1', '/authors/{author}',
+         '/authors/{author}/quotes', '/quotes/top', '/authors/top', '/quotes/filter?rating__gte=3',
+         '/quotes/search?q=Программирование', '/quotes?stream=ndjson', '/quotes?stream=json']
+
+VALUES = [
+    {'b': 1, 'a': [True, False, None]},
+    'Кириллица, "кавычки" и \\ \n\t\u2028 эмодзи 😀',
+    [0.1, 1.5, 1e-06, 1e+20, 123456789.125, -0.0, 2 ** 70, -2 ** 63],
+    datetime.datetime(2025, 4, 1, 10, 0, 0, 500000),
+    datetime.date(2025, 4, 1),
+    decimal.Decimal('1.10'),
+    uuid.UUID(int=1),
+    {1: 'ключ-число'},
+]
+
+
+@pytest.fixture
+def unusual_catalog(client, catalog):
+    author = client.post('/authors', json={'name': 'Ёж "Колючий"', 'surname': '\\😀\u2028'}).json['id']
+    client.post(f'/authors/{author}/quotes', json={'text': 'Строка с "кавычками",\nпереводом строки и 😀', 'rating': 5})
+    return catalog
+
+
+def responses(client, catalog) -> dict[str, bytes]:
+    return {path: client.get(path.format(quote=catalog['quotes'][0], author=catalog['authors'][0])).data
+            for path in PATHS}
+
+
+@pytest.mark.parametrize('compact', [None, False], ids=['compact', 'indented'])
+def test_providers_give_same_bytes(app, client, unusual_catalog, monkeypatch, compact):
+    orjson_provider = JSON_PROVIDERS['orjson'](app)
+    default_provider = JSON_PROVIDERS['default'](app)
+    for provider in (orjson_provider, default_provider):
+        provider.ensure_ascii = False
+        provider.compact = compact
+    monkeypatch.setattr(app, 'json', orjson_provider)
+    fast = responses(client, unusual_catalog)
+    monkeypatch.setattr(app, 'json', default_provider)
+    assert responses(client, unusual_catalog) == fast
+
+
+@pytest.mark.parametrize('value', VALUES, ids=lambda value: type(value).__name__)
+def test_orjson_provider_dumps_like_json(app, value):
+    provider = JSON_PROVIDERS['orjson'](app)
+    provider.ensure_ascii = False
+    expected = JSON_PROVIDERS['default'](app)
+    expected.ensure_ascii = False
+    assert provider.dumps(value, separators=COMPACT_SEPARATORS) == expected.dumps(value, separators=COMPACT_SEPARATORS)
+    assert provider.dumps(value) == expected.dumps(value)
+
+
+def test_row_json_matches_to_dict(app, unusual_catalog):
+    rows = db.session.execute(select_quote_rows().order_by(quotes_app.QuoteModel.id)).all()
+    quotes = db.session.execute(quotes_app.select_quotes().order_by(quotes_app.QuoteModel.id)).scalars().all()
+    for row, quote in zip(rows, quotes):
+        assert QUOTE_JSON.dumps(row) == app.json.dumps(quote.to_dict(), separators=COMPACT_SEPARATORS)
+        assert QUOTE_JSON.dumps_spaced(row) == app.json.dumps(quote.to_dict())
+        assert QUOTE_JSON.to_dict(row) == quote.to_dict()
+    assert json.loads(QUOTE_JSON.dumps_list(rows)) == json.loads(app.json.dumps([quote.to_dict() for quote in quotes]))
@@ -0,0 +1,96 @@
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import app as quotes_app
+from app import Metrics, prometheus_labels
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    fresh = Metrics()
+    monkeypatch.setattr(quotes_app, 'metrics', fresh)
+    return fresh
+
+
+def samples(client) -> dict[str, float]:
+    """Строки /metrics без комментариев: имя с метками -> значение"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    result = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            result[name] = float(value)
+    return result
+
+
+def test_request_metrics(client, catalog, metrics):
+    body = client.get('/quotes').data
+    client.get('/quotes')
+    client.get('/quotes/1000')
+    result = samples(client)
+    assert result['quotes_http_requests_total{endpoint="get_quotes",method="GET",status="200"}'] == 2
+    assert result['quotes_http_requests_total{endpoint="get_quote",method="GET",status="404"}'] == 1
+    assert result['quotes_http_request_duration_seconds_count{endpoint="get_quotes"}'] == 2
+    assert result['quotes_http_request_duration_seconds_bucket{endpoint="get_quotes",le="+Inf"}'] == 2
+    assert result['quotes_http_response_size_bytes_sum{endpoint="get_quotes"}'] == 2 * len(body)
+    # проверка версии для ETag и сам список
+    assert result['quotes_sql_statements_per_request_sum{endpoint="get_quotes"}'] == 4
+    assert result['quotes_sql_statements_per_request_bucket{endpoint="get_quotes",le="1"}'] == 0
+    assert result['quotes_sql_statements_per_request_bucket{endpoint="get_quotes",le="2"}'] == 2
+    assert result['quotes_sql_duration_seconds_per_request_sum{endpoint="get_quotes"}'] > 0
+
+
+def test_unmatched_requests(client, metrics):
+    client.get('/nothing')
+    assert samples(client)['quotes_http_requests_total{endpoint="<unmatched>",method="GET",status="404"}'] == 1
+
+
+def test_metrics_can_be_disabled(app, client, catalog, metrics):
+    app.config['METRICS'] = False
+    client.get('/quotes')
+    assert not any(name.startswith('quotes_http_requests_total') for name in samples(client))
+
+
+def test_slow_query_log(app, client, catalog, metrics, caplog):
+    app.config['SLOW_QUERY_THRESHOLD'] = 0
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get(f"/quotes/{catalog['quotes'][0]}")
+    assert samples(client)['quotes_sql_slow_queries_total{endpoint="get_quote"}'] == 2
+    messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Slow query')]
+    assert len(messages) == 2
+    assert all(' in get_quote: SELECT ' in message for message in messages)
+
+
+def test_slow_query_log_can_be_disabled(app, client, catalog, metrics):
+    app.config['SLOW_QUERY_THRESHOLD'] = None
+    client.get('/quotes')
+    assert not any(name.startswith('quotes_sql_slow_queries_total') for name in samples(client))
+
+
+@pytest.mark.parametrize('value, expected', [(' OFF ', 'None'), ('', 'None'), ('2', '2.0')])
+def test_slow_query_threshold_from_environment(value, expected):
+    env = {**os.environ, 'QUOTES_SLOW_QUERY_THRESHOLD': value}
+    result = subprocess.run([sys.executable, '-c', "import app; print(app.app.config['SLOW_QUERY_THRESHOLD'])"],
+                            cwd=Path(quotes_app.__file__).parent, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == expected
+
+
+def test_cache_metrics(app, client, catalog, metrics):
+    app.config['RESPONSE_CACHE'] = True
+    client.get('/quotes')
+    client.get('/quotes')
+    result = samples(client)
+    assert result['quotes_response_cache_requests_total{namespace="quotes",result="miss"}'] == 1
+    assert result['quotes_response_cache_requests_total{namespace="quotes",result="hit"}'] == 1
+
+
+def test_prometheus_labels_are_escaped():
+    assert prometheus_labels(('a', 'b'), ('x"y', 'back\\slash\nline')) == '{a="x\\"y",b="back\\\\slash\\nline"}'
+    assert prometheus_labels((), ()) == ''
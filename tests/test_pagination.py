@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from app import PAGE_LIMIT_MAX
+
+
+def pages(client, path: str, limit: int) -> list[list[dict]]:
+    """Все страницы списка, пройденные по курсорам next"""
+    result = []
+    separator = '&' if '?' in path else '?'
+    url = f'{path}{separator}limit={limit}'
+    while True:
+        response = client.get(url)
+        assert response.status_code == 200
+        result.append(response.json['items'])
+        if response.json['next'] is None:
+            return result
+        url = f"{path}{separator}limit={limit}&after={response.json['next']}"
+
+
+@pytest.mark.parametrize('path', ['/quotes', '/authors', '/authors/name', '/authors/surname',
+                                  '/quotes/filter?rating__gte=2'])
+def test_pages_cover_whole_list(client, catalog, path):
+    everything = client.get(path).json
+    result = pages(client, path, 2)
+    assert [item for page in result for item in page] == everything
+    assert all(len(page) == 2 for page in result[:-1])
+
+
+def test_list_orderings(client, catalog):
+    assert [quote['id'] for quote in client.get('/quotes').json] == sorted(catalog['quotes'])
+    assert [author['name'] for author in client.get('/authors/name').json] == ['Rick', 'Waldi']
+    assert [author['surname'] for author in client.get('/authors/surname').json] == ['Cook', 'Ravens']
+
+
+def test_last_page_has_no_cursor(client, catalog):
+    response = client.get(f'/quotes?limit={len(catalog["quotes"])}')
+    assert len(response.json['items']) == len(catalog['quotes'])
+    assert response.json['next'] is None
+
+
+def test_page_skips_rows_deleted_after_cursor(client, catalog):
+    first = client.get('/quotes?limit=2').json
+    client.delete(f"/quotes/{catalog['quotes'][2]}")
+    second = client.get(f"/quotes?limit=2&after={first['next']}").json
+    assert [quote['id'] for quote in second['items']] == catalog['quotes'][3:5]
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', str(PAGE_LIMIT_MAX + 1)])
+def test_wrong_limit(client, catalog, limit):
+    response = client.get(f'/quotes?limit={limit}')
+    assert response.status_code == 400
+    assert response.json['message'] == f"Wrong value limit={limit}, expected 1..{PAGE_LIMIT_MAX}"
+
+
+@pytest.mark.parametrize('after', ['abc', 'W10', 'WzEsIDJd', '%%%'])
+def test_wrong_cursor(client, catalog, after):
+    assert client.get(f'/quotes?limit=2&after={after}').status_code == 400
+
+
+# [{"a":1}], [[1],2], [true]: длина верная, но значения не скаляры колонок
+@pytest.mark.parametrize('path', ['/quotes?limit=1&after=W3siYSI6MX1d', '/authors/name?limit=1&after=W1sxXSwyXQ',
+                                  '/quotes?limit=1&after=W3RydWVd'])
+def test_cursor_with_wrong_values(client, asgi_client, catalog, path):
+    for response in (client.get(path), asgi_client.get(path)):
+        assert response.status_code == 400
+        assert response.json['message'] == f"Wrong cursor after={path.rsplit('=', 1)[1]}"
+
+
+def test_stream_ndjson(client, catalog):
+    response = client.get('/quotes?stream=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == client.get('/quotes').json
+
+
+def test_stream_json_array(client, catalog):
+    response = client.get('/authors/name?stream=json&limit=1')
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data(as_text=True)) == client.get('/authors/name').json[:1]
+
+
+def test_wrong_stream_format(client, catalog):
+    assert client.get('/quotes?stream=xml').status_code == 400
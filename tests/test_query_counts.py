@@ -0,0 +1,44 @@
+import pytest
+
+from app import READER_BIND, assert_num_queries, count_queries, db
+
+# Число запросов на GET: проверка версии для ETag плюс сами данные, без N+1
+ENDPOINT_QUERIES = {
+    'list': ('/quotes', 2),
+    'page': ('/quotes?limit=2', 2),
+    'detail': ('/quotes/{quote}', 2),
+    'author_quotes': ('/authors/{author}/quotes', 3),
+    'search': ('/quotes/search?q=Программирование', 2),
+}
+
+
+def endpoint_path(name: str, catalog: dict) -> str:
+    return ENDPOINT_QUERIES[name][0].format(quote=catalog['quotes'][0], author=catalog['authors'][0])
+
+
+@pytest.mark.parametrize('name', ENDPOINT_QUERIES)
+def test_endpoint_query_count(app, client, catalog, name):
+    with assert_num_queries(ENDPOINT_QUERIES[name][1]):
+        assert client.get(endpoint_path(name, catalog)).status_code == 200
+
+
+@pytest.mark.parametrize('name', ENDPOINT_QUERIES)
+def test_query_count_does_not_grow_with_rows(app, client, catalog, name):
+    author = catalog['authors'][0]
+    for number in range(20):
+        client.post(f'/authors/{author}/quotes', json={'text': f'Программирование {number}', 'rating': 1})
+    with assert_num_queries(ENDPOINT_QUERIES[name][1]):
+        client.get(endpoint_path(name, catalog))
+
+
+def test_reader_engine_queries_are_counted(app, client, catalog):
+    """GET идет через реплику; ее запросы тоже попадают в счетчик"""
+    with count_queries() as queries:
+        client.get('/quotes')
+    assert {query.engine for query in queries} == {db.engines[READER_BIND]}
+
+
+def test_assert_num_queries_lists_statements(app, client, catalog):
+    with pytest.raises(AssertionError, match='Expected 1 queries, got 2:\nSELECT'):
+        with assert_num_queries(1):
+            client.get('/quotes')
@@ -0,0 +1,91 @@
+"""Планы выполнения (EXPLAIN QUERY PLAN) запросов, которые выполняют обработчики
+
+SQL перехватывается через count_queries во время настоящих запросов к
+приложению, поэтому проверяются ровно те запросы, что уходят в БД.
+"""
+import re
+
+import pytest
+
+from app import count_queries
+
+FULL_SCAN_RE = re.compile(r'^SCAN \w+$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+REQUESTS = (
+    ('GET', '/authors'),
+    ('GET', '/authors?limit=1'),
+    ('GET', '/authors/deleted'),
+    ('GET', '/authors/name?limit=1'),
+    ('GET', '/authors/surname?limit=1'),
+    ('GET', '/authors/{author}'),
+    ('GET', '/authors/{author}/quotes'),
+    ('GET', '/authors/top'),
+    ('GET', '/quotes'),
+    ('GET', '/quotes?limit=2'),
+    ('GET', '/quotes?stream=ndjson'),
+    ('GET', '/quotes/{quote}'),
+    ('GET', '/quotes/count'),
+    ('GET', '/quotes/count/authors'),
+    ('GET', '/quotes/top'),
+    ('GET', '/quotes/random?n=3'),
+    ('GET', '/quotes/search?q=Программирование'),
+    ('GET', '/quotes/filter?rating__gte=2'),
+    ('GET', '/quotes/filter?author.name=Rick&rating__gte=2'),
+    ('GET', '/quotes/filter?text__contains=гонка'),
+    ('GET', '/changes'),
+    ('GET', '/export'),
+    ('PUT', '/quotes/{quote}/up'),
+    ('PUT', '/quotes/{quote}'),
+    ('DELETE', '/quotes/{quote}'),
+    ('DELETE', '/authors/{author}'),
+    ('PUT', '/authors/restore/{author}'),
+)
+
+# Осознанные исключения: путь -> строки плана, которые для него допустимы
+ALLOWED = {
+    # порядок по релевантности (bm25) вычисляется, индекса для него нет
+    '/quotes/search?q=Программирование': {TEMP_SORT},
+    # выборка по индексу автора, затем сортировка его цитат по id
+    '/quotes/filter?author.name=Rick&rating__gte=2': {TEMP_SORT},
+    # выгрузка читает таблицы целиком
+    '/export': {'SCAN authors', 'SCAN quotes'},
+}
+
+
+def query_plan(query) -> list[str]:
+    with query.engine.connect() as connection:
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + query.statement, query.parameters)
+        return [row[-1] for row in rows]
+
+
+def bad_plan_lines(plan: list[str]) -> list[str]:
+    return [line for line in plan if FULL_SCAN_RE.match(line) or line == TEMP_SORT]
+
+
+@pytest.mark.parametrize('method, path', REQUESTS, ids=[f'{method} {path}' for method, path in REQUESTS])
+def test_query_plans(app, client, catalog, method, path):
+    url = path.format(author=catalog['authors'][0], quote=catalog['quotes'][0])
+    body = {'text': 'Новый текст'} if method == 'PUT' and path == '/quotes/{quote}' else None
+    if path.startswith('/authors/restore/'):
+        client.delete(f"/authors/{catalog['authors'][0]}")
+    with count_queries() as queries:
+        response = client.open(url, method=method, json=body)
+        response.get_data()
+    assert response.status_code < 400
+    explained = [query for query in queries if query.statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))]
+    assert explained
+    failures = []
+    for query in explained:
+        plan = query_plan(query)
+        bad = [line for line in bad_plan_lines(plan) if line not in ALLOWED.get(path, ())]
+        if bad:
+            failures.append(f"{query.statement}\n    {'; '.join(plan)}")
+    assert not failures, '\n'.join(failures)
+
+
+def test_plan_check_catches_full_scan_and_temp_sort():
+    assert bad_plan_lines(['SCAN quotes', 'SEARCH authors USING INTEGER PRIMARY KEY (rowid=?)']) == ['SCAN quotes']
+    assert bad_plan_lines(['SEARCH authors USING INDEX ix_authors_deleted_quotes_count (deleted=?)', TEMP_SORT]) == [TEMP_SORT]
+    assert bad_plan_lines(['SCAN quotes USING INDEX ix_quotes_live_id',
+                           'SCAN quotes USING COVERING INDEX ix_quotes_author_id_deleted']) == []
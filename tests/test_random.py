@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from app import PAGE_LIMIT_MAX
+
+
+def random_ids(client, n: int) -> set[int]:
+    response = client.get(f'/quotes/random?n={n}')
+    assert response.status_code == 200
+    ids = [quote['id'] for quote in response.json]
+    assert len(ids) == len(set(ids))
+    return set(ids)
+
+
+def test_random_quote(client, catalog):
+    response = client.get('/quotes/random')
+    assert response.status_code == 200
+    assert response.json['id'] in catalog['quotes']
+    assert response.json['author']['id'] in catalog['authors']
+
+
+def test_random_quotes_are_distinct(client, catalog):
+    assert len(random_ids(client, 3)) == 3
+    assert random_ids(client, 10) == set(catalog['quotes'])
+
+
+@pytest.mark.parametrize('n', ['0', '-1', 'abc', '', str(PAGE_LIMIT_MAX + 1), '100000000'])
+def test_random_wrong_n(client, catalog, n):
+    response = client.get(f'/quotes/random?n={n}')
+    assert response.status_code == 400
+    assert response.json['message'].startswith(f"Wrong value n={n}")
+
+
+def test_random_max_n(client, catalog):
+    assert random_ids(client, PAGE_LIMIT_MAX) == set(catalog['quotes'])
+
+
+def test_random_without_quotes(client):
+    assert client.get('/quotes/random').status_code == 404
+
+
+def test_random_follows_deletes_and_restores(client, catalog):
+    rick, waldi = catalog['authors']
+    random_ids(client, 10)
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    client.delete(f'/authors/{waldi}')
+    assert random_ids(client, 10) == {catalog['quotes'][1], catalog['quotes'][4]}
+    client.put(f'/authors/restore/{waldi}')
+    assert random_ids(client, 10) == set(catalog['quotes'][1:])
+
+
+def test_random_sees_writes_of_other_processes(client, catalog, database):
+    """Цитаты, созданные и удаленные другим процессом (с записями журнала), попадают в выборку"""
+    random_ids(client, 10)
+    with sqlite3.connect(database) as connection:
+        new_id = connection.execute(
+            "INSERT INTO quotes (author_id, text, rating, deleted, version) VALUES (?, 'Из другого процесса', 1, 0, 1)",
+            (catalog['authors'][0],)).lastrowid
+        connection.execute("DELETE FROM quotes WHERE id = ?", (catalog['quotes'][0],))
+        connection.executemany("INSERT INTO changes (entity, entity_id) VALUES ('quote', ?)",
+                               [(new_id,), (catalog['quotes'][0],)])
+    connection.close()
+    assert random_ids(client, 10) == set(catalog['quotes'][1:]) | {new_id}
+
+
+def test_asgi_random(asgi_client, catalog):
+    response = asgi_client.get('/quotes/random?n=10')
+    assert response.status_code == 200
+    assert {quote['id'] for quote in response.json} == set(catalog['quotes'])
+    response = asgi_client.get(f'/quotes/random?n={PAGE_LIMIT_MAX + 1}')
+    assert response.status_code == 400
+    assert response.json['message'] == f"Wrong value n={PAGE_LIMIT_MAX + 1}, expected 1..{PAGE_LIMIT_MAX}"
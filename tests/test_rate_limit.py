@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app as quotes_app
+from app import Metrics, SingleFlight, SQLiteTokenBuckets, TokenBuckets, refill_bucket
+
+
+@pytest.fixture
+def rate_limit(app):
+    """RATE_LIMIT с корзиной на 2 запроса для get_quote и голосов; остальные обработчики без ограничения"""
+    app.config['RATE_LIMIT'] = True
+    app.config['RATE_LIMITS'] = {'get_quote': (0.5, 2), 'up_quote': (0.5, 2)}
+    return app.config
+
+
+def test_refill_bucket():
+    assert refill_bucket(2, 0, 1, 2) == (1, 0)
+    assert refill_bucket(0, 0, 2, 5) == (0, 0.5)
+    assert refill_bucket(0.5, 0.25, 2, 5) == (0, 0)
+    # пополнение не больше емкости
+    assert refill_bucket(1, 100, 1, 3) == (2, 0)
+
+
+def test_token_buckets_evict_oldest(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(quotes_app.time, 'monotonic', lambda: now[0])
+    buckets = TokenBuckets(max_size=2)
+    assert [buckets.take('a', 1, 1), buckets.take('a', 1, 1)] == [0, 1]
+    now[0] = 0.5
+    assert buckets.take('a', 1, 1) == 0.5
+    buckets.take('b', 1, 1)
+    buckets.take('c', 1, 1)
+    # корзина 'a' вытеснена и начинается заново полной
+    assert buckets.take('a', 1, 1) == 0
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    """Корзины в файле общие: второй экземпляр (другой процесс) видит потраченные токены"""
+    path = str(tmp_path / 'limits' / 'rate_limits.db')
+    first, second = SQLiteTokenBuckets(path), SQLiteTokenBuckets(path)
+    assert first.take('client:get_quote', 0.5, 2) == 0
+    assert second.take('client:get_quote', 0.5, 2) == 0
+    assert 1.9 < first.take('client:get_quote', 0.5, 2) <= 2
+    assert second.take('other:get_quote', 0.5, 2) == 0
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_rate_limit(client, catalog, rate_limit, backend, tmp_path):
+    rate_limit['RATE_LIMIT_BACKEND'] = backend
+    rate_limit['RATE_LIMIT_SQLITE_PATH'] = str(tmp_path / 'rate_limits.db')
+    quote = catalog['quotes'][0]
+    assert [client.get(f'/quotes/{quote}').status_code for _ in range(2)] == [200, 200]
+    response = client.get(f'/quotes/{quote}')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '2'
+    assert response.json['message'] == 'Too many requests, retry in 2 s'
+    # корзина своя у каждого клиента и у каждого обработчика
+    assert client.get(f'/quotes/{quote}', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+    assert client.put(f'/quotes/{quote}/up').status_code == 200
+    assert all(client.get('/quotes').status_code == 200 for _ in range(5))
+
+
+def test_rate_limit_refills(client, catalog, rate_limit):
+    rate_limit['RATE_LIMITS'] = {'get_quote': (20, 1)}
+    quote = catalog['quotes'][0]
+    assert client.get(f'/quotes/{quote}').status_code == 200
+    assert client.get(f'/quotes/{quote}').status_code == 429
+    time.sleep(0.06)
+    assert client.get(f'/quotes/{quote}').status_code == 200
+
+
+def test_rate_limit_default(client, catalog, rate_limit):
+    rate_limit['RATE_LIMIT_DEFAULT'] = (0.5, 1)
+    assert client.get('/authors').status_code == 200
+    assert client.get('/authors').status_code == 429
+    assert client.get('/quotes').status_code == 200
+
+
+def test_rate_limit_is_off_by_default(client, catalog):
+    assert all(client.put(f"/quotes/{catalog['quotes'][0]}/down").status_code == 200 for _ in range(20))
+
+
+def test_asgi_rate_limit(client, asgi_client, catalog, rate_limit):
+    quote = catalog['quotes'][0]
+    assert [asgi_client.get(f'/quotes/{quote}').status_code for _ in range(3)] == [200, 200, 429]
+    response = asgi_client.get(f'/quotes/{quote}')
+    assert response.headers['retry-after'] == '2'
+    assert response.json['message'] == 'Too many requests, retry in 2 s'
+    # ASGI и Flask берут токены из одной корзины
+    assert client.get(f'/quotes/{quote}').status_code == 429
+
+
+def test_asgi_fallback_is_charged_once(app, asgi_client, catalog, rate_limit):
+    """Голос с VOTE_BUFFER обрабатывает Flask; токен за запрос берется один раз"""
+    app.config['VOTE_BUFFER'] = True
+    quote = catalog['quotes'][0]
+    assert [asgi_client.put(f'/quotes/{quote}/up').status_code for _ in range(3)] == [202, 202, 429]
+
+
+class CountingSingleFlight(SingleFlight):
+    """SingleFlight, запоминающий ключи вызовов do: тест ждет, пока все вызовы дойдут до ожидания"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = []
+
+    def do(self, key, func):
+        self.entered.append(key)
+        return super().do(key, func)
+
+    def wait_entered(self, count: int):
+        while len(self.entered) < count:
+            time.sleep(0.01)
+
+
+def test_single_flight_shares_result():
+    flight = CountingSingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'body'
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    flight.wait_entered(4)
+    assert flight.do('other', lambda: 'other') == ('other', False)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [('body', False), ('body', True), ('body', True), ('body', True)]
+    assert flight._calls == {}
+
+
+def test_single_flight_leader_error():
+    flight = CountingSingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors, results = [], []
+
+    def failing():
+        started.set()
+        release.wait()
+        raise RuntimeError('leader failed')
+
+    def leader():
+        try:
+            flight.do('key', failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flight.do('key', lambda: 'own')))
+    follower.start()
+    flight.wait_entered(2)
+    release.set()
+    thread.join()
+    follower.join()
+    # ведомый выполняет функцию сам, а не получает чужое исключение
+    assert len(errors) == 1
+    assert results == [('own', False)]
+
+
+def test_coalesced_requests(client, catalog, monkeypatch):
+    """Одинаковые одновременные GET /quotes/<id> выполняют обработчик один раз"""
+    quotes_app.app.config['SINGLE_FLIGHT'] = True
+    metrics = Metrics()
+    monkeypatch.setattr(quotes_app, 'metrics', metrics)
+    started, release = threading.Event(), threading.Event()
+
+    class GatedSingleFlight(CountingSingleFlight):
+        """Ведущий вызов ждет release, пока остальные запросы не присоединятся"""
+
+        def do(self, key, func):
+            def gated():
+                started.set()
+                release.wait()
+                return func()
+            return super().do(key, gated)
+
+    flight = GatedSingleFlight()
+    monkeypatch.setattr(quotes_app, 'single_flight', flight)
+    path = f"/quotes/{catalog['quotes'][0]}"
+    responses = []
+
+    def get():
+        responses.append(quotes_app.app.test_client().get(path))
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    flight.wait_entered(3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len({response.data for response in responses}) == 1
+    assert len({response.headers['ETag'] for response in responses}) == 1
+    assert metrics.coalesced_requests._values == {('get_quote',): 2}
+    # без одновременных запросов каждый выполняется сам
+    assert client.get(path).data == responses[0].data
+    assert metrics.coalesced_requests._values == {('get_quote',): 2}
+
+
+def test_asgi_single_flight():
+    import asgi
+    flight = asgi.SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'body'
+
+    async def run():
+        return await asyncio.gather(*(flight.do('key', slow) for _ in range(3)))
+
+    assert asyncio.run(run()) == [('body', False), ('body', True), ('body', True)]
+    assert len(calls) == 1
@@ -0,0 +1,173 @@
+import sqlite3
+from urllib.parse import parse_qsl
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as quotes_app
+from app import FILTER_OPERATORS, QUOTE_FILTER_FIELDS, TEXT_FILTER_OPERATORS
+
+# Даты цитат в том виде, как их хранит SQLite: CURRENT_TIMESTAMP без долей
+# секунды и значения из Python с микросекундами (см. tests/test_filter.py)
+CREATED = (
+    '2025-04-01 10:00:00',
+    '2025-04-01 10:00:00.500000',
+    '2025-04-01 10:00:01.000000',
+    '2025-04-01 09:59:59.999999',
+    '2025-04-02 00:00:00',
+    '2024-12-31 23:59:59.999999',
+    '2025-04-01 10:00:00.000001',
+)
+EXTRA_QUOTES = (
+    ('Rick', 'Скидка 50% на_все RICK', 2),
+    ('Waldi', 'rick and MORTY', 5),
+)
+# поле -> значения фильтра: границы, регистр, символы шаблонов LIKE, неверные значения
+VALUES = {
+    'id': ['3', '1', '0', '7', '100', '-1', 'x', '', '2,4,100'],
+    'author_id': ['1', '2', '3', 'x', '1,3'],
+    'text': ['Программирование', 'программирование', 'rick', 'RICK', 'Rick and', '50%', '%', '_', 'a_b',
+             'Учиться никогда не поздно', 'я', '', 'гонка,rick and MORTY'],
+    'rating': ['1', '3', '5', '0', '6', '', '1,5'],
+    'created_datetime': ['2025-04-01T10:00:00', '2025-04-01 10:00:00.900', '2025-04-01T13:00:00+03:00',
+                         '2025-04-01T10:00:00Z', '2025-04-01T09:59:59', '2025-04-02', '2025-01-01T02:59:59+03:00',
+                         'вчера', '2025-04-01T10:00:01,2024-12-31T23:59:59'],
+    'author.name': ['Rick', 'rick', 'Ri', 'Waldi', 'W', '', 'Rick,Waldi'],
+    'author.surname': ['Cook', 'cook', 'Ravens', 'R', '', 'Cook,Nobody'],
+}
+
+
+@pytest.fixture
+def parity_catalog(client, catalog, database):
+    rick, waldi = catalog['authors']
+    authors = {'Rick': rick, 'Waldi': waldi}
+    quotes = list(catalog['quotes'])
+    for author, text, rating in EXTRA_QUOTES:
+        quotes.append(client.post(f'/authors/{authors[author]}/quotes', json={'text': text, 'rating': rating}).json['id'])
+    with sqlite3.connect(database) as connection:
+        connection.executemany("UPDATE quotes SET created_datetime = ? WHERE id = ?", zip(CREATED, quotes))
+    connection.close()
+    # read model загрузится заново с датами, измененными в обход журнала
+    quotes_app.read_model.reset()
+    return catalog
+
+
+def responses(app, client, query: str) -> tuple:
+    """Ответы /quotes/filter?query без read model и с ним: (статус, тело)"""
+    result = []
+    for enabled in (False, True):
+        app.config['READ_MODEL'] = enabled
+        response = client.get('/quotes/filter', query_string=MultiDict(parse_qsl(query, keep_blank_values=True)))
+        result.append((response.status_code, response.json))
+    return tuple(result)
+
+
+def test_values_cover_every_filter():
+    assert set(VALUES) == set(QUOTE_FILTER_FIELDS)
+
+
+@pytest.mark.parametrize('field', VALUES)
+def test_filter_parity(app, client, parity_catalog, field):
+    """Каждое поле с каждым оператором дает один и тот же ответ в SQL и в read model"""
+    mismatches = []
+    statuses = set()
+    for op in FILTER_OPERATORS:
+        for value in VALUES[field]:
+            if op != 'in' and ',' in value:
+                continue
+            query = f'{field}__{op}={value}'
+            orm, read_model = responses(app, client, query.replace('%', '%25').replace('+', '%2B'))
+            statuses.add(orm[0])
+            if orm != read_model:
+                mismatches.append((query, orm, read_model))
+            if op in TEXT_FILTER_OPERATORS and QUOTE_FILTER_FIELDS[field][1] is not str:
+                assert orm[0] == 400, query
+    assert mismatches == []
+    assert 200 in statuses
+
+
+@pytest.mark.parametrize('query', [
+    'author.name=Rick&rating__gte=3',
+    'author.name__startswith=r&text__contains=rick',
+    'author_id__in=1,2&created_datetime__lt=2025-04-01T10:00:01&rating__ne=2',
+    'rating__gte=2&rating__lte=4',
+    'author.surname=Cook&author.name=Waldi',
+])
+def test_combined_filter_parity(app, client, parity_catalog, query):
+    orm, read_model = responses(app, client, query)
+    assert orm == read_model
+    assert orm[0] == 200
+
+
+@pytest.mark.parametrize('query', ['rating__gte=2', 'author.name=Rick', 'text__contains=о'])
+def test_filter_pages_parity(app, client, parity_catalog, query):
+    pages = []
+    for enabled in (False, True):
+        app.config['READ_MODEL'] = enabled
+        result, after = [], None
+        while True:
+            args = MultiDict(parse_qsl(query))
+            args.update({'limit': 2, **({'after': after} if after else {})})
+            response = client.get('/quotes/filter', query_string=args)
+            result.append(response.json['items'])
+            after = response.json['next']
+            if after is None:
+                break
+        pages.append(result)
+    assert pages[0] == pages[1]
+    assert len(pages[0]) > 1
+
+
+@pytest.mark.parametrize('path', ['/quotes', '/quotes?limit=3', '/quotes/1', '/quotes/100', '/authors/1/quotes',
+                                  '/authors/2/quotes', '/authors/100/quotes'])
+def test_read_parity(app, client, parity_catalog, path):
+    orm, read_model = [], []
+    for enabled, result in ((False, orm), (True, read_model)):
+        app.config['READ_MODEL'] = enabled
+        response = client.get(path)
+        result.append((response.status_code, response.json))
+    assert orm == read_model
+
+
+def test_read_model_follows_writes(app, client, catalog):
+    app.config['READ_MODEL'] = True
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    assert len(client.get('/quotes').json) == 5
+    client.put(f'/quotes/{quotes[0]}/up')
+    client.put(f'/quotes/{quotes[1]}', json={'author_id': waldi, 'text': 'Вселенная снова выигрывает'})
+    client.delete(f'/quotes/{quotes[2]}')
+    client.delete(f'/authors/{rick}')
+    client.put(f'/authors/{waldi}', json={'name': 'Walter'})
+    expected = []
+    app.config['READ_MODEL'] = False
+    for path in ('/quotes', f'/authors/{waldi}/quotes', f'/authors/{rick}/quotes', f'/quotes/{quotes[1]}',
+                 '/quotes/filter?author.name=Walter'):
+        expected.append((path, client.get(path).json))
+    app.config['READ_MODEL'] = True
+    assert [(path, client.get(path).json) for path, _ in expected] == expected
+    assert [quote['id'] for quote in client.get('/quotes').json] == [quotes[1], quotes[3]]
+
+
+def test_read_model_sees_other_processes(app, client, catalog, database):
+    """Записи другого процесса применяются по журналу изменений перед чтением"""
+    app.config['READ_MODEL'] = True
+    assert client.get(f"/quotes/{catalog['quotes'][0]}").json['rating'] == 3
+    with sqlite3.connect(database) as connection:
+        connection.execute("UPDATE quotes SET rating = 1 WHERE id = ?", (catalog['quotes'][0],))
+        connection.execute("INSERT INTO changes (entity, entity_id) VALUES ('quote', ?)", (catalog['quotes'][0],))
+    connection.close()
+    assert client.get(f"/quotes/{catalog['quotes'][0]}").json['rating'] == 1
+    assert quotes_app.read_model.seq == client.get('/changes?limit=1000').json['next']
+
+
+def test_read_model_reloads_after_many_changes(app, client, catalog):
+    app.config['READ_MODEL'] = True
+    app.config['READ_MODEL_RELOAD_CHANGES'] = 2
+    client.get('/quotes')
+    ids = quotes_app.read_model.ids
+    client.post('/quotes/bulk', json=[{'author_id': catalog['authors'][0], 'text': f'Цитата {i}'} for i in range(3)])
+    assert len(client.get('/quotes').json) == 8
+    # больше READ_MODEL_RELOAD_CHANGES записей - каталог загружен заново, а не обновлен по одной
+    assert quotes_app.read_model.ids is not ids
+    assert list(quotes_app.read_model.ids) == sorted(quotes_app.read_model.ids)
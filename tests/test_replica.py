@@ -0,0 +1,63 @@
+import shutil
+
+import pytest
+import sqlalchemy as sa
+
+from app import READER_BIND, QuoteModel, count_queries, db
+
+
+@pytest.fixture
+def stale_replica(app, catalog, database, tmp_path, monkeypatch):
+    """Реплика - снимок БД после создания каталога, не получающий новых записей"""
+    db.session.remove()
+    path = tmp_path / 'replica.db'
+    shutil.copyfile(database, path)
+    engine = sa.create_engine(f'sqlite:///{path}')
+    monkeypatch.setitem(db.engines, READER_BIND, engine)
+    yield engine
+    engine.dispose()
+
+
+def test_get_reads_from_replica(app, client, catalog):
+    with count_queries() as queries:
+        client.get(f"/quotes/{catalog['quotes'][0]}")
+    assert queries and {query.engine for query in queries} == {db.engines[READER_BIND]}
+
+
+def test_writes_go_to_primary(app, client, catalog):
+    with count_queries() as queries:
+        client.put(f"/quotes/{catalog['quotes'][0]}", json={'text': 'Новый текст'})
+    assert queries and {query.engine for query in queries} == {db.engine}
+
+
+def test_stale_replica_serves_get(client, catalog, stale_replica):
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    # запись ушла в основную БД, реплика еще не догнала
+    assert len(client.get('/quotes').json) == 5
+    assert client.get(f"/quotes/{catalog['quotes'][0]}").status_code == 200
+
+
+def test_reads_after_write_in_get_use_primary(app, catalog, stale_replica):
+    """После записи внутри GET-запроса чтение идет в основную БД (read-your-writes)"""
+    quote = catalog['quotes'][0]
+    # свой контекст приложения: g и сессия - как у отдельного HTTP-запроса
+    with app.app_context(), app.test_request_context('/', method='GET'):
+        assert db.session.get_bind(clause=sa.select(QuoteModel)) is stale_replica
+        db.session.execute(sa.update(QuoteModel).where(QuoteModel.id == quote).values(text='Только в основной'))
+        assert db.session.get_bind(clause=sa.select(QuoteModel)) is db.engine
+        assert db.session.execute(sa.select(QuoteModel.text).where(QuoteModel.id == quote)).scalar() \
+            == 'Только в основной'
+        db.session.rollback()
+    with app.app_context(), app.test_request_context('/', method='GET'):
+        assert db.session.get_bind(clause=sa.select(QuoteModel)) is stale_replica
+
+
+def test_without_request_context_uses_primary(app):
+    assert db.session.get_bind(clause=sa.select(QuoteModel)) is db.engine
+
+
+def test_without_reader_bind_uses_primary(app, client, catalog, monkeypatch):
+    monkeypatch.delitem(db.engines, READER_BIND)
+    with count_queries() as queries:
+        assert client.get('/quotes').status_code == 200
+    assert {query.engine for query in queries} == {db.engine}
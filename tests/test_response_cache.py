@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+import app as quotes_app
+from app import LRUCache, count_queries
+
+
+@pytest.fixture
+def cache(app):
+    app.config['RESPONSE_CACHE'] = True
+    return quotes_app.response_cache
+
+
+def cached_get(client, path: str):
+    """Дважды запрашивает path; второй ответ должен прийти из кэша - без запросов данных"""
+    with count_queries() as miss:
+        first = client.get(path)
+    with count_queries() as hit:
+        second = client.get(path)
+    assert second.data == first.data
+    # остаются только запросы версий для ETag (conditional)
+    assert len(hit) < len(miss)
+    assert all('version' in query.statement for query in hit)
+    return second
+
+
+@pytest.mark.parametrize('path', ['/quotes', '/quotes?limit=2', '/quotes/{quote}', '/authors', '/authors/{author}',
+                                  '/authors/{author}/quotes', '/quotes/filter?rating__gte=3',
+                                  '/quotes/search?q=Программирование'])
+def test_repeated_get_is_cached(app, client, cache, catalog, path):
+    cached_get(client, path.format(quote=catalog['quotes'][0], author=catalog['authors'][0]))
+
+
+def test_not_found_is_not_cached(app, client, cache, catalog):
+    client.get('/quotes/1000')
+    with count_queries() as queries:
+        assert client.get('/quotes/1000').status_code == 404
+    assert queries
+
+
+def test_stream_is_not_cached(app, client, cache, catalog):
+    client.get('/quotes?stream=ndjson').get_data()
+    with count_queries() as queries:
+        client.get('/quotes?stream=ndjson').get_data()
+    assert len(queries) == 2
+
+
+def test_writes_invalidate(app, client, cache, catalog):
+    rick, waldi = catalog['authors']
+    quote = catalog['quotes'][0]
+    cached_get(client, f'/quotes/{quote}')
+    cached_get(client, f'/authors/{rick}/quotes')
+    cached_get(client, '/quotes')
+
+    client.put(f'/quotes/{quote}', json={'text': 'Новый текст'})
+    assert client.get(f'/quotes/{quote}').json['text'] == 'Новый текст'
+    assert client.get(f'/authors/{rick}/quotes').json['quotes'][0]['text'] == 'Новый текст'
+    assert client.get('/quotes').json[0]['text'] == 'Новый текст'
+
+    client.put(f'/quotes/{quote}/up')
+    assert client.get(f'/quotes/{quote}').json['rating'] == 4
+
+    client.put(f'/authors/{rick}', json={'name': 'Richard'})
+    assert client.get(f'/quotes/{quote}').json['author']['name'] == 'Richard'
+    assert client.get(f'/authors/{rick}').json['author']['name'] == 'Richard'
+
+    client.delete(f'/authors/{waldi}')
+    assert len(client.get('/quotes').json) == 3
+    client.put(f'/authors/restore/{waldi}')
+    assert len(client.get('/quotes').json) == 5
+
+    client.delete(f'/quotes/{quote}')
+    assert client.get(f'/quotes/{quote}').status_code == 404
+
+
+def test_bulk_writes_invalidate(app, client, cache, catalog):
+    rick = catalog['authors'][0]
+    cached_get(client, f'/authors/{rick}/quotes')
+    client.post('/quotes/bulk', json=[{'author_id': rick, 'text': 'Из пачки'}])
+    assert len(client.get(f'/authors/{rick}/quotes').json['quotes']) == 4
+
+
+def test_writes_of_other_processes_change_key(app, client, asgi_client, cache, catalog, database):
+    """Запись в обход этого процесса дает новый ETag и, значит, новый ключ кэша, а не старое тело"""
+    rick = catalog['authors'][0]
+    quote = catalog['quotes'][0]
+    paths = [f'/quotes/{quote}', f'/authors/{rick}/quotes', '/quotes']
+    for path in paths:
+        cached_get(client, path)
+    with sqlite3.connect(database) as connection:
+        # как коммит другого процесса: onupdate версии строки и версия коллекции
+        connection.execute("UPDATE quotes SET text = 'Чужой текст', version = version + 1 WHERE id = ?", (quote,))
+        connection.execute("UPDATE collection_versions SET version = version + 1 WHERE name = 'quotes'")
+    connection.close()
+    response = client.get(f'/quotes/{quote}')
+    assert response.json['text'] == 'Чужой текст'
+    assert client.get(f'/quotes/{quote}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(f'/authors/{rick}/quotes').json['quotes'][0]['text'] == 'Чужой текст'
+    assert client.get('/quotes').json[0]['text'] == 'Чужой текст'
+    for path in paths:
+        assert asgi_client.get(path).data == client.get(path).data
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_lru_cache_expires_entries_but_not_counters(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quotes_app.time, 'monotonic', lambda: now[0])
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.set('a', 1)
+    assert cache.incr('generation') == 1
+    now[0] += 6
+    assert cache.get('a') is None
+    assert cache.incr('generation') == 2
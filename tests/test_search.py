@@ -0,0 +1,70 @@
+import pytest
+
+
+def search(client, q: str, **args) -> list[int]:
+    response = client.get('/quotes/search', query_string={'q': q, **args})
+    assert response.status_code == 200, response.json
+    return [quote['id'] for quote in response.json['items']]
+
+
+def test_search_by_word(client, catalog):
+    assert set(search(client, 'Программирование')) == {catalog['quotes'][0], catalog['quotes'][2]}
+
+
+def test_search_requires_every_word(client, catalog):
+    assert search(client, 'Программирование гонка') == [catalog['quotes'][0]]
+    assert search(client, 'Программирование вселенная') == []
+
+
+def test_search_ignores_case(client, catalog):
+    assert search(client, 'вселенная') == [catalog['quotes'][1]]
+
+
+def test_search_items(client, catalog):
+    item = client.get('/quotes/search?q=гонка').json['items'][0]
+    assert item['text'] == 'Программирование сегодня - это гонка'
+    assert item['author']['surname'] == 'Cook'
+    assert isinstance(item['rank'], float)
+
+
+def test_search_orders_by_rank(client, catalog):
+    author = catalog['authors'][0]
+    best = client.post(f'/authors/{author}/quotes', json={'text': 'Гонка гонка гонка'}).json['id']
+    items = client.get('/quotes/search?q=гонка').json['items']
+    assert items[0]['id'] == best
+    assert [item['rank'] for item in items] == sorted(item['rank'] for item in items)
+
+
+@pytest.mark.parametrize('q', ['"', 'гонка"', 'OR', 'NEAR(гонка)', '*', 'гонка -', 'text:гонка', '^гонка'])
+def test_search_syntax_is_literal(client, catalog, q):
+    assert client.get('/quotes/search', query_string={'q': q}).status_code == 200
+
+
+def test_search_follows_writes(client, catalog):
+    rick, waldi = catalog['authors']
+    client.put(f"/quotes/{catalog['quotes'][0]}", json={'text': 'Программирование сегодня - это марафон'})
+    assert search(client, 'гонка') == []
+    assert search(client, 'марафон') == [catalog['quotes'][0]]
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    assert search(client, 'марафон') == []
+    client.delete(f'/authors/{waldi}')
+    assert search(client, 'Программирование') == []
+    client.put(f'/authors/restore/{waldi}')
+    assert search(client, 'Программирование') == [catalog['quotes'][2]]
+
+
+def test_search_pages(client, catalog):
+    author = catalog['authors'][0]
+    ids = [client.post(f'/authors/{author}/quotes', json={'text': f'Страница {number}'}).json['id']
+           for number in range(5)]
+    first = client.get('/quotes/search?q=Страница&limit=2').json
+    second = client.get(f"/quotes/search?q=Страница&limit=2&after={first['next']}").json
+    third = client.get(f"/quotes/search?q=Страница&limit=2&after={second['next']}").json
+    assert third['next'] is None
+    assert sorted(item['id'] for page in (first, second, third) for item in page['items']) == ids
+
+
+@pytest.mark.parametrize('query', ['', 'q=', 'q=%20', 'q=гонка&limit=0', 'q=гонка&limit=abc', 'q=гонка&after=abc',
+                                   'q=гонка&after=Wy0xXQ'])
+def test_search_wrong_arguments(client, catalog, query):
+    assert client.get(f'/quotes/search?{query}').status_code == 400
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import app as quotes_app
+from conftest import BASE_DIR
+
+SHOW_PROFILE = """
+import app
+with app.app.app_context():
+    with app.db.engine.connect() as connection:
+        mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+print(app.app.config['SQLITE_PROFILE'], mode, app.app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+"""
+
+
+def run_app(tmp_path, **env) -> str:
+    environ = {key: value for key, value in os.environ.items() if key != 'QUOTES_SQLITE_PROFILE'}
+    environ.update(QUOTES_DATABASE_URI=f"sqlite:///{tmp_path / 'profile.db'}",
+                   QUOTES_READER_DATABASE_URI=f"sqlite:///{tmp_path / 'profile.db'}", **env)
+    result = subprocess.run([sys.executable, '-c', SHOW_PROFILE], cwd=BASE_DIR, env=environ,
+                            check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def pragmas(names) -> dict:
+    with quotes_app.db.engine.connect() as connection:
+        return {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in names}
+
+
+def test_default_profile_keeps_rollback_journal(tmp_path):
+    assert run_app(tmp_path) == 'default delete {}'
+
+
+def test_production_profile_is_opt_in(tmp_path):
+    assert run_app(tmp_path, QUOTES_SQLITE_PROFILE='production') == \
+        "production wal {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30}"
+
+
+def test_default_profile_pragmas(app):
+    assert app.config['SQLITE_PROFILE'] == 'default'
+    assert pragmas(['journal_mode', 'synchronous', 'mmap_size']) == \
+        {'journal_mode': 'delete', 'synchronous': 2, 'mmap_size': 0}
+
+
+def test_production_profile_pragmas(app):
+    app.config['SQLITE_PROFILE'] = 'production'
+    quotes_app.db.engine.dispose()
+    expected = quotes_app.SQLITE_PROFILES['production']['pragmas']
+    assert pragmas(expected) == {'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536,
+                                 'mmap_size': 268435456, 'busy_timeout': 5000, 'temp_store': 2}
+
+
+@pytest.mark.parametrize('profile', list(quotes_app.SQLITE_PROFILES))
+def test_profiles_serve_requests(app, client, profile):
+    app.config['SQLITE_PROFILE'] = profile
+    for engine in quotes_app.db.engines.values():
+        engine.dispose()
+    author = client.post('/authors', json={'name': 'Rick', 'surname': 'Cook'}).json['id']
+    client.post(f'/authors/{author}/quotes', json={'text': 'Вселенная пока выигрывает'})
+    assert len(client.get('/quotes').json) == 1
+
+
+def test_optimize_at_exit_skips_locked_database(app, database, monkeypatch, caplog):
+    production = {**quotes_app.SQLITE_PROFILES['production']}
+    production['pragmas'] = {**production['pragmas'], 'busy_timeout': 0}
+    monkeypatch.setitem(quotes_app.SQLITE_PROFILES, 'production', production)
+    app.config['SQLITE_PROFILE'] = 'production'
+    quotes_app.db.engine.dispose()
+    locker = sqlite3.connect(database, isolation_level=None)
+    locker.execute("BEGIN EXCLUSIVE")
+    try:
+        quotes_app.optimize_sqlite_at_exit()
+    finally:
+        locker.rollback()
+        locker.close()
+    assert 'PRAGMA optimize skipped' in caplog.text
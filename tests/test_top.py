@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from app import PAGE_LIMIT_MAX
+
+
+def top_quotes(client, n: int = 10) -> list[int]:
+    response = client.get(f'/quotes/top?n={n}')
+    assert response.status_code == 200
+    return [quote['id'] for quote in response.json]
+
+
+def top_authors(client) -> list[tuple[int, int]]:
+    response = client.get('/authors/top')
+    assert response.status_code == 200
+    return [(author['id'], author['quotes_count']) for author in response.json]
+
+
+def test_top_quotes_by_rating(client, catalog):
+    # рейтинги 3, 5, 2, 1, 4
+    quotes = catalog['quotes']
+    assert top_quotes(client) == [quotes[1], quotes[4], quotes[0], quotes[2], quotes[3]]
+    assert top_quotes(client, 2) == [quotes[1], quotes[4]]
+    assert client.get('/quotes/top').json[0] == client.get(f'/quotes/{quotes[1]}').json
+
+
+def test_top_quotes_ties_newer_first(client, catalog):
+    quotes = catalog['quotes']
+    client.put(f'/quotes/{quotes[0]}', json={'rating': 5})
+    assert top_quotes(client, 2) == [quotes[1], quotes[0]]
+    client.put(f'/quotes/{quotes[4]}/up')
+    assert top_quotes(client, 3) == [quotes[4], quotes[1], quotes[0]]
+
+
+def test_top_authors_by_quotes_count(client, catalog):
+    rick, waldi = catalog['authors']
+    assert top_authors(client) == [(rick, 3), (waldi, 2)]
+    assert client.get('/authors/top?n=1').json == [
+        {'id': rick, 'name': 'Rick', 'surname': 'Cook', 'quotes_count': 3}]
+
+
+def test_top_authors_follow_writes(client, catalog):
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    client.put(f'/quotes/{quotes[0]}', json={'author_id': waldi})
+    assert top_authors(client) == [(waldi, 3), (rick, 2)]
+    client.delete(f'/quotes/{quotes[2]}')
+    client.patch('/quotes/bulk', json=[{'id': quotes[1], 'author_id': waldi}])
+    assert top_authors(client) == [(waldi, 3), (rick, 1)]
+    client.post('/quotes/bulk', json=[{'author_id': rick, 'text': 'Новая'}, {'author_id': rick, 'text': 'Еще'}])
+    # равное число цитат: первым более новый автор
+    assert top_authors(client) == [(waldi, 3), (rick, 3)]
+    client.delete('/quotes/bulk', json=[quotes[4]])
+    assert top_authors(client) == [(waldi, 3), (rick, 2)]
+
+
+def test_top_skips_deleted_authors(client, catalog):
+    rick, waldi = catalog['authors']
+    quotes = catalog['quotes']
+    client.delete(f'/authors/{rick}')
+    assert top_authors(client) == [(waldi, 2)]
+    assert top_quotes(client) == [quotes[2], quotes[3]]
+    client.put(f'/authors/restore/{rick}')
+    assert top_authors(client) == [(rick, 3), (waldi, 2)]
+    assert top_quotes(client, 1) == [quotes[1]]
+
+
+def test_quotes_count_kept_by_triggers(client, catalog, database):
+    """Счетчик ведется в БД: запись в обход приложения тоже учитывается"""
+    rick, waldi = catalog['authors']
+    with sqlite3.connect(database) as connection:
+        connection.execute("INSERT INTO quotes (author_id, text, rating, deleted, version) VALUES (?, 'Извне', 1, 0, 1)",
+                           (waldi,))
+        connection.execute("UPDATE quotes SET deleted = 1 WHERE author_id = ?", (rick,))
+        counts = dict(connection.execute("SELECT id, quotes_count FROM authors"))
+    connection.close()
+    assert counts == {rick: 0, waldi: 3}
+
+
+@pytest.mark.parametrize('n', ['0', '-1', 'abc', '', str(PAGE_LIMIT_MAX + 1)])
+@pytest.mark.parametrize('path', ['/quotes/top', '/authors/top'])
+def test_top_wrong_n(client, catalog, path, n):
+    response = client.get(f'{path}?n={n}')
+    assert response.status_code == 400
+    assert response.json['message'] == f"Wrong value n={n}, expected 1..{PAGE_LIMIT_MAX}"
+
+
+def test_top_without_quotes(client):
+    assert client.get('/quotes/top').json == []
+    assert client.get('/authors/top').json == []
@@ -0,0 +1,87 @@
+import sqlite3
+import time
+
+import pytest
+
+import app as quotes_app
+
+
+def rating(database, quote_id: int) -> int:
+    with sqlite3.connect(database) as connection:
+        value = connection.execute("SELECT rating FROM quotes WHERE id = ?", (quote_id,)).fetchone()[0]
+    connection.close()
+    return value
+
+
+@pytest.fixture
+def buffered(app):
+    app.config['VOTE_BUFFER'] = True
+    app.config['VOTE_BUFFER_FLUSH_INTERVAL'] = 60
+    return app
+
+
+def test_vote_up_and_down(client, catalog):
+    quote = catalog['quotes'][0]
+    response = client.put(f'/quotes/{quote}/up')
+    assert response.status_code == 200
+    assert response.json['message'] == 'Your vote has been accepted, new rating is 4.'
+    assert client.put(f'/quotes/{quote}/down').json['message'] == 'Your vote has been accepted, new rating is 3.'
+
+
+def test_vote_limits(client, catalog):
+    top, bottom = catalog['quotes'][1], catalog['quotes'][3]
+    assert client.put(f'/quotes/{top}/up').json['message'] == f'Quote with id={top} has maximal rating.'
+    assert client.put(f'/quotes/{bottom}/down').json['message'] == f'Quote with id={bottom} has minimal rating.'
+
+
+def test_vote_for_missing_quote(client, catalog):
+    client.delete(f"/quotes/{catalog['quotes'][0]}")
+    assert client.put(f"/quotes/{catalog['quotes'][0]}/up").status_code == 404
+    assert client.put('/quotes/1000/down').status_code == 404
+
+
+def test_buffered_votes_wait_for_flush(client, buffered, catalog, database):
+    quote = catalog['quotes'][0]
+    response = client.put(f'/quotes/{quote}/up')
+    assert response.status_code == 202
+    assert rating(database, quote) == 3
+    with buffered.app_context():
+        quotes_app.flush_votes()
+    assert rating(database, quote) == 4
+
+
+def test_buffered_votes_flush_at_max_pending(client, buffered, catalog, database):
+    buffered.config['VOTE_BUFFER_MAX_PENDING'] = 3
+    quote = catalog['quotes'][2]
+    client.put(f'/quotes/{quote}/up')
+    client.put(f'/quotes/{quote}/up')
+    assert rating(database, quote) == 2
+    client.put(f'/quotes/{quote}/down')
+    assert rating(database, quote) == 3
+
+
+def test_buffered_votes_are_clamped(client, buffered, catalog, database):
+    buffered.config['VOTE_BUFFER_MAX_PENDING'] = 10
+    for _ in range(10):
+        client.put(f"/quotes/{catalog['quotes'][1]}/up")
+    assert rating(database, catalog['quotes'][1]) == 5
+    for _ in range(10):
+        client.put(f"/quotes/{catalog['quotes'][1]}/down")
+    assert rating(database, catalog['quotes'][1]) == 1
+
+
+def test_buffered_vote_for_missing_quote(client, buffered, catalog):
+    assert client.put('/quotes/1000/up').status_code == 404
+    assert quotes_app.vote_buffer.pending == 0
+
+
+def test_buffered_votes_flush_on_timer(client, buffered, catalog, database):
+    """Последний голос без следующих попадает в БД по таймеру фонового потока"""
+    buffered.config['VOTE_BUFFER_FLUSH_INTERVAL'] = 0.05
+    quote = catalog['quotes'][0]
+    client.put(f'/quotes/{quote}/up')
+    deadline = time.monotonic() + 5
+    while rating(database, quote) == 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert rating(database, quote) == 4
+    assert quotes_app.vote_buffer.pending == 0